@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Build the local company search index from a bulk snapshot.
+
+    python scripts/build_company_index.py companies.sqlite                  # scan ERST live
+    python scripts/build_company_index.py companies.sqlite --from-ndjson dump.ndjson
+
+The NDJSON dump may hold Vrvirksomhed documents or raw virksomhed/_search hits. The live
+scan pages through the CVR Permanent index with search_after using the ERST_* settings.
+Point CVRGPT_COMPANY_INDEX at the resulting file to serve /v1/search from it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cvrgpt_api.company_index import CompanyIndex, row_from_vrvirksomhed
+from cvrgpt_api.providers.erst import ERSTProvider
+
+BATCH = 5000
+
+
+def docs_from_ndjson(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                doc = json.loads(line)
+                yield ((doc.get("_source") or doc).get("Vrvirksomhed")) or doc
+
+
+async def docs_from_erst(page_size: int):
+    provider = ERSTProvider(
+        client_id=os.getenv("ERST_CLIENT_ID", ""),
+        client_secret=os.getenv("ERST_CLIENT_SECRET", ""),
+        auth_url=os.getenv("ERST_AUTH_URL", ""),
+        token_audience=os.getenv("ERST_TOKEN_AUDIENCE", ""),
+        api_base=os.getenv("ERST_API_BASE_URL", ""),
+        cert_path=os.getenv("ERST_CERT_PATH"),
+        key_path=os.getenv("ERST_KEY_PATH"),
+        basic_user=os.getenv("ERST_API_USER"),
+        basic_password=os.getenv("ERST_API_PASSWORD"),
+    )
+    try:
+        async for doc, _ in provider.scan_companies(page_size=page_size):
+            yield doc
+    finally:
+        await provider.aclose()
+
+
+async def build(args) -> None:
+    index = CompanyIndex(args.output)
+    started = time.time()
+    batch: list = []
+    total = 0
+    high_water = ""
+
+    def flush():
+        nonlocal total
+        total += index.upsert(batch)
+        batch.clear()
+        print(f"  {total} companies ({time.time() - started:.0f}s)", file=sys.stderr)
+
+    async def source():
+        if args.from_ndjson:
+            for doc in docs_from_ndjson(args.from_ndjson):
+                yield doc
+        else:
+            async for doc in docs_from_erst(args.page_size):
+                yield doc
+
+    async for doc in source():
+        row = row_from_vrvirksomhed(doc)
+        if row is None:
+            continue
+        high_water = max(high_water, row.get("updated") or "")
+        batch.append(row)
+        if len(batch) >= BATCH:
+            flush()
+    if batch:
+        flush()
+
+    # The change-feed ingester continues from the newest record in the snapshot
+    if high_water:
+        index.meta_set("high_water", high_water)
+    index.meta_set("synced_at", datetime.now(UTC).isoformat())
+    index.close()
+    print(f"Indexed {total} companies into {args.output}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output", help="SQLite index file to create or update")
+    parser.add_argument("--from-ndjson", help="Read a snapshot dump instead of scanning ERST")
+    parser.add_argument("--page-size", type=int, default=1000)
+    asyncio.run(build(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
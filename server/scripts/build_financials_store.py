@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Build or update the columnar financials store from enrichment output.
+
+    python scripts/enrich.py portfolio.csv -o enriched.ndjson
+    python scripts/build_financials_store.py /data/financials.arrow enriched.ndjson
+
+Reads the "accounts" and industry code of each NDJSON result line (the output of
+scripts/enrich.py or /v1/enrich) and merges every fiscal year into the store, replacing
+existing (cvr, year) rows. Pass --replace to rebuild the file from the given inputs only.
+Point CVRGPT_FINANCIALS_STORE at the resulting file.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cvrgpt_api.financials_store import FinancialsStore, rows_from_accounts
+
+
+def rows_from_ndjson(paths):
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if item.get("accounts") and item.get("cvr"):
+                    industry = (item.get("company") or {}).get("industry") or {}
+                    yield from rows_from_accounts(
+                        item["cvr"], item["accounts"], nace=industry.get("code")
+                    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output", help="Arrow IPC file to create or update")
+    parser.add_argument("inputs", nargs="+", help="NDJSON files with cvr + accounts lines")
+    parser.add_argument("--replace", action="store_true", help="Drop existing rows first")
+    args = parser.parse_args()
+
+    started = time.time()
+    store = FinancialsStore(args.output)
+    rows = list(rows_from_ndjson(args.inputs))
+    total = store.write(rows) if args.replace else store.merge(rows)
+    print(
+        f"Stored {len(rows)} company-years ({total} total) in {args.output} "
+        f"({time.time() - started:.1f}s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
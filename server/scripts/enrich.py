@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Enrich a CSV/NDJSON file of CVRs and write NDJSON results.
+
+    python scripts/enrich.py portfolio.csv -o enriched.ndjson
+    python scripts/enrich.py portfolio.csv -o enriched.ndjson --resume
+
+Runs in-process against the configured provider (DATA_PROVIDER etc.). With --resume the
+last checkpoint in the output file is picked up and the run continues from there.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cvrgpt_api.api import get_provider
+from cvrgpt_api.services.enrich import enrich_stream, iter_chunks, iter_lines, parse_cvrs
+
+
+def last_checkpoint(path: Path) -> int:
+    """Position of the last checkpoint record in an existing output file, or 0."""
+    start = 0
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.startswith('{"checkpoint"'):
+                    start = json.loads(line)["checkpoint"]
+    return start
+
+
+async def run(args) -> None:
+    out_path = Path(args.output)
+    start = last_checkpoint(out_path) if args.resume else 0
+    if start:
+        print(f"Resuming from input position {start}", file=sys.stderr)
+    provider = get_provider()
+    await provider.startup()
+    done = 0
+    src = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    try:
+        with out_path.open("a" if args.resume else "w", encoding="utf-8") as out:
+            async for item in enrich_stream(
+                parse_cvrs(iter_lines(iter_chunks(src))),
+                provider,
+                concurrency=args.concurrency,
+                start=start,
+                checkpoint_every=args.checkpoint_every,
+            ):
+                out.write(json.dumps(item, default=str) + "\n")
+                if "checkpoint" in item:
+                    out.flush()
+                    print(f"  checkpoint {item['checkpoint']}", file=sys.stderr)
+                else:
+                    done += 1
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        await provider.aclose()
+    print(f"Enriched {done} CVRs into {out_path}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="CSV or NDJSON file with CVRs, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="NDJSON output file")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--checkpoint-every", type=int, default=500)
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
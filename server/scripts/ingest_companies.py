@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Keep the local company index current from the CVR change feed.
+
+    DATA_PROVIDER=erst CVRGPT_COMPANY_INDEX=/data/companies.sqlite \\
+        python scripts/ingest_companies.py --interval 60
+
+Runs the same ingester the API starts with CVRGPT_INGEST_INTERVAL_S, as a separate worker
+process. Use --once to apply pending changes and exit (e.g. from cron).
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cvrgpt_api.api import get_provider
+from cvrgpt_api.ingest import CompanyIngester
+from cvrgpt_api.providers.erst import ERSTProvider
+from cvrgpt_api.providers.local_index import LocalIndexProvider
+
+
+async def run(args) -> None:
+    prov = get_provider()
+    if not isinstance(prov, LocalIndexProvider) or not isinstance(prov.delegate, ERSTProvider):
+        sys.exit("Set DATA_PROVIDER=erst and CVRGPT_COMPANY_INDEX to run the ingester")
+    await prov.startup()
+    ingester = CompanyIngester(
+        prov.delegate, prov.index, page_size=args.page_size, interval_s=args.interval
+    )
+    try:
+        if args.once:
+            applied = await ingester.run_once()
+            print(f"Applied {applied} changed companies", file=sys.stderr)
+        else:
+            await ingester.run_forever()
+    finally:
+        await prov.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--once", action="store_true", help="Apply pending changes and exit")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Refresh the per-NACE aggregates from the financials store and bankruptcy events.
+
+    CVRGPT_FINANCIALS_STORE=/data/financials.arrow CVRGPT_INDUSTRY_STATS=/data/industry.bin \\
+        python scripts/refresh_industry_stats.py --once
+
+Only accounts and events added since the last run are applied (groups with changed accounts
+are rebuilt). The API reloads the file when it changes; run this after
+build_financials_store.py or on an interval, or let the API do it with
+CVRGPT_INDUSTRY_STATS_INTERVAL_S.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cvrgpt_api.financials_store import get_financials_store
+from cvrgpt_api.industry_stats import get_industry_stats
+from cvrgpt_core.providers.erst_events import ErstEventsProvider
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--interval", type=float, default=300.0, help="Seconds between refreshes")
+    parser.add_argument("--once", action="store_true", help="Refresh once and exit")
+    parser.add_argument("--no-events", action="store_true", help="Skip bankruptcy counts")
+    args = parser.parse_args()
+
+    stats = get_industry_stats()
+    if stats is None:
+        sys.exit("Set CVRGPT_INDUSTRY_STATS (and install numpy/pyarrow)")
+    events = None if args.no_events else ErstEventsProvider()
+    if not args.once:
+        asyncio.run(stats.run_forever(events, interval_s=args.interval))
+        return
+    started = time.time()
+    result = stats.refresh(get_financials_store(), events)
+    print(
+        f"Applied {result['accounts']} company-years and {result['bankruptcies']} bankruptcies, "
+        f"rebuilt {result['rebuilt_groups']} groups ({time.time() - started:.1f}s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Sync ERST registration events into the local event log.
+
+    ERST_EVENTS_REAL=1 ERST_API_BASE=... ERST_API_KEY=... python scripts/sync_events.py --once
+
+Pages from the cursor in ERST_EVENTS_LOG_DIR/checkpoint.json and appends new events to the
+log segments that /v1/events and the events_search tool read. Without --once it keeps
+polling; the API can run the same loop with CVRGPT_EVENTS_SYNC_INTERVAL_S.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from cvrgpt_core.providers import erst_events
+from cvrgpt_core.providers.event_log import EventLog
+from cvrgpt_core.providers.event_sync import EventSync
+
+
+async def run(args) -> None:
+    log = EventLog(args.log_dir or erst_events.ERST_EVENTS_LOG_DIR)
+    sync = EventSync(log, erst_events.ERST_BASE, erst_events.ERST_KEY, page_size=args.page_size)
+    if not args.once:
+        await sync.run_forever(interval_s=args.interval)
+        return
+    try:
+        appended = await sync.run_once()
+    finally:
+        await sync.aclose()
+    print(f"Appended {appended} events ({log.checkpoint()['count']} in log)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--log-dir", help="Event log directory (default ERST_EVENTS_LOG_DIR)")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--once", action="store_true", help="Sync once and exit")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
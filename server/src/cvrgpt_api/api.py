@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Request, Depends, APIRouter, Query
+from fastapi import FastAPI, HTTPException, Request, Response, Depends, APIRouter, Query
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -20,18 +20,38 @@ except ImportError:
     RATE_LIMITING_AVAILABLE = False
     _RateLimiter = None  # type: ignore
     _FastAPILimiter = None  # type: ignore
-from .cache import cache_get, cache_set, with_etag, cached
+from .cache import (
+    cache,
+    cached,
+    etag_response,
+    render_body,
+    rendered_payload,
+    set_cache_header,
+)
 from .providers.fixtures import FixtureProvider
 from .providers.cvr_api import CVRApiProvider
 from .providers.regnskab import RegnskabProvider
 from .providers.base import CompositeProvider
 from .providers.erst import ERSTProvider
+from .providers.local_index import LocalIndexProvider
+from .company_index import CompanyIndex
+from .http import PooledClient
+from .llm import llm_client
+from .cursors import InvalidCursorError, decode_cursor, encode_cursor, query_scope
+from .industry_stats import get_industry_stats
+from .ingest import CompanyIngester
 from .health.router import router as health_router
-from .services.compare import compare_accounts_snapshots
+from .services.benchmark import get_benchmark_engine
+from .services.compare import compare_accounts_snapshots, compare_latest_accounts
+from .services.enrich import enrich_stream, iter_chunks, iter_lines, parse_cvrs
 from .mcp_server import mcp
 from . import models
 from .chat.router import router as chat_router
 from .routes.events import router as events_router
+from cvrgpt_core.providers import erst_events
+from cvrgpt_core.providers.erst_events import ErstEventsProvider
+from cvrgpt_core.providers.event_log import EventLog
+from cvrgpt_core.providers.event_sync import EventSync
 from .routes.tools import router as tools_router
 from .routes.chat import router as v1_chat_router
 from .errors import (
@@ -40,8 +60,11 @@ from .errors import (
     not_found_handler,
     validation_error_handler,
     internal_error_handler,
+    circuit_open_handler,
+    deadline_handler,
 )
-from typing import Any as _Any
+from .resilience import CircuitOpenError, DeadlineExceededError
+from typing import Any as _Any, Optional
 
 try:
     from prometheus_fastapi_instrumentator import Instrumentator
@@ -50,8 +73,11 @@ try:
 except ImportError:
     PROMETHEUS_AVAILABLE = False
     Instrumentator: _Any = None  # type: ignore
+import asyncio
 import csv
 import io
+import json
+import tempfile
 
 
 def get_rate_limiter(times: int, seconds: int):
@@ -141,6 +167,10 @@ def get_provider():
         _provider_instance = CompositeProvider(core=core, filings_provider=filings)
     else:
         raise RuntimeError(f"Unknown provider: {provider_name}. Use 'erst' or 'fixture'.")
+    if settings.company_index_path:
+        _provider_instance = LocalIndexProvider(
+            CompanyIndex(settings.company_index_path), _provider_instance
+        )
     return _provider_instance
 
 
@@ -166,6 +196,8 @@ app = FastAPI(title="CVRGPT Server", version="0.1.0")
 app.add_exception_handler(FileNotFoundError, not_found_handler)
 app.add_exception_handler(KeyError, not_found_handler)
 app.add_exception_handler(ValueError, validation_error_handler)
+app.add_exception_handler(CircuitOpenError, circuit_open_handler)
+app.add_exception_handler(DeadlineExceededError, deadline_handler)
 app.add_exception_handler(Exception, internal_error_handler)
 
 # Create versioned router with API key protection
@@ -203,10 +235,108 @@ if PROMETHEUS_AVAILABLE and Instrumentator is not None:
     instrumentator.expose(app, include_in_schema=False, endpoint="/metrics")
 
 
+async def _start_provider():
+    """Open the provider's pooled clients up front so the first request skips the handshake."""
+    try:
+        await get_provider().startup()
+    except Exception as e:
+        log.warning(f"Provider startup failed: {e}")
+
+
+async def _close_providers():
+    from cvrgpt_core.providers import factory
+
+    seen = set()
+    for prov in (_provider_instance, factory._provider_singleton):
+        if prov is None or id(prov) in seen:
+            continue
+        seen.add(id(prov))
+        close = getattr(prov, "aclose", None)
+        if close is not None:
+            await close()
+
+
+_ingest_task: "asyncio.Task[None] | None" = None
+
+
+def _start_ingester() -> None:
+    """Keep the local company index current from the ERST change feed, if configured."""
+    global _ingest_task
+    prov = get_provider()
+    if settings.ingest_interval_s <= 0 or not isinstance(prov, LocalIndexProvider):
+        return
+    if not isinstance(prov.delegate, ERSTProvider):
+        log.warning("Company ingest needs DATA_PROVIDER=erst; not started")
+        return
+    ingester = CompanyIngester(prov.delegate, prov.index, interval_s=settings.ingest_interval_s)
+    _ingest_task = asyncio.ensure_future(ingester.run_forever())
+
+
+_industry_stats_task: "asyncio.Task[None] | None" = None
+
+
+def _start_industry_stats() -> None:
+    """Keep the per-NACE aggregates current from the financials store and events, if configured."""
+    global _industry_stats_task
+    stats = get_industry_stats()
+    if settings.industry_stats_interval_s <= 0 or stats is None:
+        return
+    _industry_stats_task = asyncio.ensure_future(
+        stats.run_forever(ErstEventsProvider(), interval_s=settings.industry_stats_interval_s)
+    )
+
+
+_events_sync_task: "asyncio.Task[None] | None" = None
+_events_sync_client: Optional[PooledClient] = None
+
+
+def _start_events_sync() -> None:
+    """Keep the local ERST event log current, if live events are enabled."""
+    global _events_sync_task, _events_sync_client
+    if settings.events_sync_interval_s <= 0 or not erst_events.USE_REAL:
+        return
+    client = _events_sync_client = PooledClient(
+        "erst_events",
+        timeout=settings.erst_timeout_s,
+        max_connections=2,
+        max_keepalive=1,
+        keepalive_expiry=settings.erst_keepalive_expiry_s,
+    )
+    sync = EventSync(
+        EventLog(erst_events.ERST_EVENTS_LOG_DIR),
+        erst_events.ERST_BASE,
+        erst_events.ERST_KEY,
+        client=client,
+    )
+    _events_sync_task = asyncio.ensure_future(
+        sync.run_forever(interval_s=settings.events_sync_interval_s)
+    )
+
+
 @app.on_event("startup")
 async def _startup():
     await init_rate_limiter()
+    await cache.start_invalidation_listener()
+    await _start_provider()
     _check_provider()
+    _start_ingester()
+    _start_industry_stats()
+    _start_events_sync()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    global _ingest_task, _industry_stats_task, _events_sync_task, _events_sync_client
+    for task in (_ingest_task, _industry_stats_task, _events_sync_task):
+        if task is not None:
+            task.cancel()
+    _ingest_task = _industry_stats_task = _events_sync_task = None
+    if _events_sync_client is not None:
+        await _events_sync_client.aclose()
+        _events_sync_client = None
+    await cache.stop_invalidation_listener()
+    await _close_providers()
+    await llm_client.aclose()
 
 
 # Request ID middleware is now handled by RequestIDMiddleware class above
@@ -250,8 +380,8 @@ async def readiness():
         raise HTTPException(status_code=503, detail="Redis unavailable")
 
 
-def _search_key(q: str, limit: int, offset: int):
-    return f"search:{q}:{limit}:{offset}"
+def _search_key(q: str, limit: int, offset: int, cursor: Optional[str] = None):
+    return f"search:{q}:{limit}:{offset}:{cursor or ''}"
 
 
 @api_v1.get(
@@ -260,21 +390,46 @@ def _search_key(q: str, limit: int, offset: int):
     dependencies=[Depends(get_rate_limiter(30, 60))],
 )
 async def search(
+    request: Request,
     q: str = Query(min_length=2, max_length=100),
     limit: int = Query(10, ge=1, le=50),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
 ):
-    @cached(ttl=900, key_fn=lambda *_args, **_kw: _search_key(q, limit, offset))
+    scope = query_scope("search", q)
+    after = None
+    if cursor:
+        try:
+            state = decode_cursor(cursor, scope)
+        except InvalidCursorError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=ErrorPayload(code=ErrorCode.BAD_REQUEST, message=str(e)).model_dump(),
+            ) from e
+        # Providers without keyset support get offset cursors
+        after = state.get("after")
+        offset = int(state.get("offset", 0))
+
+    @cached(
+        ttl=900, key_fn=lambda *_args, **_kw: _search_key(q, limit, offset, cursor), lock_ttl=5
+    )
     async def _do():
         prov = get_provider()
         try:
-            # Get data with pagination
-            data = await prov.search_companies(q, limit, offset)
+            kw = {"search_after": after} if after is not None else {}
+            data = await prov.search_companies(q, limit, offset, **kw)
 
             # Calculate pagination info
             total = data.get("total", len(data.get("items", [])))
             items = data.get("items", [])
             next_offset = offset + limit if offset + limit < total else None
+            if "search_after" in data:
+                # Keyset: a full page may have a successor; the next page is cheap either way
+                has_more = len(items) >= limit
+                next_cursor = encode_cursor(scope, after=data["search_after"]) if has_more else None
+            else:
+                has_more = next_offset is not None
+                next_cursor = encode_cursor(scope, offset=next_offset) if has_more else None
 
             # Build response
             response_data = {
@@ -283,17 +438,28 @@ async def search(
                 "limit": limit,
                 "offset": offset,
                 "next_offset": next_offset,
+                "next_cursor": next_cursor,
+                "has_more": has_more,
                 "citations": data.get("citations", []),
             }
 
-            return response_data
+            return render_body(response_data)
+        except InvalidCursorError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=ErrorPayload(code=ErrorCode.BAD_REQUEST, message=str(e)).model_dump(),
+            ) from e
+        except (CircuitOpenError, DeadlineExceededError):
+            raise  # 503/504 with Retry-After, unless a stale copy can be served
         except Exception as e:
             raise HTTPException(status_code=502, detail=str(e))
 
-    return JSONResponse(await _do())
+    return set_cache_header(etag_response(request, await _do(), 900))
 
 
 TTL_COMPANY = 6 * 60 * 60  # 6 hours
+STALE_COMPANY = 60 * 60  # then served stale for 1 hour while refreshing in the background
+STALE_IF_ERROR_COMPANY = 24 * 60 * 60  # and kept for a day in case ERST is down
 
 
 @api_v1.get(
@@ -302,45 +468,156 @@ TTL_COMPANY = 6 * 60 * 60  # 6 hours
     dependencies=[Depends(get_rate_limiter(60, 60))],
 )
 async def company(cvr: str, request: Request):
-    key = f"v1:company:{cvr}"
-    cached = await cache_get(key)
-    if cached:
-        return with_etag(request, cached, TTL_COMPANY)
-
-    prov = get_provider()
-    try:
-        data = await prov.get_company(cvr)
-    except FileNotFoundError:
+    @cached(
+        ttl=TTL_COMPANY,
+        key_fn=lambda *_args, **_kw: f"v1:company:{cvr}",
+        lock_ttl=5,
+        stale_ttl=STALE_COMPANY,
+        stale_if_error_ttl=STALE_IF_ERROR_COMPANY,
+    )
+    async def _do():
+        prov = get_provider()
+        try:
+            data = await prov.get_company(cvr)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=404,
+                detail=ErrorPayload(
+                    code=ErrorCode.NOT_FOUND, message=f"Company {cvr} not found"
+                ).model_dump(),
+            ) from None
+        except (CircuitOpenError, DeadlineExceededError):
+            raise
+        except Exception as e:
+            log.error(f"Company lookup failed for {cvr}: {e}")
+            raise HTTPException(
+                status_code=502,
+                detail=ErrorPayload(
+                    code=ErrorCode.UPSTREAM_ERROR, message="Company lookup failed"
+                ).model_dump(),
+            ) from e
+
+        # Clean the data before caching it
+        payload = dict(data)
+        payload.pop("x_cache", None)  # Remove cache info for clean response
+        return render_body(payload)
+
+    return set_cache_header(etag_response(request, await _do(), TTL_COMPANY))
+
+
+@api_v1.post(
+    "/companies:batch",
+    response_model=models.BatchCompaniesResponse,
+    dependencies=[Depends(get_rate_limiter(10, 60))],
+)
+async def companies_batch(body: models.BatchCompaniesRequest):
+    """
+    Look up many companies at once. The cache is read with one multi-get and all misses
+    are fetched with one upstream query. Items come back in request order; unknown CVRs
+    get found=false and error=NOT_FOUND.
+    """
+    if len(body.cvrs) > settings.batch_max_cvrs:
         raise HTTPException(
-            status_code=404,
+            status_code=400,
             detail=ErrorPayload(
-                code=ErrorCode.NOT_FOUND, message=f"Company {cvr} not found"
+                code=ErrorCode.BAD_REQUEST,
+                message=f"At most {settings.batch_max_cvrs} CVRs per batch",
             ).model_dump(),
         )
-    except Exception as e:
-        log.error(f"Company lookup failed for {cvr}: {e}")
-        raise HTTPException(
-            status_code=502,
-            detail=ErrorPayload(
-                code=ErrorCode.UPSTREAM_ERROR, message="Company lookup failed"
-            ).model_dump(),
+    unique = list(dict.fromkeys(body.cvrs))
+    entries = await cache.get_entries([f"v1:company:{cvr}" for cvr in unique])
+    payloads: dict[str, dict] = {}
+    stale: dict[str, dict] = {}
+    for cvr, entry in zip(unique, entries, strict=True):
+        if entry is not None and entry.fresh:
+            payloads[cvr] = rendered_payload(entry.value)
+        elif entry is not None:
+            stale[cvr] = rendered_payload(entry.value)
+    misses = [cvr for cvr in unique if cvr not in payloads]
+
+    if misses:
+        try:
+            fetched = await get_provider().get_companies(misses)
+        except Exception as e:
+            log.error(f"Batch company lookup failed for {len(misses)} CVRs: {e}")
+            if any(cvr not in stale for cvr in misses):
+                if isinstance(e, (CircuitOpenError, DeadlineExceededError)):
+                    raise  # 503/504 with Retry-After
+                raise HTTPException(
+                    status_code=502,
+                    detail=ErrorPayload(
+                        code=ErrorCode.UPSTREAM_ERROR, message="Company lookup failed"
+                    ).model_dump(),
+                ) from e
+            fetched = {}
+            payloads.update(stale)
+        for data in fetched.values():
+            data.pop("x_cache", None)
+        await cache.set_many(
+            {f"v1:company:{cvr}": render_body(data) for cvr, data in fetched.items()},
+            TTL_COMPANY,
+            STALE_COMPANY,
+            STALE_IF_ERROR_COMPANY,
         )
+        payloads.update(fetched)
+
+    items = []
+    for cvr in body.cvrs:
+        data = payloads.get(cvr)
+        if data is None:
+            items.append({"cvr": cvr, "found": False, "error": "NOT_FOUND"})
+        else:
+            items.append({"cvr": cvr, "found": True, **data})
+    body_bytes = json.dumps({"items": items}, default=str).encode()
+    return Response(content=body_bytes, media_type="application/json")
+
+
+@api_v1.post("/enrich", dependencies=[Depends(get_rate_limiter(5, 60))])
+async def enrich(
+    request: Request,
+    start: int = Query(0, ge=0),
+    concurrency: int = Query(16, ge=1, le=64),
+):
+    """
+    Enrich a CSV/NDJSON stream of CVRs with company profile, latest accounts and comparison.
+    Results stream back as NDJSON in completion order, each tagged with its input position
+    ("seq"), interleaved with {"checkpoint": n} records; resend the input with ?start=n to
+    resume after an interrupted run.
+    """
+    # The upload is spooled (to disk past 1 MiB) before the response starts: the request body
+    # cannot be read from inside a streaming response behind BaseHTTPMiddleware. File I/O runs
+    # in a worker thread so a large upload does not block the event loop.
+    spool = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    async for chunk in request.stream():
+        await asyncio.to_thread(spool.write, chunk)
+    await asyncio.to_thread(spool.seek, 0)
+    cvrs = parse_cvrs(iter_lines(iter_chunks(spool)))
+
+    async def lines():
+        try:
+            async for item in enrich_stream(
+                cvrs, get_provider(), concurrency=concurrency, start=start
+            ):
+                yield json.dumps(item, default=str) + "\n"
+        finally:
+            spool.close()
 
-    # Clean the data and cache it
-    payload = dict(data)
-    payload.pop("x_cache", None)  # Remove cache info for clean response
-    await cache_set(key, payload, TTL_COMPANY)
-    return with_etag(request, payload, TTL_COMPANY)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @api_v1.get("/filings/{cvr}", response_model=models.FilingsResponse)
-async def filings(cvr: str, limit: int = 10):
-    @cached(ttl=86400, key_fn=lambda *_args, **_kw: f"filings:{cvr}")
+async def filings(cvr: str, request: Request, limit: int = 10):
+    @cached(
+        ttl=86400,
+        key_fn=lambda *_args, **_kw: f"filings:{cvr}",
+        lock_ttl=5,
+        stale_if_error_ttl=7 * 86400,
+    )
     async def _do():
         prov = get_provider()
-        return await prov.list_filings(cvr, limit)
+        return render_body(await prov.list_filings(cvr, limit))
 
-    return JSONResponse(await _do())
+    return set_cache_header(etag_response(request, await _do(), 86400))
 
 
 @api_v1.get(
@@ -348,13 +625,21 @@ async def filings(cvr: str, limit: int = 10):
     response_model=models.AccountsResponse,
     dependencies=[Depends(get_rate_limiter(30, 60))],
 )
-async def latest_accounts(cvr: str):
-    @cached(ttl=43200, key_fn=lambda *_args, **_kw: f"accounts:latest:{cvr}")
+async def latest_accounts(cvr: str, request: Request):
+    @cached(
+        ttl=43200,
+        key_fn=lambda *_args, **_kw: f"accounts:latest:{cvr}",
+        lock_ttl=5,
+        stale_ttl=43200,
+        stale_if_error_ttl=7 * 86400,
+    )
     async def _do():
         prov = get_provider()
-        return await prov.get_latest_accounts(cvr)
+        data = await prov.get_latest_accounts(cvr)
+        # Rendered through the response model so the cached body matches what FastAPI would send
+        return render_body(models.AccountsResponse.model_validate(data).model_dump(mode="json"))
 
-    return await _do()
+    return set_cache_header(etag_response(request, await _do(), 43200))
 
 
 @api_v1.get("/compare/{cvr}", response_model=models.CompareResponse)
@@ -362,39 +647,74 @@ async def compare(cvr: str):
     prov = get_provider()
     try:
         data = await prov.get_latest_accounts(cvr)
+    except (CircuitOpenError, DeadlineExceededError):
+        raise
     except Exception as e:
-        raise HTTPException(status_code=502, detail=str(e))
-
-    accounts_data = data.get("accounts") if data else None
-    current_snapshot = None
-    previous_snapshot = None
-
-    if accounts_data and isinstance(accounts_data, dict):
-        current_data = accounts_data.get("current")
-        previous_data = accounts_data.get("previous")
+        raise HTTPException(status_code=502, detail=str(e)) from e
 
-        if current_data:
-            current_snapshot = models.AccountsSnapshot(**current_data)
-        if previous_data:
-            previous_snapshot = models.AccountsSnapshot(**previous_data)
+    return JSONResponse(compare_latest_accounts(data))
 
-    # Use new comparison function
-    comparison_result = compare_accounts_snapshots(current_snapshot, previous_snapshot)
 
-    # Add original citations
-    all_sources = comparison_result.get("sources", [])
-    if data and data.get("citations"):
-        all_sources.extend(data.get("citations", []))
+@api_v1.get("/compare/{cvr}/peers", response_model=models.PeerBenchmarkResponse)
+async def compare_peers(
+    cvr: str,
+    year: int | None = Query(None, description="Fiscal year, default the latest stored"),
+    nace_digits: int = Query(2, ge=1, le=6, description="NACE prefix length defining the industry"),
+    min_peers: int = Query(5, ge=1, description="Widen to the whole industry below this"),
+    limit: int = Query(10, ge=0, le=100, description="Closest peers to list"),
+):
+    """Percentile ranks of revenue growth, EBIT margin, solvency and liquidity among peers."""
+    engine = get_benchmark_engine()
+    if engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail=ErrorPayload(
+                code=ErrorCode.PROVIDER_DOWN, message="Financials store is not configured"
+            ).model_dump(),
+        )
+    # Building a year's peer matrices on first use takes a while: keep it off the event loop
+    result = await asyncio.to_thread(
+        engine.benchmark,
+        cvr,
+        year=year,
+        nace_digits=nace_digits,
+        min_peers=min_peers,
+        peer_limit=limit,
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorPayload(
+                code=ErrorCode.INSUFFICIENT_DATA,
+                message=f"No stored accounts with an industry code for {cvr}",
+            ).model_dump(),
+        )
+    return result
 
-    response_data = {
-        "current_period": comparison_result.get("current_period"),
-        "previous_period": comparison_result.get("previous_period"),
-        "key_changes": [change.model_dump() for change in comparison_result.get("key_changes", [])],
-        "narrative": comparison_result.get("narrative", "No comparison available."),
-        "sources": all_sources,
-    }
 
-    return JSONResponse(response_data)
+@api_v1.get("/industries/{nace}/stats", response_model=models.IndustryStatsResponse)
+async def industry_stats(
+    nace: str,
+    year: int | None = Query(None, description="Fiscal year, default the latest with data"),
+):
+    """Precomputed aggregates for a 2, 4 or 6 digit NACE prefix: counts, sums, quantiles."""
+    stats = get_industry_stats()
+    if stats is None:
+        raise HTTPException(
+            status_code=503,
+            detail=ErrorPayload(
+                code=ErrorCode.PROVIDER_DOWN, message="Industry statistics are not configured"
+            ).model_dump(),
+        )
+    result = stats.get(nace, year)
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorPayload(
+                code=ErrorCode.INSUFFICIENT_DATA, message=f"No statistics for NACE {nace}"
+            ).model_dump(),
+        )
+    return result
 
 
 @api_v1.get("/compare/{cvr}/export")
@@ -403,8 +723,10 @@ async def export_comparison(cvr: str, format: str = "csv"):
     prov = get_provider()
     try:
         data = await prov.get_latest_accounts(cvr)
+    except (CircuitOpenError, DeadlineExceededError):
+        raise
     except Exception as e:
-        raise HTTPException(status_code=502, detail=str(e))
+        raise HTTPException(status_code=502, detail=str(e)) from e
 
     accounts_data = data.get("accounts") if data else None
     current_snapshot = None
@@ -1,60 +1,307 @@
+import asyncio
+import collections
 import json
+import logging
 import os
 import time
-from typing import Any, Callable, Optional
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable, Optional, Tuple
 import hashlib
-import types
 from starlette.responses import Response
-from fastapi import Request
+from fastapi import HTTPException, Request
+from cachetools import TLRUCache  # type: ignore
 
-try:
-    import redis  # type: ignore
-
-    _redis_module: Optional[types.ModuleType] = redis
-except Exception:
-    _redis_module = None
+from .codec import default_codec
+from .metrics import CACHE_EVENTS, CACHE_L1_BYTES
+from .redis_client import UNLOCK_SCRIPT, redis_client
 
 REDIS_URL = os.getenv("CVRGPT_REDIS_URL")
+# L1 (process-local) bounds: total payload bytes, and max lifetime of a copy of an L2 entry
+L1_MAX_BYTES = int(os.getenv("CVRGPT_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+L1_TTL_S = int(os.getenv("CVRGPT_L1_TTL_S", "60"))
+INVALIDATION_CHANNEL = "cvrgpt:cache:invalidate"
+
+logger = logging.getLogger(__name__)
+
+
+class _L1(TLRUCache):
+    """
+    LRU bounded by payload bytes where every entry carries its own expiry time.
+    Values are (expiry, CacheEntry, encoded size): hits need no decoding, and the budget
+    is still counted in the bytes the entry takes on the wire.
+    """
+
+    def __init__(self, max_bytes: int, on_event: Callable[[str, str], None]):
+        super().__init__(
+            maxsize=max_bytes,
+            ttu=lambda _key, value, _now: value[0],
+            timer=time.time,
+            getsizeof=lambda value: value[2],
+        )
+        self._on_event = on_event
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_event("l1", "eviction")
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for _ in expired:
+            self._on_event("l1", "expiry")
+        return expired
+
+
+class CacheEntry:
+    """A cached value with its soft (fresh) and hard (revalidate-by) expiry times."""
+
+    __slots__ = ("value", "soft_exp", "hard_exp")
+
+    def __init__(self, value: Any, soft_exp: float, hard_exp: float):
+        self.value = value
+        self.soft_exp = soft_exp
+        self.hard_exp = hard_exp
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.soft_exp
+
+    @property
+    def revalidatable(self) -> bool:
+        """Past the soft TTL but still servable while a background refresh runs."""
+        return self.soft_exp <= time.time() < self.hard_exp
+
+    def encode(self) -> bytes:
+        return default_codec.dumps({"v": self.value, "soft": self.soft_exp, "hard": self.hard_exp})
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CacheEntry":
+        obj = default_codec.loads(data)
+        if isinstance(obj, dict) and obj.keys() == {"v", "soft", "hard"}:
+            return cls(obj["v"], obj["soft"], obj["hard"])
+        # Written before soft/hard TTLs existed: the storage TTL still bounds it
+        return cls(obj, float("inf"), float("inf"))
 
 
 class Cache:
-    def __init__(self):
-        self._mem: dict[str, tuple[float, str]] = {}
-        self._r = _redis_module.Redis.from_url(REDIS_URL) if (_redis_module and REDIS_URL) else None
+    """
+    Two-tier cache: a bounded in-process L1 in front of Redis (L2).
+    Without CVRGPT_REDIS_URL the L1 is the only tier. Writes and deletes are broadcast
+    over Redis pub/sub so other workers drop their L1 copies.
+    """
+
+    def __init__(self, l1_max_bytes: int = L1_MAX_BYTES):
+        self._r = redis_client if REDIS_URL else None
+        self._l1 = _L1(l1_max_bytes, self._count)
+        self.stats: collections.Counter[str] = collections.Counter()
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional["asyncio.Task[None]"] = None
+
+    def _count(self, tier: str, event: str) -> None:
+        self.stats[f"{tier}_{event}"] += 1
+        CACHE_EVENTS.labels(tier, event).inc()
+
+    async def get(self, key: str) -> Any | None:
+        """Return the value if it is still fresh (within its soft TTL)."""
+        entry = await self.get_entry(key)
+        return entry.value if entry and entry.fresh else None
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        """Fetch several fresh values; L1 misses are read from Redis in one round trip (MGET)."""
+        entries = await self.get_entries(keys)
+        return [e.value if e and e.fresh else None for e in entries]
 
-    def get(self, key: str) -> Any | None:
+    async def get_entry(self, key: str) -> Optional["CacheEntry"]:
+        """Return the stored entry, including stale ones kept for revalidation or errors."""
+        return (await self.get_entries([key]))[0]
+
+    async def get_entries(self, keys: list[str]) -> list[Optional["CacheEntry"]]:
+        """Entries for keys; only values read from Redis are decoded, L1 hits are not."""
+        found: dict[str, CacheEntry] = {}
+        for k in keys:
+            entry = self._l1_get(k)
+            if entry is not None:
+                found[k] = entry
+        missing = [k for k in keys if k not in found]
+        if missing and self._r:
+            for k, v in zip(missing, await self._r.mget(missing), strict=True):
+                self._count("l2", "hit" if v else "miss")
+                if v:
+                    found[k] = CacheEntry.decode(v)
+                    self._l1_put(k, found[k], len(v), L1_TTL_S)
+        return [found.get(k) for k in keys]
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int,
+        stale_ttl: int = 0,
+        stale_if_error_ttl: int = 0,
+    ):
+        await self.set_many({key: value}, ttl_seconds, stale_ttl, stale_if_error_ttl)
+
+    async def set_many(
+        self,
+        items: dict[str, Any],
+        ttl_seconds: int,
+        stale_ttl: int = 0,
+        stale_if_error_ttl: int = 0,
+    ):
+        """
+        Store several keys with one pipelined round trip. Entries are fresh for ttl_seconds,
+        then served stale while revalidating for stale_ttl, then kept for stale_if_error_ttl
+        more as a fallback when the upstream fails.
+        """
+        if not items:
+            return
+        soft = time.time() + ttl_seconds
+        hard = soft + stale_ttl
+        keep = ttl_seconds + stale_ttl + stale_if_error_ttl
+        entries = {k: CacheEntry(v, soft, hard) for k, v in items.items()}
+        encoded = {k: e.encode() for k, e in entries.items()}
         if self._r:
-            v = self._r.get(key)
-            return json.loads(v) if v else None
-        v = self._mem.get(key)
-        if not v:
-            return None
-        expires_at, data = v
-        if time.time() > expires_at:
-            self._mem.pop(key, None)
-            return None
-        return json.loads(data)
-
-    def set(self, key: str, value: Any, ttl_seconds: int):
-        s = json.dumps(value, default=str)
+            async with self._r.pipeline(transaction=False) as pipe:
+                for key, s in encoded.items():
+                    pipe.setex(key, keep, s)
+                    pipe.publish(INVALIDATION_CHANNEL, f"{self._origin}:{key}")
+                await pipe.execute()
+        for key, entry in entries.items():
+            self._l1_put(key, entry, len(encoded[key]), min(keep, L1_TTL_S) if self._r else keep)
+
+    async def delete(self, *keys: str):
+        """Remove keys from both tiers and from every worker's L1."""
+        for key in keys:
+            self._l1.pop(key, None)
+        if self._r and keys:
+            async with self._r.pipeline(transaction=False) as pipe:
+                pipe.delete(*keys)
+                for key in keys:
+                    pipe.publish(INVALIDATION_CHANNEL, f"{self._origin}:{key}")
+                await pipe.execute()
+
+    async def delete_prefix(self, prefix: str) -> int:
+        """Remove every key starting with prefix from both tiers and every worker's L1."""
+        n = self._l1_drop_prefix(prefix)
         if self._r:
-            self._r.setex(key, ttl_seconds, s)
-        else:
-            self._mem[key] = (time.time() + ttl_seconds, s)
+            batch: list[bytes] = []
+            async for key in self._r.scan_iter(match=prefix + "*", count=1000):
+                batch.append(key)
+                if len(batch) >= 500:
+                    n += await self._r.delete(*batch)
+                    batch = []
+            if batch:
+                n += await self._r.delete(*batch)
+            await self._r.publish(INVALIDATION_CHANNEL, f"{self._origin}:{prefix}*")
+        return n
+
+    def _l1_drop_prefix(self, prefix: str) -> int:
+        keys = [k for k in list(self._l1.keys()) if k.startswith(prefix)]
+        for key in keys:
+            self._l1.pop(key, None)
+        return len(keys)
+
+    def _l1_get(self, key: str) -> Optional[CacheEntry]:
+        item = self._l1.get(key)
+        self._count("l1", "hit" if item else "miss")
+        return item[1] if item else None
+
+    def _l1_put(self, key: str, entry: CacheEntry, size: int, ttl_seconds: int) -> None:
+        try:
+            self._l1[key] = (time.time() + ttl_seconds, entry, size)
+        except ValueError:
+            pass  # single value larger than the whole L1 budget: serve it from L2 only
+        CACHE_L1_BYTES.set(self._l1.currsize)
+
+    async def start_invalidation_listener(self) -> None:
+        """Subscribe to invalidations from other workers. Called on app startup."""
+        if not self._r or (self._listener and not self._listener.done()):
+            return
+        self._listener = asyncio.ensure_future(self._listen())
+
+    async def stop_invalidation_listener(self) -> None:
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+        self._listener = None
+
+    async def _listen(self) -> None:
+        if self._r is None:
+            return
+        while True:
+            try:
+                async with self._r.pubsub() as ps:
+                    await ps.subscribe(INVALIDATION_CHANNEL)
+                    async for msg in ps.listen():
+                        if msg.get("type") == "message":
+                            self._on_invalidation(msg["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener failed, retrying: {e}")
+                await asyncio.sleep(1.0)
+
+    def _on_invalidation(self, data: bytes | str) -> None:
+        text = data.decode() if isinstance(data, bytes) else data
+        origin, _, key = text.partition(":")
+        if origin == self._origin:
+            return
+        if key.endswith("*"):
+            if self._l1_drop_prefix(key[:-1]):
+                self._count("l1", "invalidation")
+        elif self._l1.pop(key, None) is not None:
+            self._count("l1", "invalidation")
 
 
 cache = Cache()
 
+# In-process single-flight: one fill task per cache key, shared by all concurrent callers
+_inflight: dict[str, "asyncio.Task[Any]"] = {}
+
+# "hit", "miss" or "stale" for the most recent cached() call in this request
+cache_status: ContextVar[str] = ContextVar("cache_status", default="miss")
+
+
+def cached(
+    ttl: int,
+    key_fn: Callable[..., str],
+    lock_ttl: Optional[float] = None,
+    stale_ttl: int = 0,
+    stale_if_error_ttl: int = 0,
+):
+    """
+    Cache the result of an async function under key_fn(*args, **kwargs).
+    Concurrent misses on the same key await one shared upstream call. With lock_ttl set
+    (and Redis configured) a short cross-worker lock makes other workers wait for the
+    filling worker instead of calling upstream themselves.
+
+    After ttl the value is served stale for stale_ttl while one background refresh runs.
+    After that the call waits for a refresh, but if the upstream fails a value younger than
+    stale_if_error_ttl is served instead. cache_status reports which case applied.
+    """
 
-def cached(ttl: int, key_fn: Callable[..., str]):
     def deco(fn):
         async def wrap(*args, **kwargs):
             key = key_fn(*args, **kwargs)
-            hit = cache.get(key)
-            if hit is not None:
-                return hit
-            val = await fn(*args, **kwargs)
-            cache.set(key, val, ttl)
+            entry = await cache.get_entry(key)
+            if entry is not None and entry.fresh:
+                cache_status.set("hit")
+                return entry.value
+            opts = (ttl, lock_ttl, stale_ttl, stale_if_error_ttl)
+            if entry is not None and entry.revalidatable:
+                _start_fill(key, opts, fn, args, kwargs)
+                cache_status.set("stale")
+                return entry.value
+            try:
+                # shield: a cancelled caller must not cancel the fill other callers are awaiting
+                val = await asyncio.shield(_start_fill(key, opts, fn, args, kwargs))
+            except Exception as e:
+                if entry is None or _is_client_error(e):
+                    raise
+                logger.warning(f"Serving stale {key} after upstream error: {e}")
+                cache_status.set("stale")
+                return entry.value
+            cache_status.set("miss")
             return val
 
         return wrap
@@ -62,25 +309,153 @@ def cached(ttl: int, key_fn: Callable[..., str]):
     return deco
 
 
+_FillOpts = Tuple[int, Optional[float], int, int]  # ttl, lock_ttl, stale_ttl, stale_if_error_ttl
+
+
+def _start_fill(key: str, opts: _FillOpts, fn, args, kwargs) -> "asyncio.Task[Any]":
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fill(key, *opts, fn, args, kwargs))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _fill_done(key, t))
+    return task
+
+
+def _is_client_error(e: Exception) -> bool:
+    """Errors that are the answer (not found, bad request), not an upstream failure."""
+    if isinstance(e, HTTPException):
+        return e.status_code < 500
+    return isinstance(e, (FileNotFoundError, KeyError, ValueError))
+
+
+def _fill_done(key: str, task: "asyncio.Task[Any]") -> None:
+    if _inflight.get(key) is task:
+        _inflight.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # mark retrieved even if every caller went away
+
+
+async def _fill(
+    key: str,
+    ttl: int,
+    lock_ttl: Optional[float],
+    stale_ttl: int,
+    stale_if_error_ttl: int,
+    fn,
+    args,
+    kwargs,
+):
+    owner = await _acquire_fill_lock(key, lock_ttl)
+    try:
+        if owner is None:
+            hit = await _wait_for_fill(key, lock_ttl or 0)
+            if hit is not None:
+                return hit
+        val = await fn(*args, **kwargs)
+        await cache.set(key, val, ttl, stale_ttl, stale_if_error_ttl)
+        return val
+    finally:
+        if owner:
+            await _release_fill_lock(key, owner)
+
+
+def _lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+
+async def _acquire_fill_lock(key: str, lock_ttl: Optional[float]) -> Optional[str]:
+    """Return an owner token, or None if another worker is already filling the key."""
+    if not lock_ttl or not REDIS_URL:
+        return ""
+    owner = uuid.uuid4().hex
+    try:
+        ok = await redis_client.set(_lock_key(key), owner, nx=True, px=int(lock_ttl * 1000))
+    except Exception:
+        return ""  # Redis unavailable: fall back to in-process coordination only
+    return owner if ok else None
+
+
+async def _release_fill_lock(key: str, owner: str) -> None:
+    try:
+        await redis_client.eval(UNLOCK_SCRIPT, 1, _lock_key(key), owner)
+    except Exception:
+        pass
+
+
+async def _wait_for_fill(key: str, lock_ttl: float) -> Any | None:
+    deadline = time.time() + lock_ttl
+    while time.time() < deadline:
+        await asyncio.sleep(0.05)
+        hit = await cache.get(key)
+        if hit is not None:
+            return hit
+    return None
+
+
 def _key(prefix: str, *parts: str) -> str:
     return prefix + ":" + ":".join(parts)
 
 
 async def cache_get(key: str):
-    return cache.get(key)
+    return await cache.get(key)
 
 
 async def cache_set(key: str, data: dict, ttl: int):
-    cache.set(key, data, ttl)
+    await cache.set(key, data, ttl)
 
 
-def with_etag(request: Request, payload: dict, ttl: int) -> Response:
+def set_cache_header(resp: Response) -> Response:
+    """Expose how the last cached() call was served (hit, miss or stale)."""
+    resp.headers["x-cache"] = cache_status.get()
+    return resp
+
+
+def render_body(payload: Any) -> dict:
+    """
+    Serialize a response payload once and tag it, so the cached form can be sent as-is.
+    Cache the result of this instead of the payload and pass it to etag_response().
+    """
     body = json.dumps(payload, default=str).encode()
     etag = hashlib.md5(body, usedforsecurity=False).hexdigest()  # nosec B324
-    inm = request.headers.get("if-none-match")
-    if inm and inm == etag:
-        return Response(status_code=304)
-    resp = Response(content=body, media_type="application/json")
-    resp.headers["ETag"] = etag
-    resp.headers["Cache-Control"] = f"public, max-age={ttl}"
-    return resp
+    return {"body": body, "etag": etag}
+
+
+def _is_rendered(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and value.keys() == {"body", "etag"}
+        and isinstance(value["body"], bytes)
+    )
+
+
+def rendered_payload(value: Any) -> Any:
+    """The payload behind a cached render_body() result (or a legacy unrendered entry)."""
+    return json.loads(value["body"]) if _is_rendered(value) else value
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == "*" or tag.strip('"') == etag:
+            return True
+    return False
+
+
+def etag_response(request: Request, rendered: dict, ttl: int) -> Response:
+    """
+    Answer from a render_body() result: 304 when If-None-Match carries the stored tag,
+    otherwise the stored bytes. Nothing is deserialized or re-hashed.
+    Entries cached before bodies were pre-rendered are rendered on the fly.
+    """
+    if not _is_rendered(rendered):
+        rendered = render_body(rendered)
+    headers = {"ETag": rendered["etag"], "Cache-Control": f"public, max-age={ttl}"}
+    if _etag_matches(request.headers.get("if-none-match"), rendered["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=rendered["body"], media_type="application/json", headers=headers)
+
+
+def with_etag(request: Request, payload: dict, ttl: int) -> Response:
+    return etag_response(request, render_body(payload), ttl)
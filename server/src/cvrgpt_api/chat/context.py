@@ -0,0 +1,73 @@
+"""
+Per-turn execution context for chat tools.
+
+Provider calls made through a TurnContext are memoized by (method, args): a second call with
+the same arguments in the same turn awaits the first one instead of going upstream again,
+even while it is still in flight. Results are also kept in the thread's memo for
+CHAT_MEMO_TTL_S, so a follow-up question about the same company reuses them. At most
+CHAT_TOOL_CONCURRENCY upstream calls of one turn run at the same time.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+MEMO_TTL_S = float(os.getenv("CHAT_MEMO_TTL_S", "300"))
+MEMO_MAX_ENTRIES = 64
+TOOL_CONCURRENCY = int(os.getenv("CHAT_TOOL_CONCURRENCY", "4"))
+
+# Call key -> (time of the call, result); string keys so the memo survives the thread store
+Memo = Dict[str, Tuple[float, Any]]
+
+
+def _key(method: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    return repr((method, args, sorted(kwargs.items())))
+
+
+class TurnContext:
+    def __init__(
+        self,
+        provider: Any,
+        thread_memo: Optional[Memo] = None,
+        concurrency: int = TOOL_CONCURRENCY,
+    ):
+        self.provider = provider
+        self.thread_memo = thread_memo if thread_memo is not None else {}
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self.upstream_calls = 0
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """provider.<method>(*args, **kwargs), memoized for this turn and thread."""
+        key = _key(method, args, kwargs)
+        hit = self.thread_memo.get(key)
+        if hit is not None and time.time() - hit[0] < MEMO_TTL_S:
+            return hit[1]
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(key, method, args, kwargs))
+            self._inflight[key] = future
+        # shield: one caller being cancelled must not cancel the call for the others
+        return await asyncio.shield(future)
+
+    async def _fetch(
+        self, key: str, method: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]
+    ) -> Any:
+        try:
+            async with self._slots:
+                self.upstream_calls += 1
+                result = await getattr(self.provider, method)(*args, **kwargs)
+        except BaseException:
+            # Failures are not memoized; the next call retries
+            self._inflight.pop(key, None)
+            raise
+        self._remember(key, result)
+        return result
+
+    def _remember(self, key: str, result: Any) -> None:
+        memo = self.thread_memo
+        memo.pop(key, None)
+        memo[key] = (time.time(), result)
+        while len(memo) > MEMO_MAX_ENTRIES:
+            memo.pop(next(iter(memo)))
@@ -0,0 +1,200 @@
+"""
+Intent routing for /v1/chat.
+
+A message is mapped to a structured (action, args) pair in up to three steps, picked by
+CHAT_NLU:
+
+- local: a rule classifier (keywords, sectors, time windows, years and CVRs, as in the
+  orchestrator) resolves the common phrasings. Anything it is not sure about is left
+  unresolved rather than guessed.
+- cache: earlier LLM answers, keyed by the normalized message and the model, are reused
+  for CHAT_NLU_CACHE_TTL_S.
+- llm: only what is left goes to the model, through the shared llm.LLMClient.
+
+"hybrid" (the default) runs all three in that order, "llm" skips the classifier and "local"
+never calls the model.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from ..config import settings
+from ..llm import LLMError, llm_client
+from ..metrics import CHAT_NLU_ROUTES
+from .orchestrator import CVR_RE, _parse_years
+
+logger = logging.getLogger(__name__)
+
+Action = Tuple[str, Dict[str, Any]]
+
+SYSTEM_PROMPT = (
+    "You map user queries about Danish companies into JSON actions. "
+    "Only return JSON. Supported actions: \n"
+    "- events_search: args: {event_type: string (e.g., bankruptcy), nace_prefixes: string[], "
+    "last_n_months: int}\n"
+    "- annual_result: args: {company: string, year: int}\n"
+    'If no suitable action, return {"action": "none"}.'
+)
+
+BANKRUPTCY_WORDS = ("bankrupt", "konkurs", "insolven")
+ANNUAL_RESULT_WORDS = ("annual result", "årets resultat", "årsresultat", "net result")
+
+# Sector words -> NACE prefixes
+SECTORS: List[Tuple[re.Pattern, List[str]]] = [
+    (re.compile(r"\bIT\b|(?i:\bit[- ](?:sector|sektor|branche|industry)\b|\bsoftware\b)"), ["62"]),
+    (re.compile(r"\brestaurant|\brestauration|\bhospitality\b", re.I), ["56"]),
+    (re.compile(r"\bconstruction\b|\bbyggeri|\bbygge", re.I), ["41", "42", "43"]),
+    (re.compile(r"\bretail\b|\bdetailhandel", re.I), ["47"]),
+    (re.compile(r"\btransport|\blogisti", re.I), ["49"]),
+]
+NACE_RE = re.compile(r"\b(?:nace|branchekode)\s*:?\s*((?:\d{2,6}\s*(?:,|and|og)?\s*)+)", re.I)
+
+WINDOW_RE = re.compile(
+    r"\b(?:last|past|previous|sidste|seneste)\s+(\d{1,3})\s*"
+    r"(months?|måneder|måned|weeks?|uger?|days?|dage?)\b"
+)
+WINDOW_WORDS = {
+    "last month": 1,
+    "past month": 1,
+    "sidste måned": 1,
+    "last quarter": 3,
+    "past quarter": 3,
+    "last year": 12,
+    "past year": 12,
+    "sidste år": 12,
+}
+DEFAULT_MONTHS = 3
+
+COMPANY_RES = [
+    # "... of Demo IT ApS in 2022", "... for Demo IT ApS i 2022"
+    re.compile(
+        r"\b(?:of|for|af|fra)\s+(?P<company>.+?)\s+(?:in|i|for)\s+"
+        r"(?:(?:fiscal\s+)?year\s+|regnskabsåret\s+)?(?:19|20)\d{2}\b",
+        re.I,
+    ),
+    # "... 2022 for Demo IT ApS"
+    re.compile(r"\b(?:19|20)\d{2}\s+(?:of|for|af|fra)\s+(?P<company>.+?)\s*[?.!]*$", re.I),
+]
+
+CACHE_TTL_S = float(os.getenv("CHAT_NLU_CACHE_TTL_S", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CHAT_NLU_CACHE_SIZE", "4096"))
+_cache: "TTLCache[Tuple[str, str], Action]" = TTLCache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_S)
+
+
+def normalize(text: str) -> str:
+    """Cache key form of a message: case-folded, single-spaced, without trailing punctuation."""
+    return re.sub(r"\s+", " ", text).strip().strip("?!.").strip().casefold()
+
+
+def _months(t: str) -> int:
+    m = WINDOW_RE.search(t)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        if unit.startswith(("week", "uge")):
+            return max(1, math.ceil(n / 4.345))
+        if unit.startswith(("day", "dag")):
+            return max(1, math.ceil(n / 30))
+        return max(1, n)
+    return next((v for k, v in WINDOW_WORDS.items() if k in t), DEFAULT_MONTHS)
+
+
+def _nace(text: str) -> Optional[List[str]]:
+    m = NACE_RE.search(text)
+    if m:
+        return re.findall(r"\d{2,6}", m.group(1))
+    for pattern, prefixes in SECTORS:
+        if pattern.search(text):
+            return list(prefixes)
+    return None
+
+
+def _company(text: str) -> Optional[str]:
+    cvrs = CVR_RE.findall(text)
+    if len(cvrs) == 1:
+        return cvrs[0]
+    for pattern in COMPANY_RES:
+        m = pattern.search(text)
+        if m:
+            company = m.group("company").strip().strip("\"'“”")
+            if 2 <= len(company) <= 80:
+                return company
+    return None
+
+
+def classify_local(text: str) -> Optional[Action]:
+    """The action for a message in one of the common phrasings, or None if unsure."""
+    t = text.lower()
+    bankruptcy = any(w in t for w in BANKRUPTCY_WORDS)
+    annual = any(w in t for w in ANNUAL_RESULT_WORDS)
+    if bankruptcy == annual:  # neither, or both
+        return None
+    if bankruptcy:
+        nace = _nace(text)
+        if nace is None:  # which sector to show is for the model to guess, not us
+            return None
+        args = {"event_type": "bankruptcy", "nace_prefixes": nace, "last_n_months": _months(t)}
+        return "events_search", args
+    years = _parse_years(text)
+    company = _company(text)
+    if len(years) != 1 or company is None:
+        return None
+    return "annual_result", {"company": company, "year": years[0]}
+
+
+async def llm_action(text: str) -> Optional[Action]:
+    """
+    (action, args) from the LLM; ("none", {}) if it found no suitable action, or None when
+    the model is not configured or the call failed.
+    """
+    model = os.getenv("CHAT_NLU_MODEL", "gpt-4o-mini")
+    try:
+        data = await llm_client.chat(
+            model,
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"Query: {text}\nReturn JSON only."},
+            ],
+            response_format={"type": "json_object"},
+        )
+    except LLMError as e:
+        logger.warning(f"Chat NLU LLM failed: {e}")
+        return None
+    content = ((data.get("choices") or [{}])[0].get("message") or {}).get("content") or "{}"
+    obj = json.loads(content)
+    return (obj.get("action") or "none").lower(), obj.get("args") or {}
+
+
+async def route(text: str, mode: Optional[str] = None) -> Optional[Action]:
+    """The action for a message, or None if it could not be resolved (see module docstring)."""
+    mode = mode or settings.chat_nlu
+    if mode != "llm":
+        local = classify_local(text)
+        if local is not None:
+            CHAT_NLU_ROUTES.labels("local").inc()
+            return local
+        if mode == "local":
+            CHAT_NLU_ROUTES.labels("unresolved").inc()
+            return None
+    key = (os.getenv("CHAT_NLU_MODEL", "gpt-4o-mini"), normalize(text))
+    hit = _cache.get(key)
+    if hit is not None:
+        CHAT_NLU_ROUTES.labels("cache").inc()
+        return hit
+    routed = await llm_action(text)
+    if routed is None:
+        CHAT_NLU_ROUTES.labels("unresolved").inc()
+        return None
+    # "none" answers are cached too: asking again would not change them
+    _cache[key] = routed
+    CHAT_NLU_ROUTES.labels("llm").inc()
+    return routed
+
+
+def clear_cache() -> None:
+    _cache.clear()
@@ -1,5 +1,9 @@
+import asyncio
 import re
-from typing import List, Union
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
 from .schemas import (
     ChatRequest,
     ChatResponse,
@@ -9,7 +13,10 @@ from .schemas import (
     ChoiceBlock,
     ChoiceItem,
 )
-from .state import get_or_create_thread, get_ctx, set_ctx, set_last_table
+from cvrgpt_core.providers.factory import get_provider
+from .context import TurnContext
+from .streaming import ChatEvent
+from .state import Thread, load_thread, save_thread, set_last_table
 from .tools import tool_search_company, tool_get_company, tool_get_financials, tool_list_filings
 
 CVR_RE = re.compile(r"\b(\d{8})\b")  # DK CVR is 8 digits
@@ -20,12 +27,14 @@ def _parse_years(text: str) -> List[int]:
     return sorted(set(years))[-5:]
 
 
-def _intent(text: str) -> str:
+def _intents(text: str) -> List[str]:
+    """Every intent the message asks for, in answer order; "profile" if none."""
     t = text.lower()
+    intents = []
     if "filing" in t or "rapport" in t or "annual report" in t:
-        return "filings"
+        intents.append("filings")
     if "compare" in t or "vs" in t:
-        return "compare"
+        intents.append("compare")
     if any(
         k in t
         for k in [
@@ -38,12 +47,12 @@ def _intent(text: str) -> str:
             "turnover",
             "omsætning",
         ]
-    ):
-        return "financials"
-    return "profile"
+    ) and "compare" not in intents:  # a comparison already shows the figures
+        intents.append("financials")
+    return intents or ["profile"]
 
 
-async def _resolve_company(text: str, ctx_company_cvr: str | None):
+async def _resolve_company(text: str, ctx_company_cvr: str | None, turn: TurnContext):
     cvrs = CVR_RE.findall(text)
     if cvrs:
         return cvrs[0], None
@@ -51,7 +60,7 @@ async def _resolve_company(text: str, ctx_company_cvr: str | None):
     tokens = [w for w in re.split(r"[^A-Za-z0-9\-]+", text) if w]
     query = " ".join(tokens[:5]) if tokens else ""
     if query:
-        matches = await tool_search_company(query=query, limit=5)
+        matches = await tool_search_company(query=query, limit=5, ctx=turn)
         if len(matches) == 1:
             return matches[0]["cvr"], None
         if len(matches) > 1:
@@ -60,114 +69,171 @@ async def _resolve_company(text: str, ctx_company_cvr: str | None):
 
 
 async def handle_chat(req: ChatRequest) -> ChatResponse:
-    thread_id = get_or_create_thread(req.thread_id)
+    thread_id, blocks = "", []
+    async for event, data in _turn(req):
+        if event == "start":
+            thread_id = data["thread_id"]
+        elif event == "block":
+            blocks.append(data)
+    return ChatResponse(thread_id=thread_id, blocks=blocks)
+
+
+async def stream_chat(req: ChatRequest) -> AsyncIterator[ChatEvent]:
+    """The turn as (event, data) pairs for chat.streaming; blocks are sent as they are ready."""
+    thread_id = ""
+    async for event, data in _turn(req):
+        if event == "start":
+            thread_id = data["thread_id"]
+        yield event, data.model_dump() if isinstance(data, BaseModel) else data
+    yield "done", {"thread_id": thread_id}
+
+
+def _progress(step: str, message: str) -> ChatEvent:
+    return "progress", {"step": step, "message": message}
+
+
+async def _turn(req: ChatRequest) -> AsyncIterator[ChatEvent]:
+    thread = await load_thread(req.thread_id)
+    try:
+        async for event in _answer(req, thread):
+            yield event
+    finally:
+        # Context and memo are written back once per turn, however it ended
+        await save_thread(thread)
+
+
+async def _answer(req: ChatRequest, thread: Thread) -> AsyncIterator[ChatEvent]:
+    thread_id = thread.thread_id
+    yield "start", {"thread_id": thread_id}
     user_msg = next((m.content for m in reversed(req.messages) if m.role == "user"), "").strip()
-    ctx = get_ctx(thread_id)
+    ctx = thread.ctx
     if req.cvr:
         ctx["cvr"] = req.cvr
     if req.years:
         ctx["years"] = req.years
 
     # 1) resolve company (allow using context)
-    cvr, choices = await _resolve_company(user_msg, ctx.get("cvr"))
+    yield _progress("resolve_company", "Finding the company")
+    turn = TurnContext(get_provider(), thread.memo)
+    cvr, choices = await _resolve_company(user_msg, ctx.get("cvr"), turn)
     if choices is not None:
-        return ChatResponse(
-            thread_id=thread_id,
-            blocks=[
-                ChoiceBlock(
-                    prompt="I found multiple companies. Pick one:",
-                    choices=[
-                        ChoiceItem(
-                            id=str(c["cvr"]),
-                            label=f"{c['name']} ({c['cvr']})",
-                            description=c.get("city"),
-                        )
-                        for c in choices
-                    ],
+        yield "block", ChoiceBlock(
+            prompt="I found multiple companies. Pick one:",
+            choices=[
+                ChoiceItem(
+                    id=str(c["cvr"]),
+                    label=f"{c['name']} ({c['cvr']})",
+                    description=c.get("city"),
                 )
+                for c in choices
             ],
         )
+        return
     if not cvr:
-        return ChatResponse(
-            thread_id=thread_id,
-            blocks=[TextBlock(text="Please provide a company name or CVR (8 digits).")],
-        )
+        yield "block", TextBlock(text="Please provide a company name or CVR (8 digits).")
+        return
 
-    set_ctx(thread_id, cvr=cvr)
+    ctx["cvr"] = cvr
 
-    # 2) choose intent & years
-    intent = _intent(user_msg)
+    # 2) choose intents & years
+    intents = _intents(user_msg)
     years = _parse_years(user_msg) or ctx.get("years")
 
-    blocks: List[Union[TextBlock, CardBlock, TableBlock, ChoiceBlock]] = []
-
-    if intent == "profile":
-        comp = await tool_get_company(cvr)
-        blocks.append(
-            CardBlock(
-                title=f"{comp.get('name', '')} · {cvr}",
-                kv={
-                    "Status": comp.get("status", ""),
-                    "City": comp.get("city", ""),
-                    "Industry": comp.get("nace", ""),
-                    "Last accounts year": str(comp.get("last_accounts_year", "")),
-                },
-            )
-        )
-        blocks.append(
-            TextBlock(text="Ask for revenue, EBITDA, equity, employees, filings, or a comparison.")
+    # 3) run the lookups for every intent concurrently, answer in intent order
+    for intent in intents:
+        yield _progress(intent, _STEP_MESSAGES[intent].format(cvr=cvr))
+    tasks = [asyncio.ensure_future(_STEPS[i](turn, cvr, years)) for i in intents]
+    try:
+        for task in tasks:
+            for block in await task:
+                if isinstance(block, TableBlock):
+                    await set_last_table(
+                        thread_id,
+                        {"columns": block.columns, "rows": block.rows, "caption": block.caption},
+                    )
+                yield "block", block
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+Block = Union[TextBlock, CardBlock, TableBlock]
+
+_STEP_MESSAGES = {
+    "profile": "Fetching the company profile for {cvr}",
+    "financials": "Fetching financials for {cvr}",
+    "filings": "Fetching filings for {cvr}",
+    "compare": "Fetching financials for {cvr}",
+}
+
+
+async def _profile(turn: TurnContext, cvr: str, years: Optional[List[int]]) -> List[Block]:
+    comp = await tool_get_company(cvr, ctx=turn)
+    return [
+        CardBlock(
+            title=f"{comp.get('name', '')} · {cvr}",
+            kv={
+                "Status": comp.get("status", ""),
+                "City": comp.get("city", ""),
+                "Industry": comp.get("nace", ""),
+                "Last accounts year": str(comp.get("last_accounts_year", "")),
+            },
+        ),
+        TextBlock(text="Ask for revenue, EBITDA, equity, employees, filings, or a comparison."),
+    ]
+
+
+async def _financials(turn: TurnContext, cvr: str, years: Optional[List[int]]) -> List[Block]:
+    fin = await tool_get_financials(cvr=cvr, years=years, metrics=None, ctx=turn)
+    cols = ["Year", "Revenue", "EBIT", "EBITDA", "Net income", "Equity", "Employees"]
+    rows = []
+    for y in fin.get("years", []):
+        rows.append(
+            [
+                str(y),
+                fin.get("revenue", {}).get(str(y), "—"),
+                fin.get("ebit", {}).get(str(y), "—"),
+                fin.get("ebitda", {}).get(str(y), "—"),
+                fin.get("net_income", {}).get(str(y), "—"),
+                fin.get("equity", {}).get(str(y), "—"),
+                fin.get("employees", {}).get(str(y), "—"),
+            ]
         )
-
-    elif intent == "financials":
-        fin = await tool_get_financials(cvr=cvr, years=years, metrics=None)
-        cols = ["Year", "Revenue", "EBIT", "EBITDA", "Net income", "Equity", "Employees"]
-        rows = []
-        for y in fin.get("years", []):
-            rows.append(
-                [
-                    str(y),
-                    fin.get("revenue", {}).get(str(y), "—"),
-                    fin.get("ebit", {}).get(str(y), "—"),
-                    fin.get("ebitda", {}).get(str(y), "—"),
-                    fin.get("net_income", {}).get(str(y), "—"),
-                    fin.get("equity", {}).get(str(y), "—"),
-                    fin.get("employees", {}).get(str(y), "—"),
-                ]
-            )
-        tbl = TableBlock(
+    return [
+        TableBlock(
             caption=f"Financials for {cvr}",
             columns=cols,
             rows=rows,
             footnote="All figures as reported in CVR. Year = reporting year.",
         )
-        blocks.append(tbl)
-        set_last_table(thread_id, {"columns": cols, "rows": rows, "caption": tbl.caption})
-
-    elif intent == "filings":
-        filings = await tool_list_filings(cvr, limit=5)
-        cols = ["Date", "Type", "Id/Link"]
-        rows = [[f.get("date", ""), f.get("type", ""), f.get("id", "")] for f in filings]
-        tbl = TableBlock(caption=f"Latest filings for {cvr}", columns=cols, rows=rows)
-        blocks.append(tbl)
-        set_last_table(thread_id, {"columns": cols, "rows": rows, "caption": tbl.caption})
-
-    elif intent == "compare":
-        # MVP: compare the same company across years
-        yrs = years or []
-        if len(yrs) < 2:
-            blocks.append(
-                TextBlock(
-                    text="Please specify at least two years to compare (e.g., 2021 and 2023)."
-                )
-            )
-        else:
-            fin = await tool_get_financials(cvr=cvr, years=yrs, metrics=["revenue", "ebitda"])
-            cols = ["Metric"] + [str(y) for y in yrs]
-            rows = []
-            for metric in ["revenue", "ebitda"]:
-                rows.append([metric.upper()] + [fin.get(metric, {}).get(str(y), "—") for y in yrs])
-            tbl = TableBlock(caption=f"Comparison for {cvr}", columns=cols, rows=rows)
-            blocks.append(tbl)
-            set_last_table(thread_id, {"columns": cols, "rows": rows, "caption": tbl.caption})
+    ]
 
-    return ChatResponse(thread_id=thread_id, blocks=blocks)
+
+async def _filings(turn: TurnContext, cvr: str, years: Optional[List[int]]) -> List[Block]:
+    filings = await tool_list_filings(cvr, limit=5, ctx=turn)
+    cols = ["Date", "Type", "Id/Link"]
+    rows = [[f.get("date", ""), f.get("type", ""), f.get("id", "")] for f in filings]
+    return [TableBlock(caption=f"Latest filings for {cvr}", columns=cols, rows=rows)]
+
+
+async def _compare(turn: TurnContext, cvr: str, years: Optional[List[int]]) -> List[Block]:
+    # MVP: compare the same company across years
+    yrs = years or []
+    if len(yrs) < 2:
+        return [
+            TextBlock(text="Please specify at least two years to compare (e.g., 2021 and 2023).")
+        ]
+    fin = await tool_get_financials(cvr=cvr, years=yrs, metrics=["revenue", "ebitda"], ctx=turn)
+    cols = ["Metric"] + [str(y) for y in yrs]
+    rows = []
+    for metric in ["revenue", "ebitda"]:
+        rows.append([metric.upper()] + [fin.get(metric, {}).get(str(y), "—") for y in yrs])
+    return [TableBlock(caption=f"Comparison for {cvr}", columns=cols, rows=rows)]
+
+
+_STEPS: Dict[str, Callable[[TurnContext, str, Optional[List[int]]], Awaitable[List[Block]]]] = {
+    "profile": _profile,
+    "financials": _financials,
+    "filings": _filings,
+    "compare": _compare,
+}
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from io import StringIO
 from .schemas import ChatRequest, ChatResponse
-from .orchestrator import handle_chat
+from .orchestrator import handle_chat, stream_chat
+from .streaming import stream_response
 from .state import get_last_table
 from ..security import require_api_key
 
@@ -15,10 +16,16 @@ async def chat(req: ChatRequest, _: str = Depends(require_api_key)):
     return await handle_chat(req)
 
 
+@router.post("/stream")
+async def chat_stream(req: ChatRequest, request: Request, _: str = Depends(require_api_key)):
+    """Same turn as POST /chat, streamed: progress events and each block as soon as it is ready"""
+    return stream_response(request, stream_chat(req))
+
+
 @router.get("/export")
 async def export_csv(thread_id: str, _: str = Depends(require_api_key)):
     """Export the last table from a chat thread as CSV"""
-    tbl = get_last_table(thread_id)
+    tbl = await get_last_table(thread_id)
     if not tbl:
         raise HTTPException(status_code=400, detail="No table to export in this thread.")
 
@@ -1,31 +1,158 @@
+"""
+Chat thread state.
+
+A thread holds the conversation context (resolved CVR, years), the provider memo of
+chat.context and the last table shown, for /chat/export. Two backends, picked by CHAT_STORE:
+
+- memory (default): per-process LRU of at most CHAT_MAX_THREADS threads; a thread expires
+  CHAT_THREAD_TTL_S after it was last used.
+- redis: one hash per thread with the same sliding expiry, so every worker sees the same
+  threads and nothing is kept in process memory.
+
+Tables and memos are stored encoded with the cache codec (compressed when large), so a
+thread costs a few KB however big its last table was.
+"""
+
 import time
 import uuid
-from typing import Dict, Any
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..codec import default_codec
+from ..config import settings
+from .context import Memo
+
+
+class Thread:
+    __slots__ = ("thread_id", "ctx", "memo")
+
+    def __init__(self, thread_id: str, ctx: Optional[dict] = None, memo: Optional[dict] = None):
+        self.thread_id = thread_id
+        self.ctx: Dict[str, Any] = ctx or {}
+        self.memo: Memo = memo or {}
+
+
+class ThreadStore(ABC):
+    @abstractmethod
+    async def load(self, thread_id: str) -> Optional[Dict[str, bytes]]:
+        """The thread's encoded ctx and memo, or None if unknown or expired."""
+
+    @abstractmethod
+    async def save(self, thread_id: str, fields: Dict[str, bytes]) -> None: ...
+
+    @abstractmethod
+    async def get_field(self, thread_id: str, field: str) -> Optional[bytes]: ...
+
+
+class MemoryThreadStore(ThreadStore):
+    def __init__(self, max_threads: int, ttl_s: float):
+        self.max_threads = max_threads
+        self.ttl_s = ttl_s
+        # thread_id -> (expires_at, fields); most recently used last
+        self._threads: "OrderedDict[str, Tuple[float, Dict[str, bytes]]]" = OrderedDict()
+
+    def _touch(self, thread_id: str) -> Optional[Dict[str, bytes]]:
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self._threads[thread_id]
+            return None
+        self._threads[thread_id] = (time.time() + self.ttl_s, entry[1])
+        self._threads.move_to_end(thread_id)
+        return entry[1]
+
+    async def load(self, thread_id: str) -> Optional[Dict[str, bytes]]:
+        return self._touch(thread_id)
+
+    async def save(self, thread_id: str, fields: Dict[str, bytes]) -> None:
+        current = self._touch(thread_id) or {}
+        self._threads[thread_id] = (time.time() + self.ttl_s, {**current, **fields})
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    async def get_field(self, thread_id: str, field: str) -> Optional[bytes]:
+        fields = self._touch(thread_id)
+        return fields.get(field) if fields else None
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+    def clear(self) -> None:
+        self._threads.clear()
+
+
+class RedisThreadStore(ThreadStore):
+    def __init__(self, client: Any, ttl_s: float, prefix: str = "cvrgpt:chat:thread:"):
+        self._r = client
+        self.ttl_s = int(ttl_s)
+        self.prefix = prefix
+
+    async def load(self, thread_id: str) -> Optional[Dict[str, bytes]]:
+        key = self.prefix + thread_id
+        async with self._r.pipeline(transaction=False) as pipe:
+            pipe.hmget(key, "ctx", "memo")
+            pipe.expire(key, self.ttl_s)
+            (ctx, memo), exists = await pipe.execute()
+        if not exists:
+            return None
+        return {k: v for k, v in (("ctx", ctx), ("memo", memo)) if v is not None}
+
+    async def save(self, thread_id: str, fields: Dict[str, bytes]) -> None:
+        key = self.prefix + thread_id
+        async with self._r.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl_s)
+            await pipe.execute()
+
+    async def get_field(self, thread_id: str, field: str) -> Optional[bytes]:
+        key = self.prefix + thread_id
+        async with self._r.pipeline(transaction=False) as pipe:
+            pipe.hget(key, field)
+            pipe.expire(key, self.ttl_s)
+            value, _ = await pipe.execute()
+        return value
+
+
+def _make_store() -> ThreadStore:
+    if settings.chat_store == "redis":
+        from ..redis_client import redis_client
 
-_STORE: Dict[str, Dict[str, Any]] = {}
+        return RedisThreadStore(redis_client, settings.chat_thread_ttl_s)
+    return MemoryThreadStore(settings.chat_max_threads, settings.chat_thread_ttl_s)
 
 
-def get_or_create_thread(thread_id: str | None) -> str:
-    if thread_id and thread_id in _STORE:
-        return thread_id
-    tid = str(uuid.uuid4())
-    _STORE[tid] = {"created_at": time.time(), "ctx": {}, "last_table": None}
-    return tid
+_STORE: ThreadStore = _make_store()
 
 
-def get_ctx(thread_id: str) -> dict:
-    return _STORE[thread_id]["ctx"]
+async def load_thread(thread_id: str | None) -> Thread:
+    """
+    The thread's state, or a new thread if thread_id is unknown or has expired. A new thread
+    is stored by the first save_thread.
+    """
+    fields = await _STORE.load(thread_id) if thread_id else None
+    if fields is None:
+        return Thread(str(uuid.uuid4()))
+    return Thread(
+        thread_id,  # type: ignore[arg-type]
+        ctx=default_codec.loads(fields["ctx"]) if "ctx" in fields else None,
+        memo=default_codec.loads(fields["memo"]) if "memo" in fields else None,
+    )
 
 
-def set_ctx(thread_id: str, **kv):
-    _STORE[thread_id]["ctx"].update(kv)
+async def save_thread(thread: Thread) -> None:
+    await _STORE.save(
+        thread.thread_id,
+        {"ctx": default_codec.dumps(thread.ctx), "memo": default_codec.dumps(thread.memo)},
+    )
 
 
-def set_last_table(thread_id: str, table_payload: dict | None):
-    _STORE[thread_id]["last_table"] = table_payload
+async def set_last_table(thread_id: str, table_payload: dict | None):
+    await _STORE.save(thread_id, {"last_table": default_codec.dumps(table_payload)})
 
 
-def get_last_table(thread_id: str):
-    if thread_id not in _STORE:
-        return None
-    return _STORE[thread_id].get("last_table")
+async def get_last_table(thread_id: str):
+    data = await _STORE.get_field(thread_id, "last_table")
+    return default_codec.loads(data) if data else None
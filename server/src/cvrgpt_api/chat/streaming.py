@@ -0,0 +1,52 @@
+"""
+Streaming transport for chat turns.
+
+A turn is a sequence of (event, data) pairs: "start" with the thread id, "progress" before
+each upstream step, one "block" per response block as soon as it is ready, then "done" (or
+"error" if a step fails after the response has started). They are written as server-sent
+events by default, or as NDJSON ({"event": ..., "data": ...} per line) when the client
+sends Accept: application/x-ndjson.
+"""
+
+import json
+import logging
+from typing import Any, AsyncIterator, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+ChatEvent = Tuple[str, Any]
+
+NDJSON = "application/x-ndjson"
+SSE = "text/event-stream"
+
+
+def encode_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def encode_ndjson(event: str, data: Any) -> str:
+    return json.dumps({"event": event, "data": data}, default=str) + "\n"
+
+
+def stream_response(request: Request, events: AsyncIterator[ChatEvent]) -> StreamingResponse:
+    ndjson = NDJSON in request.headers.get("accept", "")
+    encode = encode_ndjson if ndjson else encode_sse
+
+    async def body() -> AsyncIterator[str]:
+        try:
+            async for event, data in events:
+                yield encode(event, data)
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            logger.warning(f"Chat stream failed: {e}")
+            yield encode("error", {"message": str(e)})
+
+    return StreamingResponse(
+        body(),
+        media_type=NDJSON if ndjson else SSE,
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
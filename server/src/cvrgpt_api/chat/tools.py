@@ -1,8 +1,11 @@
-from typing import List, Dict, Any
+import math
+from typing import List, Dict, Any, Optional
 from decimal import Decimal
 
 # Import from the new factory to avoid circular imports
 from cvrgpt_core.providers.factory import get_provider
+from ..financials_store import get_financials_store
+from .context import TurnContext
 
 
 def _s(v):
@@ -10,27 +13,43 @@ def _s(v):
     return str(v) if isinstance(v, Decimal) else ("" if v is None else str(v))
 
 
-async def tool_search_company(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+async def _call(ctx: Optional[TurnContext], method: str, *args: Any, **kwargs: Any) -> Any:
+    """Provider call, through the turn's memo when there is one"""
+    if ctx is not None:
+        return await ctx.call(method, *args, **kwargs)
+    return await getattr(get_provider(), method)(*args, **kwargs)
+
+
+async def tool_search_company(
+    query: str, limit: int = 10, ctx: Optional[TurnContext] = None
+) -> List[Dict[str, Any]]:
     """Search for companies by name or CVR"""
-    provider = get_provider()
-    result = await provider.search_companies(query, limit=min(max(limit, 1), 25))
+    result = await _call(ctx, "search_companies", query, limit=min(max(limit, 1), 25))
     return result.get("items", [])
 
 
-async def tool_get_company(cvr: str) -> Dict[str, Any]:
+async def tool_get_company(cvr: str, ctx: Optional[TurnContext] = None) -> Dict[str, Any]:
     """Get company details by CVR"""
-    provider = get_provider()
-    result = await provider.get_company(cvr)
+    result = await _call(ctx, "get_company", cvr)
     return result.get("company", {})
 
 
 async def tool_get_financials(
-    cvr: str, years: List[int] | None, metrics: List[str] | None
+    cvr: str,
+    years: List[int] | None,
+    metrics: List[str] | None,
+    ctx: Optional[TurnContext] = None,
 ) -> Dict[str, Any]:
     """Get financial data for a company"""
-    provider = get_provider()
+    store = get_financials_store()
+    if store is not None:
+        # All stored years come straight from the columnar store, no upstream call
+        cols = store.company_years(cvr, years=years)
+        if cols["year"]:
+            return _financials_from_columns(cols)
+
     try:
-        result = await provider.get_latest_accounts(cvr)
+        result = await _call(ctx, "get_latest_accounts", cvr)
         accounts_data = result.get("accounts", {})
 
         if not accounts_data:
@@ -88,10 +107,36 @@ async def tool_get_financials(
         }
 
 
-async def tool_list_filings(cvr: str, limit: int = 5) -> List[Dict[str, Any]]:
+def _s_float(v):
+    """stringify a stored float64 amount like the provider's Decimal ("1500000", not "1500000.0")"""
+    if v is None or math.isnan(v):
+        return ""
+    return str(int(v)) if v.is_integer() else str(Decimal(repr(v)))
+
+
+def _financials_from_columns(cols: Dict[str, List[Any]]) -> Dict[str, Any]:
+    financials: Dict[str, Any] = {"years": cols["year"]}
+    for metric, source in (
+        ("revenue", "revenue"),
+        ("ebit", "ebit"),
+        ("ebitda", "ebit"),  # Using EBIT as EBITDA fallback
+        ("net_income", "net_income"),
+        ("equity", "equity"),
+    ):
+        values = zip(cols["year"], cols[source], strict=True)
+        financials[metric] = {str(y): _s_float(v) for y, v in values}
+    financials["employees"] = {
+        str(y): "—" if v is None else _s_float(v)
+        for y, v in zip(cols["year"], cols["employees"], strict=True)
+    }
+    return financials
+
+
+async def tool_list_filings(
+    cvr: str, limit: int = 5, ctx: Optional[TurnContext] = None
+) -> List[Dict[str, Any]]:
     """List filings for a company"""
-    provider = get_provider()
-    result = await provider.list_filings(cvr, limit=min(max(limit, 1), 50))
+    result = await _call(ctx, "list_filings", cvr, limit=min(max(limit, 1), 50))
     filings = result.get("filings", [])
 
     # Normalize filing data structure
@@ -0,0 +1,170 @@
+"""
+Binary serialization for cached payloads.
+
+Every blob starts with a 3-byte header: MAGIC, codec id, compression id. Readers accept
+every codec they know, so a new format can be rolled out (or rolled back) by changing
+CVRGPT_CACHE_CODEC without flushing Redis. Blobs without the header are legacy JSON text.
+Decimal values round-trip losslessly in every codec.
+"""
+
+import base64
+import json
+import os
+import zlib
+from decimal import Decimal
+from typing import Any, Callable, Dict, Tuple
+
+try:
+    import msgpack  # type: ignore
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard  # type: ignore
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None  # type: ignore
+    ZSTD_AVAILABLE = False
+
+try:
+    import lz4.frame  # type: ignore
+
+    LZ4_AVAILABLE = True
+except ImportError:
+    lz4 = None  # type: ignore
+    LZ4_AVAILABLE = False
+
+# 0xC1 is never used by msgpack and never starts a JSON document
+MAGIC = b"\xc1"
+
+CODEC_JSON = 1
+CODEC_MSGPACK = 2
+
+COMPRESS_NONE = 0
+COMPRESS_ZLIB = 1
+COMPRESS_ZSTD = 2
+COMPRESS_LZ4 = 3
+
+_EXT_DECIMAL = 1
+
+
+# --- codecs ---
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return {"__decimal__": str(obj)}
+    if isinstance(obj, bytes):
+        return {"__bytes__": base64.b64encode(obj).decode()}
+    return str(obj)
+
+
+def _json_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "__decimal__" in obj:
+            return Decimal(obj["__decimal__"])
+        if "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data, object_hook=_json_hook)
+
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode())
+    return str(obj)
+
+
+def _msgpack_ext(code: int, data: bytes) -> Any:
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_msgpack_ext, raw=False, strict_map_key=False)
+
+
+_CODECS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    CODEC_JSON: (_json_dumps, _json_loads),
+}
+if MSGPACK_AVAILABLE:
+    _CODECS[CODEC_MSGPACK] = (_msgpack_dumps, _msgpack_loads)
+
+
+# --- compression ---
+_COMPRESSORS: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    COMPRESS_ZLIB: (lambda b: zlib.compress(b, 6), zlib.decompress),
+}
+if ZSTD_AVAILABLE:
+    _COMPRESSORS[COMPRESS_ZSTD] = (
+        lambda b: zstandard.ZstdCompressor(level=3).compress(b),
+        lambda b: zstandard.ZstdDecompressor().decompress(b),
+    )
+if LZ4_AVAILABLE:
+    _COMPRESSORS[COMPRESS_LZ4] = (lz4.frame.compress, lz4.frame.decompress)
+
+_CODEC_NAMES = {"json": CODEC_JSON, "msgpack": CODEC_MSGPACK}
+_COMPRESS_NAMES = {
+    "none": COMPRESS_NONE,
+    "zlib": COMPRESS_ZLIB,
+    "zstd": COMPRESS_ZSTD,
+    "lz4": COMPRESS_LZ4,
+}
+
+
+class Codec:
+    """Encoder for one configured format; decodes every known format."""
+
+    def __init__(self, codec: str, compression: str, compress_min_bytes: int):
+        self.codec_id = _CODEC_NAMES.get(codec, CODEC_JSON)
+        if self.codec_id not in _CODECS:
+            self.codec_id = CODEC_JSON
+        self.compress_id = _COMPRESS_NAMES.get(compression, COMPRESS_NONE)
+        if self.compress_id not in _COMPRESSORS:
+            self.compress_id = COMPRESS_NONE
+        self.compress_min_bytes = compress_min_bytes
+
+    def dumps(self, value: Any) -> bytes:
+        body = _CODECS[self.codec_id][0](value)
+        compress_id = COMPRESS_NONE
+        if self.compress_id != COMPRESS_NONE and len(body) >= self.compress_min_bytes:
+            compress_id = self.compress_id
+            body = _COMPRESSORS[compress_id][0](body)
+        return MAGIC + bytes((self.codec_id, compress_id)) + body
+
+    @staticmethod
+    def loads(data: bytes | str) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data.startswith(MAGIC):
+            return json.loads(data)  # legacy entry written as plain JSON text
+        codec_id, compress_id = data[1], data[2]
+        body = data[3:]
+        if compress_id != COMPRESS_NONE:
+            if compress_id not in _COMPRESSORS:
+                raise ValueError(f"Unsupported cache compression id {compress_id}")
+            body = _COMPRESSORS[compress_id][1](body)
+        if codec_id not in _CODECS:
+            raise ValueError(f"Unsupported cache codec id {codec_id}")
+        return _CODECS[codec_id][1](body)
+
+
+default_codec = Codec(
+    codec=os.getenv("CVRGPT_CACHE_CODEC", "msgpack" if MSGPACK_AVAILABLE else "json"),
+    compression=os.getenv("CVRGPT_CACHE_COMPRESSION", "zstd" if ZSTD_AVAILABLE else "zlib"),
+    compress_min_bytes=int(os.getenv("CVRGPT_CACHE_COMPRESS_MIN_BYTES", "1024")),
+)
@@ -0,0 +1,299 @@
+"""
+Local company search index.
+
+An embedded SQLite file with one row per company (CVR, newest name, status, city, NACE) and
+an FTS5 trigram index over the normalized name. Lookups are answered locally in well under
+a millisecond instead of a round trip to virksomhed/_search.
+
+Names are normalized Danish-aware before indexing and querying: lowercased, æ/ø/å folded to
+ae/oe/aa (so "Århus" matches "Aarhus"), accents stripped and legal-form suffixes such as A/S
+and ApS dropped. Queries that match no name as a substring fall back to trigram similarity,
+which tolerates typos.
+
+The index is filled from a bulk snapshot (scripts/build_company_index.py) and kept current
+with upsert(); the file is opened in WAL mode so a writer does not block readers. Writes go
+through one connection under a lock; every reading thread gets its own connection, so a
+search in a worker thread never sees (or interleaves with) a half-done write transaction.
+"""
+
+import difflib
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_DANISH = str.maketrans({"æ": "ae", "ø": "oe", "å": "aa", "ä": "ae", "ö": "oe", "ü": "ue"})
+_LEGAL_SUFFIX = re.compile(
+    r"\b(a/s|aps|i/s|p/s|k/s|ivs|amba|a\.m\.b\.a\.?|smba|s\.m\.b\.a\.?|fmba|as|a s)\s*$"
+)
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+# Totals are counted up to this many matches
+_MAX_TOTAL = 10_000
+# Fuzzy fallback: rank at most this many trigram candidates, keep those at least this similar
+_FUZZY_CANDIDATES = 200
+_FUZZY_MIN_RATIO = 0.6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    id INTEGER PRIMARY KEY,  -- int(cvr), shared with companies_fts.rowid
+    cvr TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    status TEXT,
+    city TEXT,
+    nace TEXT,
+    nace_text TEXT,
+    updated TEXT
+);
+CREATE INDEX IF NOT EXISTS companies_norm ON companies(norm);
+CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5(norm, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_COLUMNS = "cvr, name, status, city, nace, nace_text"
+
+
+def normalize_name(name: str) -> str:
+    """Fold a company name to the form that is indexed and searched."""
+    s = (name or "").lower().translate(_DANISH)
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    s = _LEGAL_SUFFIX.sub("", s.strip())
+    return _NON_WORD.sub(" ", s).strip()
+
+
+def row_from_vrvirksomhed(v: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Index row from a CVR Permanent Vrvirksomhed document, or None without CVR/name."""
+    md = v.get("virksomhedMetadata") or {}
+    name = (md.get("nyesteNavn") or {}).get("navn")
+    if not name and isinstance(v.get("navne"), list) and v["navne"]:
+        name = (v["navne"][-1] or {}).get("navn")
+    cvr = str(v.get("cvrNummer") or "")
+    if not cvr or not name:
+        return None
+    hb = md.get("nyesteHovedbranche") or {}
+    return {
+        "cvr": cvr,
+        "name": name,
+        "status": (v.get("virksomhedsstatus") or {}).get("status")
+        if isinstance(v.get("virksomhedsstatus"), dict)
+        else md.get("sammensatStatus"),
+        "city": (md.get("nyesteBeliggenhedsadresse") or {}).get("postdistrikt"),
+        "nace": hb.get("branchekode"),
+        "nace_text": hb.get("branchetekst"),
+        "updated": v.get("sidstOpdateret"),
+    }
+
+
+class CompanyIndex:
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._local = threading.local()
+        self._db.close()
+
+    # --- writes ---
+    def upsert(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Insert or replace companies in one transaction. Returns the number of rows."""
+        n = 0
+        with self._write_lock:
+            self._db.execute("BEGIN")
+            try:
+                for row in rows:
+                    self._upsert_one(row)
+                    n += 1
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return n
+
+    def _upsert_one(self, row: Dict[str, Any]) -> None:
+        cvr = str(row["cvr"])
+        norm = normalize_name(row["name"])
+        self._db.execute(
+            "INSERT OR REPLACE INTO companies"
+            " (id, cvr, name, norm, status, city, nace, nace_text, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                int(cvr),
+                cvr,
+                row["name"],
+                norm,
+                row.get("status"),
+                row.get("city"),
+                row.get("nace"),
+                row.get("nace_text"),
+                row.get("updated"),
+            ),
+        )
+        self._db.execute("DELETE FROM companies_fts WHERE rowid = ?", (int(cvr),))
+        self._db.execute("INSERT INTO companies_fts (rowid, norm) VALUES (?, ?)", (int(cvr), norm))
+
+    def delete(self, cvr: str) -> None:
+        with self._write_lock:
+            self._db.execute("DELETE FROM companies WHERE cvr = ?", (str(cvr),))
+            self._db.execute("DELETE FROM companies_fts WHERE rowid = ?", (int(cvr),))
+
+    def meta_get(self, key: str) -> Optional[str]:
+        row = self._reader().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def meta_set(self, key: str, value: str) -> None:
+        with self._write_lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # --- reads ---
+    def count(self) -> int:
+        return self._reader().execute("SELECT count(*) FROM companies").fetchone()[0]
+
+    def is_empty(self) -> bool:
+        return self._reader().execute("SELECT 1 FROM companies LIMIT 1").fetchone() is None
+
+    def get(self, cvr: str) -> Optional[Dict[str, Any]]:
+        row = self._reader().execute(
+            f"SELECT {_COLUMNS} FROM companies WHERE cvr = ?", (str(cvr),)
+        ).fetchone()
+        return _item(row) if row else None
+
+    def search(
+        self, q: str, limit: int = 10, offset: int = 0, after: Optional[List[Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Companies matching q by CVR (prefix), name substring or, failing that, similar name.
+        The result's search_after is the sort key of its last item; passing it back as after
+        returns the next page by seeking to it (keyset), so deep pages cost the same as the
+        first. Raises ValueError for an after key that does not fit this query.
+        """
+        q = q.strip()
+        if q.isdigit():
+            # ":" sorts right after "9", so this is a range scan over the CVR prefix
+            where, args = "cvr >= ? AND cvr < ?", (q, q + ":")
+            return self._page(where, args, [("cvr", ())], limit, offset, after)
+
+        norm = normalize_name(q)
+        if not norm:
+            return {"items": [], "total": 0}
+        if len(norm) < 3:
+            # Too short for trigrams: name prefix range scan on the norm index
+            where, args = "norm >= ? AND norm < ?", (norm, norm + "\uffff")
+            return self._page(where, args, [("norm", ()), ("cvr", ())], limit, offset, after)
+
+        where = "id IN (SELECT rowid FROM companies_fts WHERE companies_fts MATCH ?)"
+        # Exact name first, then prefix matches, then shorter names
+        keys: List[Tuple[str, tuple]] = [
+            ("norm <> ?", (norm,)),
+            ("norm NOT LIKE ? || '%'", (norm,)),
+        ]
+        keys += [("length(norm)", ()), ("cvr", ())]
+        # A two-part key comes from the fuzzy fallback below
+        if after is None or len(after) == len(keys):
+            page = self._page(where, (_phrase(norm),), keys, limit, offset, after)
+            if page["total"]:
+                return page
+        scored = self._fuzzy(norm)
+        total = len(scored)
+        if after is not None:
+            if len(after) != 2:
+                raise ValueError("search_after does not match this query")
+            scored = [t for t in scored if [t[0], t[1]] > list(after)]
+        rows = scored[offset : offset + limit]
+        data = {"items": [_item(row) for _, _, row in rows], "total": total}
+        if rows:
+            data["search_after"] = [rows[-1][0], rows[-1][1]]
+        return data
+
+    def _page(
+        self,
+        where: str,
+        args: tuple,
+        keys: List[Tuple[str, tuple]],
+        limit: int,
+        offset: int,
+        after: Optional[List[Any]] = None,
+    ) -> Dict[str, Any]:
+        """One page ordered by keys, a list of (SQL expression, parameters), ascending."""
+        exprs = ", ".join(expr for expr, _ in keys)
+        key_args = tuple(a for _, params in keys for a in params)
+        select = ", ".join(f"{expr} AS _k{i}" for i, (expr, _) in enumerate(keys))
+        seek, seek_args = "", ()
+        if after is not None:
+            if len(after) != len(keys):
+                raise ValueError("search_after does not match this query")
+            seek = f" AND ({exprs}) > ({', '.join('?' * len(keys))})"
+            seek_args = (*key_args, *after)
+        rows = self._reader().execute(
+            f"SELECT {_COLUMNS}, {select} FROM companies WHERE {where}{seek} "
+            f"ORDER BY {exprs} LIMIT ? OFFSET ?",
+            (*key_args, *args, *seek_args, *key_args, limit, offset),
+        ).fetchall()
+        total = self._reader().execute(
+            f"SELECT count(*) FROM (SELECT 1 FROM companies WHERE {where} LIMIT {_MAX_TOTAL})",
+            args,
+        ).fetchone()[0]
+        data: Dict[str, Any] = {"items": [_item(r) for r in rows], "total": total}
+        if rows:
+            data["search_after"] = [rows[-1][f"_k{i}"] for i in range(len(keys))]
+        return data
+
+    def _fuzzy(self, norm: str) -> List[Tuple[float, str, sqlite3.Row]]:
+        """Similar names as (-ratio, cvr, row), best first."""
+        grams = {norm[i : i + 3] for i in range(len(norm) - 2)}
+        candidates = self._reader().execute(
+            f"SELECT {_COLUMNS}, norm FROM companies WHERE id IN ("
+            "SELECT rowid FROM companies_fts WHERE companies_fts MATCH ? ORDER BY rank LIMIT ?)",
+            (" OR ".join(_phrase(g) for g in sorted(grams)), _FUZZY_CANDIDATES),
+        ).fetchall()
+        scored = []
+        for row in candidates:
+            # Compare against the same-length head too, so prefixes of long names count
+            ratio = max(
+                difflib.SequenceMatcher(None, norm, row["norm"]).ratio(),
+                difflib.SequenceMatcher(None, norm, row["norm"][: len(norm)]).ratio(),
+            )
+            if ratio >= _FUZZY_MIN_RATIO:
+                scored.append((-ratio, row["cvr"], row))
+        scored.sort(key=lambda t: (t[0], t[1]))
+        return scored
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _item(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "cvr": row["cvr"],
+        "name": row["name"],
+        "status": row["status"],
+        "city": row["city"],
+        "industry": {"code": row["nace"], "text": row["nace_text"]},
+    }
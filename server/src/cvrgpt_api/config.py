@@ -20,6 +20,51 @@ class Settings(BaseModel):
     # HTTP client settings
     request_timeout_s: float = float(os.getenv("CVRGPT_REQUEST_TIMEOUT_S", "10.0"))
     provider_max_retries: int = int(os.getenv("CVRGPT_PROVIDER_MAX_RETRIES", "2"))
+    # ERST/Datafordeler connection pool
+    erst_timeout_s: float = float(os.getenv("ERST_TIMEOUT_S", "30.0"))
+    erst_http2: bool = os.getenv("ERST_HTTP2", "1") == "1"
+    erst_max_connections: int = int(os.getenv("ERST_MAX_CONNECTIONS", "20"))
+    erst_max_keepalive: int = int(os.getenv("ERST_MAX_KEEPALIVE", "10"))
+    erst_keepalive_expiry_s: float = float(os.getenv("ERST_KEEPALIVE_EXPIRY_S", "60.0"))
+    # Concurrent requests per connection when HTTP/2 multiplexes them (HTTP/1.1: always 1)
+    http2_max_streams: int = int(os.getenv("CVRGPT_HTTP2_MAX_STREAMS", "100"))
+    # SQLite company index answering /v1/search locally (scripts/build_company_index.py)
+    company_index_path: str | None = os.getenv("CVRGPT_COMPANY_INDEX")
+    # Arrow IPC file with accounts for every (cvr, year) (scripts/build_financials_store.py)
+    financials_store_path: str | None = os.getenv("CVRGPT_FINANCIALS_STORE")
+    # Per-NACE aggregates (scripts/refresh_industry_stats.py), refreshed every N seconds (0 = off)
+    industry_stats_path: str | None = os.getenv("CVRGPT_INDUSTRY_STATS")
+    industry_stats_interval_s: float = float(os.getenv("CVRGPT_INDUSTRY_STATS_INTERVAL_S", "0"))
+    # Poll the ERST change feed into the company index every N seconds (0 = off)
+    ingest_interval_s: float = float(os.getenv("CVRGPT_INGEST_INTERVAL_S", "0"))
+    # Sync ERST events into the local event log every N seconds (0 = off; ERST_EVENTS_REAL=1)
+    events_sync_interval_s: float = float(os.getenv("CVRGPT_EVENTS_SYNC_INTERVAL_S", "0"))
+    # Chat intent routing: "hybrid" (local rules, then cache, then LLM), "llm" or "local"
+    chat_nlu: str = os.getenv("CHAT_NLU", "hybrid")
+    # Upstream provider calls (resilience.guarded): per-method deadline, concurrency and breaker
+    provider_deadline_s: float = float(os.getenv("PROVIDER_DEADLINE_S", "10.0"))
+    provider_bulkhead: int = int(os.getenv("PROVIDER_BULKHEAD", "8"))
+    provider_breaker_fail_max: int = int(os.getenv("PROVIDER_BREAKER_FAIL_MAX", "5"))
+    provider_breaker_reset_s: float = float(os.getenv("PROVIDER_BREAKER_RESET_S", "30"))
+    # LLM client (llm.py): pool, per-model concurrency, quota and hedging
+    llm_timeout_s: float = float(os.getenv("LLM_TIMEOUT_S", "20.0"))
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    llm_model_concurrency: int = int(os.getenv("LLM_MODEL_CONCURRENCY", "8"))
+    # Requests per minute across models (0 = no limit), with bursts of up to llm_burst
+    llm_requests_per_minute: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    llm_burst: int = int(os.getenv("LLM_BURST", "10"))
+    # Send a second request when the first is slower than this latency quantile (0 = off)
+    llm_hedge_quantile: float = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+    llm_breaker_fail_max: int = int(os.getenv("LLM_BREAKER_FAIL_MAX", "5"))
+    llm_breaker_reset_s: float = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+    # Chat thread state: "memory" (per process, LRU) or "redis" (shared by all workers)
+    chat_store: str = os.getenv("CHAT_STORE", "memory")
+    chat_thread_ttl_s: float = float(os.getenv("CHAT_THREAD_TTL_S", "86400"))
+    chat_max_threads: int = int(os.getenv("CHAT_MAX_THREADS", "10000"))
+    # Largest CVR list accepted by POST /v1/companies:batch
+    batch_max_cvrs: int = int(os.getenv("CVRGPT_BATCH_MAX_CVRS", "500"))
+    # Refresh the OAuth token this long before it expires (at most half its lifetime)
+    erst_token_refresh_ahead_s: int = int(os.getenv("ERST_TOKEN_REFRESH_AHEAD_S", "300"))
 
     def cors_origins(self) -> list[str]:
         return [o.strip() for o in self.allowed_origins.split(",") if o.strip()]
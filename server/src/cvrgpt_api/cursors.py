@@ -0,0 +1,40 @@
+"""
+Opaque pagination cursors.
+
+A cursor is URL-safe base64 of a small JSON object: the sort key of the last item returned
+(keyset pagination) or, for backends without keyset support, the next offset. It also carries
+a short hash of the query it belongs to, so a cursor replayed against different filters is
+rejected instead of silently returning the wrong page.
+"""
+
+import base64
+import hashlib
+import json
+from typing import Any, Dict
+
+
+class InvalidCursorError(ValueError):
+    """A cursor that is malformed, or was issued for a different query."""
+
+
+def query_scope(*parts: Any) -> str:
+    """Short fingerprint of the query parameters a cursor is valid for."""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def encode_cursor(scope: str, **state: Any) -> str:
+    raw = json.dumps({"s": scope, **state}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, scope: str) -> Dict[str, Any]:
+    """The state encoded in token. Raises InvalidCursorError for malformed or foreign cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+    if not isinstance(state, dict) or state.pop("s", None) != scope:
+        raise InvalidCursorError("Cursor does not belong to this query")
+    return state
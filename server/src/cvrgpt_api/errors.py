@@ -2,6 +2,7 @@
 Error utilities and canonical payloads.
 """
 
+import math
 import uuid
 from typing import Optional
 from pydantic import BaseModel
@@ -70,6 +71,30 @@ async def internal_error_handler(request: Request, exc) -> JSONResponse:
     return make_error("INTERNAL_ERROR", "Internal server error", status.HTTP_500_INTERNAL_SERVER_ERROR, rid)
 
 
+async def circuit_open_handler(request: Request, exc) -> JSONResponse:
+    """Upstream circuit is open: fail fast and tell the client when to try again."""
+    retry_after = max(1, math.ceil(exc.retry_in_s))
+    payload = ErrorPayload(
+        code=ErrorCode.PROVIDER_DOWN,
+        message="Upstream provider is unavailable",
+        detail=str(exc),
+        retry_after=retry_after,
+    )
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=payload.model_dump(),
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+async def deadline_handler(request: Request, exc) -> JSONResponse:
+    """Upstream call ran past its deadline."""
+    payload = ErrorPayload(
+        code=ErrorCode.UPSTREAM_ERROR, message="Upstream provider timed out", detail=str(exc)
+    )
+    return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT, content=payload.model_dump())
+
+
 # Suggested usages:
 #   raise HTTPException(status_code=404, detail=ErrorPayload(code=ErrorCode.NOT_FOUND, message="Company not found").model_dump())
 #   raise HTTPException(status_code=502, detail=ErrorPayload(code=ErrorCode.UPSTREAM_ERROR, message="CVR API unavailable").model_dump())
@@ -0,0 +1,274 @@
+"""
+Columnar store of normalized annual accounts for every company and fiscal year.
+
+One Arrow IPC file holds a row per (cvr, year) with the AccountsSnapshot metrics as float64
+columns, sorted by cvr then year. The file is memory-mapped, so opening it is instant and
+reads touch only the pages they need. A company's years are found by binary search on
+the cvr column, and one metric across all companies is a zero-copy NumPy view. No Pydantic
+objects are built on the read path.
+
+Amounts are stored as float64, which represents whole kroner exactly up to 2**53.
+The file is rebuilt atomically (write to a temp file, then rename) by write()/merge(), e.g.
+from `scripts/build_financials_store.py`; readers pick the new file up on their next call.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    np = None  # type: ignore
+    pa = None  # type: ignore
+    pc = None  # type: ignore
+    PYARROW_AVAILABLE = False
+
+from .config import settings
+
+METRICS = (
+    "revenue",
+    "ebit",
+    "net_income",
+    "assets",
+    "equity",
+    "cash",
+    "current_assets",
+    "current_liabilities",
+    "employees",
+)
+
+
+def _schema():
+    return pa.schema(
+        [
+            ("cvr", pa.int64()),
+            ("year", pa.int16()),
+            ("start_date", pa.string()),
+            ("end_date", pa.string()),
+            ("nace", pa.string()),
+            *[(m, pa.float64()) for m in METRICS],
+        ]
+    )
+
+
+def rows_from_accounts(
+    cvr: str, accounts: Optional[Dict[str, Any]], nace: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Store rows from a get_latest_accounts() "accounts" payload (current/previous snapshots).
+    Accepts flat AccountsSnapshot dicts as well as the pl/bs-nested fixture shape. nace is
+    the company's industry code, used to group peers for benchmarking.
+    """
+    rows = []
+    for snap in (accounts or {}).values():
+        if not isinstance(snap, dict):
+            continue
+        period = snap.get("period") or {}
+        year = period.get("year")
+        if not year:
+            continue
+        row: Dict[str, Any] = {
+            "cvr": int(cvr),
+            "year": int(year),
+            "start_date": period.get("start_date") or period.get("start"),
+            "end_date": period.get("end_date") or period.get("end"),
+            "nace": nace,
+        }
+        for m in METRICS:
+            v = snap.get(m)
+            if v is None:
+                v = (snap.get("pl") or {}).get(m, (snap.get("bs") or {}).get(m))
+            row[m] = float(v) if v is not None else None
+        rows.append(row)
+    return rows
+
+
+class FinancialsStore:
+    def __init__(self, path: str):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("FinancialsStore requires pyarrow and numpy")
+        self.path = path
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[int, int]] = None  # (inode, mtime_ns) of the mapped file
+        # The memory-mapped table and a view of its sorted cvr column, swapped as one pair
+        self._mapped: Tuple[Any, Optional["np.ndarray"]] = (None, None)
+
+    # --- reads ---
+    def _current(self) -> Tuple[Any, Optional["np.ndarray"]]:
+        """
+        (table, cvrs) for the memory-mapped file, reopened if it was replaced since the last
+        call. Callers use the pair they got, so a concurrent reload cannot mix two files.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None, None
+        version = (st.st_ino, st.st_mtime_ns)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    source = pa.memory_map(self.path, "r")
+                    table = pa.ipc.open_file(source).read_all()
+                    cvrs = table.column("cvr").combine_chunks().to_numpy(zero_copy_only=False)
+                    self._mapped = (table, cvrs)
+                    self._version = version
+        return self._mapped
+
+    @property
+    def version(self) -> Optional[Tuple[int, int]]:
+        """Changes whenever the file is replaced; lets callers invalidate derived data."""
+        self._current()
+        return self._version
+
+    def __len__(self) -> int:
+        table, _ = self._current()
+        return 0 if table is None else table.num_rows
+
+    @staticmethod
+    def _range(cvrs: Optional["np.ndarray"], cvr: str) -> Tuple[int, int]:
+        if cvrs is None:
+            return 0, 0
+        key = int(cvr)
+        return (
+            int(np.searchsorted(cvrs, key, side="left")),
+            int(np.searchsorted(cvrs, key, side="right")),
+        )
+
+    def company_years(
+        self,
+        cvr: str,
+        years: Optional[Iterable[int]] = None,
+        last: Optional[int] = None,
+        metrics: Iterable[str] = METRICS,
+    ) -> Dict[str, List[Any]]:
+        """
+        Columns for one company, oldest year first: {"year": [...], "revenue": [...], ...}.
+        Restrict to specific years, or to the last N years.
+        """
+        table, cvrs = self._current()
+        columns = ["year", "start_date", "end_date", "nace", *metrics]
+        if table is None:
+            return {c: [] for c in columns}
+        if "nace" not in table.column_names:
+            table = _conform(table, _schema())
+        lo, hi = self._range(cvrs, cvr)
+        part = table.slice(lo, hi - lo).select(columns)
+        if years is not None:
+            part = part.filter(pc.is_in(part.column("year"), pa.array(list(years), pa.int16())))
+        if last is not None and part.num_rows > last:
+            part = part.slice(part.num_rows - last)
+        return part.to_pydict()
+
+    def metric(
+        self, metric: str, year: Optional[int] = None, cvrs: Optional[Iterable[str]] = None
+    ) -> Tuple[Any, Any]:
+        """
+        One metric across companies as NumPy arrays (cvrs, values); missing values are NaN.
+        Optionally restricted to one fiscal year and/or a set of CVRs.
+        """
+        table, all_cvrs = self._current()
+        if table is None or all_cvrs is None or metric not in METRICS:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        mask = None
+        if year is not None:
+            mask = table.column("year").to_numpy() == year
+        if cvrs is not None:
+            wanted = np.isin(all_cvrs, np.fromiter((int(c) for c in cvrs), dtype=np.int64))
+            mask = wanted if mask is None else mask & wanted
+        values = table.column(metric).to_numpy(zero_copy_only=False)
+        if mask is None:
+            return all_cvrs, values
+        return all_cvrs[mask], values[mask]
+
+    def year_columns(self, year: Optional[int], columns: Iterable[str]) -> Dict[str, Any]:
+        """
+        Columns for every company with accounts for one fiscal year (all rows if year is
+        None), as NumPy arrays sorted by cvr then year (metrics float64 with NaN for missing,
+        strings as object arrays).
+        """
+        table, all_cvrs = self._current()
+        columns = list(columns)
+        if table is None or all_cvrs is None:
+            return {"cvr": np.array([], dtype=np.int64), **{c: np.array([]) for c in columns}}
+        mask = table.column("year").to_numpy() == year if year is not None else slice(None)
+        cvrs = all_cvrs[mask]
+        out: Dict[str, Any] = {"cvr": cvrs}
+        for c in columns:
+            if c not in table.column_names:
+                # Files written before the column existed
+                out[c] = np.full(len(cvrs), None, dtype=object)
+                continue
+            out[c] = table.column(c).to_numpy(zero_copy_only=False)[mask]
+        return out
+
+    # --- writes ---
+    def write(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Replace the store with rows (deduplicated on (cvr, year), last one wins)."""
+        return self._write_table(_dedupe(_to_table(rows)))
+
+    def merge(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Add or replace rows, keeping every other (cvr, year). Rewrites the file."""
+        new = _to_table(rows)
+        table, _ = self._current()
+        if table is not None and table.num_rows:
+            table = _conform(table, new.schema)
+            keep = ~np.isin(_keys(table), _keys(new))
+            new = pa.concat_tables([table.filter(pa.array(keep)), new])
+        return self._write_table(_dedupe(new))
+
+    def _write_table(self, table) -> int:
+        tmp = f"{self.path}.tmp"
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, self.path)
+        return table.num_rows
+
+
+def _to_table(rows: Iterable[Dict[str, Any]]):
+    schema = _schema()
+    columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+    for row in rows:
+        for name, values in columns.items():
+            values.append(row.get(name))
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def _conform(table, schema):
+    """Add columns missing from an older file as nulls, in schema order."""
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    return table.select(schema.names).cast(schema)
+
+
+def _keys(table):
+    """(cvr, year) packed into one int64 per row."""
+    cvr = table.column("cvr").to_numpy()
+    year = table.column("year").to_numpy().astype(np.int64)
+    return cvr * 10_000 + year
+
+
+def _dedupe(table):
+    """Sort by (cvr, year) and keep the last row for each key."""
+    keys = _keys(table)
+    # Stable sort, then take the last occurrence of each key
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    last = np.append(sorted_keys[1:] != sorted_keys[:-1], True)
+    return table.take(pa.array(order[last])).combine_chunks()
+
+
+_store: Optional[FinancialsStore] = None
+
+
+def get_financials_store() -> Optional[FinancialsStore]:
+    """The configured store (CVRGPT_FINANCIALS_STORE), or None if unset or pyarrow is missing."""
+    global _store
+    if _store is None and settings.financials_store_path and PYARROW_AVAILABLE:
+        _store = FinancialsStore(settings.financials_store_path)
+    return _store
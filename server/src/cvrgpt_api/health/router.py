@@ -1,18 +1,31 @@
 from fastapi import APIRouter
 from cvrgpt_core.providers.factory import get_provider, _provider_name
+from ..resilience import OPEN, breakers
 
 router = APIRouter(prefix="/health", tags=["health"])
 
 @router.get("/provider")
 def provider_health():
-    """Check provider health and return status"""
+    """Check provider health and return status, with the state of its circuit breakers"""
     prov = get_provider()
+    name = _provider_name()
     ok = False
+    status = "down"
     try:
         ok = bool(getattr(prov, "ping", lambda: False)())
+        status = getattr(prov, "status", lambda: "ok" if ok else "down")()
     except Exception:
         ok = False
+    # Breakers are named "<provider>:<method>" and created on the method's first call
+    circuits = {
+        b.name.split(":", 1)[1]: b.snapshot()
+        for b in list(breakers.values())
+        if b.name.startswith(f"{name}:")
+    }
     return {
-        "provider": _provider_name(),
-        "ok": ok
+        "provider": name,
+        "ok": ok and all(c["state"] != OPEN for c in circuits.values()),
+        # "unknown" until the provider has actually talked to its upstream (e.g. fetched a token)
+        "status": status,
+        "circuits": circuits,
     }
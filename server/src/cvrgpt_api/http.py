@@ -1,10 +1,114 @@
+import asyncio
+from time import perf_counter
+from typing import Any, Optional, Tuple
+
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from .config import settings
+from .metrics import HTTP_POOL_IDLE, HTTP_REQUESTS_IN_FLIGHT, HTTP_POOL_WAIT
+
+try:
+    import h2  # type: ignore # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 client = httpx.AsyncClient(timeout=httpx.Timeout(settings.request_timeout_s))
 
 
+class PooledClient:
+    """
+    Long-lived, lazily created httpx.AsyncClient shared by every call to one upstream.
+    Keeps TCP/TLS (and mTLS) sessions alive across requests and records pool usage: requests
+    in flight, idle keep-alive connections and the wait for a request slot.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        timeout: float,
+        max_connections: int,
+        max_keepalive: int,
+        keepalive_expiry: float,
+        http2: bool = False,
+        http2_max_streams: Optional[int] = None,
+        cert: Optional[Tuple[str, str]] = None,
+        **client_kwargs: Any,
+    ):
+        self.name = name
+        self.http2 = bool(http2 and HTTP2_AVAILABLE)
+        self._timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._cert = cert
+        self._client_kwargs = client_kwargs
+        self._client: Optional[httpx.AsyncClient] = None
+        # HTTP/1.1 needs a connection per request; HTTP/2 multiplexes up to
+        # http2_max_streams (CVRGPT_HTTP2_MAX_STREAMS) requests over each one
+        streams = (http2_max_streams or settings.http2_max_streams) if self.http2 else 1
+        self._slots = asyncio.Semaphore(max_connections * streams)
+        self._in_flight = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                http2=self.http2,
+                cert=self._cert,
+                **self._client_kwargs,
+            )
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        t0 = perf_counter()
+        async with self._slots:
+            HTTP_POOL_WAIT.labels(self.name).observe(perf_counter() - t0)
+            self._in_flight += 1
+            HTTP_REQUESTS_IN_FLIGHT.labels(self.name).set(self._in_flight)
+            try:
+                return await self.client.request(method, url, **kwargs)
+            finally:
+                self._in_flight -= 1
+                HTTP_REQUESTS_IN_FLIGHT.labels(self.name).set(self._in_flight)
+                HTTP_POOL_IDLE.labels(self.name).set(self._idle_connections())
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _idle_connections(self) -> int:
+        # httpx does not expose pool state publicly; read it from the httpcore pool if present
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        try:
+            return sum(1 for c in getattr(pool, "connections", []) if c.is_idle())
+        except Exception:
+            return 0
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "idle": self._idle_connections(),
+            "max_connections": self._limits.max_connections,
+            "http2": self.http2,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        HTTP_REQUESTS_IN_FLIGHT.labels(self.name).set(0)
+        HTTP_POOL_IDLE.labels(self.name).set(0)
+
+
 class UpstreamError(Exception):
     pass
 
@@ -0,0 +1,460 @@
+"""
+Materialized per-industry aggregates.
+
+For every NACE prefix (2, 4 and 6 digits) and fiscal year this keeps the number of
+companies, and per accounts metric a count, a sum and a KLL quantile sketch, plus the number
+of bankruptcies from the events provider. Each group's response is rendered once when the
+group changes, so serving "median EBIT margin in NACE 62" is a dict lookup.
+
+refresh() is incremental. Accounts are diffed against the financials store by (cvr, year)
+key and a per-row checksum: new rows are sketched and merged into their groups, and only
+groups with a changed or removed row are rebuilt from the store (sketches cannot forget
+values). Bankruptcies are matched by event id against every id already counted, so an event
+published late with an earlier date is still counted. The state is saved with the cache
+codec so restarts continue incrementally.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import zlib
+from datetime import UTC, datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .codec import Codec, default_codec
+from .config import settings
+from .financials_store import METRICS, PYARROW_AVAILABLE, FinancialsStore, get_financials_store
+
+if PYARROW_AVAILABLE:
+    import numpy as np
+    import pyarrow as pa
+
+    from .sketch import KLLSketch
+
+logger = logging.getLogger(__name__)
+
+NACE_DIGITS = (2, 4, 6)
+RATIOS = ("ebit_margin", "solvency")
+AGG_METRICS = (*METRICS, *RATIOS)
+QUANTILES = {"p10": 0.1, "p25": 0.25, "median": 0.5, "p75": 0.75, "p90": 0.9}
+EVENTS_PAGE = 500
+
+
+def nace_code(code: Optional[str]) -> str:
+    """Digits of a NACE code ("62.01" -> "6201")."""
+    return "".join(ch for ch in (code or "") if ch.isdigit())
+
+
+def _group_key(prefix: str, year: int) -> str:
+    return f"{prefix}:{year}"
+
+
+def _metric_matrix(data: Dict[str, Any]) -> "np.ndarray":
+    """(rows, len(AGG_METRICS)) float64 matrix with the derived ratios appended."""
+    cols = [data[m].astype(np.float64) for m in METRICS]
+    by_name = dict(zip(METRICS, cols, strict=True))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        revenue, assets = by_name["revenue"], by_name["assets"]
+        cols.append(np.where(revenue > 0, by_name["ebit"] / revenue, np.nan))
+        cols.append(np.where(assets > 0, by_name["equity"] / assets, np.nan))
+    out = np.column_stack(cols) if cols[0].size else np.empty((0, len(AGG_METRICS)))
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def _encode_naces(raw: Iterable[Optional[str]]) -> Tuple["np.ndarray", List[str]]:
+    """Per-row index into a list of distinct NACE digit strings (normalized once each)."""
+    encoded = pa.array(raw, pa.string()).fill_null("").dictionary_encode()
+    codes = [nace_code(n) for n in encoded.dictionary.to_pylist()]
+    # Spellings that normalize to the same digits ("62.01", "6201") share one id
+    canonical: Dict[str, int] = {}
+    remap = np.array([canonical.setdefault(c, len(canonical)) for c in codes], dtype=np.int64)
+    ids = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+    return (remap[ids] if len(ids) else ids), list(canonical)
+
+
+def _groups(
+    years: "np.ndarray", code_ids: "np.ndarray", codes: List[str], digits: int
+) -> Tuple["np.ndarray", List[str]]:
+    """Per-row group index for one prefix length, and the group keys ("" = code too short)."""
+    prefixes: Dict[str, int] = {}
+    prefix_of = np.array(
+        [prefixes.setdefault(c[:digits], len(prefixes)) if len(c) >= digits else -1 for c in codes],
+        dtype=np.int64,
+    )
+    names = list(prefixes)
+    pid = prefix_of[code_ids] if len(code_ids) else code_ids
+    packed = np.where(pid >= 0, pid * 10_000 + years, -1)
+    uniq, inverse = np.unique(packed, return_inverse=True)
+    keys = [_group_key(names[u // 10_000], u % 10_000) if u >= 0 else "" for u in uniq.tolist()]
+    return inverse.reshape(-1), keys
+
+
+def _checksums(
+    code_ids: "np.ndarray", codes: List[str], matrix: "np.ndarray"
+) -> "np.ndarray":
+    """One int64 per row that changes when any stored value or the industry code changes."""
+    bits = np.nan_to_num(matrix[:, : len(METRICS)], nan=-1.0e300).view(np.int64)
+    weights = np.arange(1, bits.shape[1] + 1, dtype=np.int64) * 0x9E3779B1
+    crcs = np.array([zlib.crc32(c.encode()) for c in codes], dtype=np.int64)
+    with np.errstate(over="ignore"):
+        return (bits * weights).sum(axis=1) ^ (crcs[code_ids] if len(code_ids) else code_ids)
+
+
+def _empty_group() -> Dict[str, Any]:
+    return {
+        "companies": 0,
+        "metrics": {m: {"count": 0, "sum": 0.0, "sketch": KLLSketch()} for m in AGG_METRICS},
+    }
+
+
+def _aggregate(
+    years: "np.ndarray",
+    code_ids: "np.ndarray",
+    codes: List[str],
+    matrix: "np.ndarray",
+    only: Optional[Set[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Group aggregates for the given rows (restricted to the group keys in only)."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for digits in NACE_DIGITS:
+        inverse, keys = _groups(years, code_ids, codes, digits)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        for g, key in enumerate(keys):
+            if not key or (only is not None and key not in only):
+                continue
+            part = matrix[order[bounds[g] : bounds[g + 1]]]
+            group: Dict[str, Any] = {"companies": len(part), "metrics": {}}
+            for j, metric in enumerate(AGG_METRICS):
+                col = part[:, j]
+                col = col[~np.isnan(col)]
+                group["metrics"][metric] = {
+                    "count": int(len(col)),
+                    "sum": float(col.sum()),
+                    "sketch": KLLSketch.from_values(col),
+                }
+            out[key] = group
+    return out
+
+
+class IndustryStats:
+    def __init__(self, path: Optional[str] = None, codec: Optional[Codec] = None):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("IndustryStats requires numpy")
+        self.path = path
+        self.codec = codec or default_codec
+        self._lock = threading.Lock()
+        self._file_version: Optional[Tuple[int, int]] = None
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._latest_year: Dict[str, int] = {}
+        self.refreshed_at: Optional[str] = None
+        self._reset_state()
+        self._load_summaries()
+
+    def _reset_state(self) -> None:
+        self._state_loaded = not self.path
+        self.groups: Dict[str, Dict[str, Any]] = {}
+        self.bankruptcies: Dict[str, int] = {}
+        # Accounts applied so far: sorted (cvr*10000 + year) keys, checksums, NACE codes
+        self._keys = np.array([], dtype=np.int64)
+        self._sums = np.array([], dtype=np.int64)
+        self._years = np.array([], dtype=np.int64)
+        self._code_ids = np.array([], dtype=np.int64)
+        self._codes: List[str] = []
+        # Ids of every bankruptcy event counted in self.bankruptcies
+        self._events_seen: Set[str] = set()
+
+    # --- reads ---
+    def get(self, nace: str, year: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Pre-rendered aggregates for a NACE prefix and year (default: latest with data)."""
+        self._reload_if_changed()
+        prefix = nace_code(nace)
+        if year is None:
+            year = self._latest_year.get(prefix)
+            if year is None:
+                return None
+        return self._summaries.get(_group_key(prefix, year))
+
+    def _summary(self, key: str) -> Dict[str, Any]:
+        prefix, year = key.split(":")
+        group = self.groups.get(key)
+        metrics = {}
+        for metric, agg in (group or {}).get("metrics", {}).items():
+            if not agg["count"]:
+                continue
+            values = agg["sketch"].quantiles(list(QUANTILES.values()))
+            metrics[metric] = {
+                "count": agg["count"],
+                "sum": agg["sum"],
+                "mean": agg["sum"] / agg["count"],
+                **dict(zip(QUANTILES, values, strict=True)),
+            }
+        return {
+            "nace": prefix,
+            "year": int(year),
+            "companies": group["companies"] if group else 0,
+            "bankruptcies": self.bankruptcies.get(key, 0),
+            "metrics": metrics,
+            "updated_at": self.refreshed_at,
+        }
+
+    def _render(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            if key not in self.groups and key not in self.bankruptcies:
+                self._summaries.pop(key, None)
+                continue
+            self._summaries[key] = self._summary(key)
+            prefix, year = key.split(":")
+            if int(year) > self._latest_year.get(prefix, -1):
+                self._latest_year[prefix] = int(year)
+
+    # --- refresh ---
+    def refresh(self, store: Optional[FinancialsStore], events: Any = None) -> Dict[str, int]:
+        """
+        Apply new accounts and bankruptcies; returns counts of what changed. Blocking: events
+        is read with its synchronous query() (ErstEventsProvider), so call this off the loop.
+        """
+        with self._lock:
+            if not self._state_loaded:
+                self._load_state()
+            changed: Set[str] = set()
+            stats = {"accounts": 0, "rebuilt_groups": 0, "bankruptcies": 0}
+            if store is not None:
+                stats["accounts"], stats["rebuilt_groups"] = self._sync_accounts(store, changed)
+            if events is not None:
+                stats["bankruptcies"] = self._sync_events(events, changed)
+            if changed:
+                self.refreshed_at = datetime.now(UTC).isoformat()
+                self._render(changed)
+                self._save()
+            return stats
+
+    def _sync_accounts(self, store: FinancialsStore, changed: Set[str]) -> Tuple[int, int]:
+        data = store.year_columns(None, ["year", "nace", *METRICS])
+        years = data["year"].astype(np.int64)
+        keys = data["cvr"] * 10_000 + years
+        code_ids, codes = _encode_naces(data["nace"])
+        matrix = _metric_matrix(data)
+        sums = _checksums(code_ids, codes, matrix)
+
+        seen = np.zeros(len(keys), dtype=bool)
+        pos = np.zeros(len(keys), dtype=np.int64)
+        if len(self._keys):
+            pos = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+            seen = self._keys[pos] == keys
+        modified = seen & (self._sums[pos] != sums) if len(self._keys) else seen
+        removed = np.ones(len(self._keys), dtype=bool)
+        removed[pos[seen]] = False
+
+        # Groups that lost or changed a row are rebuilt; the rest only gain rows. A changed
+        # row may also have moved industry, so its previous groups are rebuilt too.
+        dirty: Set[str] = set()
+        old = pos[modified]
+        for rows_years, rows_codes in (
+            (years[modified], [codes[i] for i in code_ids[modified]]),
+            (self._years[old], [self._codes[i] for i in self._code_ids[old]]),
+            (self._years[removed], [self._codes[i] for i in self._code_ids[removed]]),
+        ):
+            for y, n in zip(rows_years.tolist(), rows_codes, strict=True):
+                dirty.update(_group_key(n[:d], y) for d in NACE_DIGITS if len(n) >= d)
+
+        new = ~seen
+        if new.any():
+            for key, part in _aggregate(years[new], code_ids[new], codes, matrix[new]).items():
+                if key in dirty:
+                    continue
+                self._merge_group(key, part)
+                changed.add(key)
+        if dirty:
+            in_dirty = np.zeros(len(keys), dtype=bool)
+            for digits in NACE_DIGITS:
+                inverse, group_keys = _groups(years, code_ids, codes, digits)
+                hit = [g for g, key in enumerate(group_keys) if key in dirty]
+                in_dirty |= np.isin(inverse, hit)
+            rebuilt = _aggregate(
+                years[in_dirty], code_ids[in_dirty], codes, matrix[in_dirty], only=dirty
+            )
+            for key in dirty:
+                if key in rebuilt:
+                    self.groups[key] = rebuilt[key]
+                else:
+                    self.groups.pop(key, None)
+            changed.update(dirty)
+
+        self._keys, self._sums, self._years = keys, sums, years
+        self._code_ids, self._codes = code_ids, codes
+        return int(new.sum() + modified.sum()), len(dirty)
+
+    def _merge_group(self, key: str, part: Dict[str, Any]) -> None:
+        group = self.groups.setdefault(key, _empty_group())
+        group["companies"] += part["companies"]
+        for metric, agg in part["metrics"].items():
+            target = group["metrics"][metric]
+            target["count"] += agg["count"]
+            target["sum"] += agg["sum"]
+            target["sketch"].merge(agg["sketch"])
+
+    def _sync_events(self, provider: Any, changed: Set[str]) -> int:
+        """
+        Count bankruptcies whose ids have not been counted yet. Every page is read before
+        anything is applied, so a failed query leaves the counts as they were.
+        """
+        from cvrgpt_core.models import EventFilter
+
+        new: Dict[str, Any] = {}
+        offset = 0
+        while True:
+            page = provider.query(
+                EventFilter(event_type="bankruptcy", limit=EVENTS_PAGE, offset=offset)
+            )
+            for ev in page:
+                event_id = ev.source_id or f"{ev.cvr}:{ev.event_date.isoformat()}"
+                if event_id not in self._events_seen:
+                    new.setdefault(event_id, ev)
+            if len(page) < EVENTS_PAGE:
+                break
+            offset += EVENTS_PAGE
+        for ev in new.values():
+            code = nace_code(ev.nace)
+            for d in NACE_DIGITS:
+                if len(code) >= d:
+                    key = _group_key(code[:d], ev.event_date.year)
+                    self.bankruptcies[key] = self.bankruptcies.get(key, 0) + 1
+                    changed.add(key)
+        self._events_seen.update(new)
+        return len(new)
+
+    async def run_forever(self, events: Any = None, interval_s: float = 300.0) -> None:
+        """Refresh from the configured financials store every interval_s (in a worker thread)."""
+        while True:
+            try:
+                result = await asyncio.to_thread(self.refresh, get_financials_store(), events)
+                if any(result.values()):
+                    logger.info(f"Industry stats refreshed: {result}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Industry stats refresh failed, retrying in {interval_s}s: {e}")
+            await asyncio.sleep(interval_s)
+
+    # --- persistence ---
+    # The rendered summaries (all the API reads) and the incremental state (sketches and
+    # applied keys, only needed to refresh) are separate files, so serving processes reload
+    # a small file when the refresh job writes.
+    @property
+    def _state_path(self) -> str:
+        return f"{self.path}.state"
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        _write_atomic(self._state_path, self.codec.dumps(self._state()))
+        _write_atomic(
+            self.path,
+            self.codec.dumps({"summaries": self._summaries, "refreshed_at": self.refreshed_at}),
+        )
+        st = os.stat(self.path)
+        self._file_version = (st.st_ino, st.st_mtime_ns)
+
+    def _state(self) -> Dict[str, Any]:
+        return {
+            "groups": {
+                key: {
+                    "companies": g["companies"],
+                    "metrics": {
+                        m: {"count": a["count"], "sum": a["sum"], "sketch": a["sketch"].to_dict()}
+                        for m, a in g["metrics"].items()
+                    },
+                }
+                for key, g in self.groups.items()
+            },
+            "bankruptcies": self.bankruptcies,
+            "keys": self._keys.tobytes(),
+            "sums": self._sums.tobytes(),
+            "years": self._years.tobytes(),
+            "code_ids": self._code_ids.tobytes(),
+            "codes": self._codes,
+            "events_seen": sorted(self._events_seen),
+        }
+
+    def _load_state(self) -> None:
+        self._reset_state()
+        self._state_loaded = True
+        try:
+            with open(self._state_path, "rb") as f:
+                state = Codec.loads(f.read())
+        except FileNotFoundError:
+            return
+        self.groups = {
+            key: {
+                "companies": g["companies"],
+                "metrics": {
+                    m: {**a, "sketch": KLLSketch.from_dict(a["sketch"])}
+                    for m, a in g["metrics"].items()
+                },
+            }
+            for key, g in state["groups"].items()
+        }
+        self.bankruptcies = dict(state["bankruptcies"])
+        self._keys = np.frombuffer(state["keys"], dtype=np.int64).copy()
+        self._sums = np.frombuffer(state["sums"], dtype=np.int64).copy()
+        self._years = np.frombuffer(state["years"], dtype=np.int64).copy()
+        self._code_ids = np.frombuffer(state["code_ids"], dtype=np.int64).copy()
+        self._codes = list(state["codes"])
+        if "events_high_water" in state:
+            # Written when only the ids of the newest date were kept: count again from scratch
+            self.bankruptcies = {}
+        else:
+            self._events_seen = set(state.get("events_seen") or [])
+
+    def _load_summaries(self) -> None:
+        if not self.path:
+            return
+        try:
+            st = os.stat(self.path)
+            with open(self.path, "rb") as f:
+                data = Codec.loads(f.read())
+        except FileNotFoundError:
+            return
+        self._summaries = dict(data["summaries"])
+        self.refreshed_at = data.get("refreshed_at")
+        self._latest_year = {}
+        for key in self._summaries:
+            prefix, year = key.split(":")
+            self._latest_year[prefix] = max(int(year), self._latest_year.get(prefix, -1))
+        self._file_version = (st.st_ino, st.st_mtime_ns)
+
+    def _reload_if_changed(self) -> None:
+        """Pick up files written by another process (e.g. scripts/refresh_industry_stats.py)."""
+        if not self.path:
+            return
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (st.st_ino, st.st_mtime_ns) != self._file_version:
+            with self._lock:
+                if (st.st_ino, st.st_mtime_ns) != self._file_version:
+                    self._load_summaries()
+                    # Our incremental state is older than the file now; reread before refreshing
+                    self._state_loaded = False
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+_stats: Optional[IndustryStats] = None
+
+
+def get_industry_stats() -> Optional[IndustryStats]:
+    """The configured aggregates (CVRGPT_INDUSTRY_STATS), or None if unset or numpy is missing."""
+    global _stats
+    if _stats is None and settings.industry_stats_path and PYARROW_AVAILABLE:
+        _stats = IndustryStats(settings.industry_stats_path)
+    return _stats
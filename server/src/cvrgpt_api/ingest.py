@@ -0,0 +1,118 @@
+"""
+CVR change-feed ingester.
+
+Polls the CVR Permanent index for companies whose sidstOpdateret is at or after the stored
+high-water mark, pages through them with search_after, upserts them into the local company
+index and invalidates their cached company responses (v1:company:{cvr}). Cached search
+results are left to expire with their TTL: which queries a changed name affects is not
+known, and dropping every search:* key after each run costs a full keyspace scan.
+
+Progress is checkpointed in the index's meta table after every page (high-water mark plus
+the search_after cursor), so a restarted ingester continues where it stopped instead of
+rescanning. Throughput, lag and checkpoint are exported as cvrgpt_ingest_* metrics.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import UTC, datetime
+from typing import Any, List, Optional
+
+from .cache import cache as default_cache
+from .company_index import CompanyIndex, row_from_vrvirksomhed
+from .metrics import INGEST_CHECKPOINT, INGEST_LAG, INGEST_RECORDS, INGEST_RUNS
+from .providers.erst import ERSTProvider
+
+logger = logging.getLogger(__name__)
+
+HIGH_WATER_KEY = "high_water"
+CURSOR_KEY = "ingest_cursor"
+SORT = [{"Vrvirksomhed.sidstOpdateret": "asc"}, {"Vrvirksomhed.cvrNummer": "asc"}]
+
+
+class CompanyIngester:
+    def __init__(
+        self,
+        provider: ERSTProvider,
+        index: CompanyIndex,
+        cache: Any = None,
+        page_size: int = 500,
+        interval_s: float = 60.0,
+    ):
+        self.provider = provider
+        self.index = index
+        self.cache = cache or default_cache
+        self.page_size = page_size
+        self.interval_s = interval_s
+
+    async def run_once(self) -> int:
+        """Apply every change since the checkpoint. Returns the number of records applied."""
+        # Every SQLite access blocks, so all of it runs in worker threads
+        high_water = await asyncio.to_thread(self.index.meta_get, HIGH_WATER_KEY)
+        raw_cursor = await asyncio.to_thread(self.index.meta_get, CURSOR_KEY)
+        cursor: Optional[List[Any]] = json.loads(raw_cursor) if raw_cursor else None
+        query = (
+            {"range": {"Vrvirksomhed.sidstOpdateret": {"gte": high_water}}}
+            if high_water
+            else None
+        )
+
+        applied = 0
+        rows: list[dict] = []
+        async for doc, sort_values in self.provider.scan_companies(
+            query=query, sort=SORT, page_size=self.page_size, search_after=cursor
+        ):
+            row = row_from_vrvirksomhed(doc)
+            if row is not None:
+                rows.append(row)
+            cursor = sort_values
+            if len(rows) >= self.page_size:
+                applied += await self._apply(rows, cursor)
+                rows = []
+        if rows:
+            applied += await self._apply(rows, cursor)
+        await asyncio.to_thread(self.index.meta_set, "synced_at", datetime.now(UTC).isoformat())
+        await self._export_checkpoint()
+        return applied
+
+    async def _apply(self, rows: list[dict], cursor: Optional[List[Any]]) -> int:
+        await asyncio.to_thread(self._write_page, rows, cursor)
+        await self.cache.delete(*(f"v1:company:{row['cvr']}" for row in rows))
+        INGEST_RECORDS.inc(len(rows))
+        await self._export_checkpoint()
+        return len(rows)
+
+    def _write_page(self, rows: list[dict], cursor: Optional[List[Any]]) -> None:
+        self.index.upsert(rows)
+        newest = max((row.get("updated") or "" for row in rows), default="")
+        if newest:
+            self.index.meta_set(HIGH_WATER_KEY, newest)
+        if cursor:
+            self.index.meta_set(CURSOR_KEY, json.dumps(cursor))
+
+    async def _export_checkpoint(self) -> None:
+        high_water = await asyncio.to_thread(self.index.meta_get, HIGH_WATER_KEY)
+        if not high_water:
+            return
+        try:
+            ts = datetime.fromisoformat(high_water).timestamp()
+        except ValueError:
+            return
+        INGEST_CHECKPOINT.set(ts)
+        INGEST_LAG.set(max(time.time() - ts, 0.0))
+
+    async def run_forever(self) -> None:
+        """Poll every interval_s; errors are logged and retried on the next tick."""
+        while True:
+            try:
+                applied = await self.run_once()
+                INGEST_RUNS.labels("ok").inc()
+                if applied:
+                    logger.info(f"Ingested {applied} changed companies")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                INGEST_RUNS.labels("error").inc()
+                logger.warning(f"Company ingest failed, retrying in {self.interval_s}s: {e}")
+            await asyncio.sleep(self.interval_s)
@@ -0,0 +1,193 @@
+"""
+Shared client for OpenAI-compatible chat completion APIs.
+
+One pooled connection set is used for every model. Per model, at most LLM_MODEL_CONCURRENCY
+requests run at once and a circuit breaker fails fast while the model keeps erroring or
+timing out. A token bucket (LLM_REQUESTS_PER_MINUTE, bursts of LLM_BURST) keeps all models
+together under the provider's request quota.
+
+When a request is slower than the LLM_HEDGE_QUANTILE of that model's recent latencies, a
+second identical request is sent (if the bucket has a token to spare) and whichever answers
+first is used. Both end when the call does, and the whole call is bounded by LLM_TIMEOUT_S.
+
+The endpoint (OPENAI_BASE_URL) and key (OPENAI_API_KEY) are read per call unless given, so a
+local mock server can stand in for the provider.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+from .config import settings
+from .http import PooledClient
+from .metrics import LLM_HEDGED, LLM_LATENCY
+from .resilience import CircuitBreaker, CircuitOpenError, RateLimitedError, TokenBucket, get_breaker
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+# Latencies kept per model for the hedging quantile, and how many are needed before hedging
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_S = 0.05
+
+
+class LLMError(Exception):
+    """The model could not answer: upstream error, timeout, or not configured."""
+
+
+class LLMUnavailableError(LLMError):
+    """Failed fast without calling the model (no key, open circuit or quota exhausted)."""
+
+
+class LLMRequestError(LLMError):
+    """The provider rejected the request itself (4xx other than 429); not a health signal."""
+
+
+class _ModelState:
+    def __init__(self, concurrency: int, breaker: CircuitBreaker):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.breaker = breaker
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def hedge_delay(self, quantile: float) -> Optional[float]:
+        if quantile <= 0 or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return max(HEDGE_MIN_DELAY_S, ordered[int(quantile * (len(ordered) - 1))])
+
+
+class LLMClient:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        *,
+        timeout_s: float = settings.llm_timeout_s,
+        max_connections: int = settings.llm_max_connections,
+        model_concurrency: int = settings.llm_model_concurrency,
+        requests_per_minute: float = settings.llm_requests_per_minute,
+        burst: int = settings.llm_burst,
+        hedge_quantile: float = settings.llm_hedge_quantile,
+        breaker_fail_max: int = settings.llm_breaker_fail_max,
+        breaker_reset_s: float = settings.llm_breaker_reset_s,
+    ):
+        self._base_url = base_url
+        self._api_key = api_key
+        self.timeout_s = timeout_s
+        self.model_concurrency = model_concurrency
+        self.hedge_quantile = hedge_quantile
+        self.breaker_fail_max = breaker_fail_max
+        self.breaker_reset_s = breaker_reset_s
+        self._bucket = (
+            TokenBucket(requests_per_minute / 60.0, burst) if requests_per_minute > 0 else None
+        )
+        self._pool = PooledClient(
+            "llm",
+            timeout=timeout_s,
+            max_connections=max_connections,
+            max_keepalive=max_connections,
+            keepalive_expiry=60.0,
+        )
+        self._models: Dict[str, _ModelState] = {}
+
+    @property
+    def base_url(self) -> str:
+        return (self._base_url or os.getenv("OPENAI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._api_key or os.getenv("OPENAI_API_KEY")
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            breaker = get_breaker(
+                f"llm:{model}",
+                fail_max=self.breaker_fail_max,
+                reset_timeout_s=self.breaker_reset_s,
+                exclude=(LLMRequestError, RateLimitedError),
+            )
+            state = self._models[model] = _ModelState(self.model_concurrency, breaker)
+        return state
+
+    async def chat(self, model: str, messages: List[Dict[str, Any]], **params: Any) -> dict:
+        """The chat completion response for messages. Raises LLMError if there is none."""
+        api_key = self.api_key
+        if not api_key:
+            raise LLMUnavailableError("OPENAI_API_KEY is not configured")
+        state = self._state(model)
+        body = {"model": model, "messages": messages, **params}
+        t0 = time.perf_counter()
+        try:
+            async with state.breaker.guard(), asyncio.timeout(self.timeout_s):
+                if self._bucket is not None:
+                    await self._bucket.acquire(max_wait_s=self.timeout_s)
+                async with state.slots:
+                    data = await self._hedged(model, state, body, api_key)
+        except CircuitOpenError as e:
+            raise LLMUnavailableError(str(e)) from e
+        except RateLimitedError as e:
+            raise LLMUnavailableError(f"LLM request quota exhausted: {e}") from e
+        except TimeoutError as e:
+            LLM_LATENCY.labels(model, "timeout").observe(time.perf_counter() - t0)
+            raise LLMError(f"LLM did not answer within {self.timeout_s}s") from e
+        except LLMError:
+            LLM_LATENCY.labels(model, "error").observe(time.perf_counter() - t0)
+            raise
+        elapsed = time.perf_counter() - t0
+        state.latencies.append(elapsed)
+        LLM_LATENCY.labels(model, "ok").observe(elapsed)
+        return data
+
+    async def _hedged(self, model: str, state: _ModelState, body: dict, api_key: str) -> dict:
+        tasks = [asyncio.ensure_future(self._post(body, api_key))]
+        try:
+            delay = state.hedge_delay(self.hedge_quantile)
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+                if not tasks[0].done() and (self._bucket is None or self._bucket.try_acquire()):
+                    tasks.append(asyncio.ensure_future(self._post(body, api_key)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            LLM_HEDGED.labels(model, "hedge" if task is tasks[1] else "first").inc()
+                        return task.result()
+                    error = task.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _post(self, body: dict, api_key: str) -> dict:
+        try:
+            r = await self._pool.post(
+                f"{self.base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                json=body,
+            )
+        except httpx.HTTPError as e:
+            raise LLMError(f"LLM request failed: {e!r}") from e
+        if r.status_code == 429 or r.status_code >= 500:
+            raise LLMError(f"LLM returned {r.status_code}")
+        if r.status_code != 200:
+            raise LLMRequestError(f"LLM rejected the request ({r.status_code}): {r.text[:200]}")
+        return r.json()
+
+    def stats(self) -> dict:
+        return {
+            model: {**state.breaker.snapshot(), "samples": len(state.latencies)}
+            for model, state in self._models.items()
+        }
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
+
+
+llm_client = LLMClient()
@@ -1,6 +1,16 @@
 from fastapi import APIRouter, Request
 from time import perf_counter
-from typing import Dict
+from typing import Any, Dict
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    Counter: Any = None  # type: ignore
+    Gauge: Any = None  # type: ignore
+    Histogram: Any = None  # type: ignore
 
 router = APIRouter()
 _counters: Dict[str, int] = {
@@ -14,6 +24,96 @@ def count(name: str, inc: int = 1) -> None:
     _counters[name] = _counters.get(name, 0) + inc
 
 
+class _NoopMetric:
+    """Stand-in used when prometheus_client is not installed."""
+
+    def labels(self, *_args, **_kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, *_args, **_kwargs) -> None:
+        return None
+
+    def dec(self, *_args, **_kwargs) -> None:
+        return None
+
+    def set(self, *_args, **_kwargs) -> None:
+        return None
+
+    def observe(self, *_args, **_kwargs) -> None:
+        return None
+
+
+def _metric(kind: Any, name: str, doc: str, labels: tuple[str, ...] = (), **kwargs):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return kind(name, doc, labels, **kwargs)
+
+
+# Upstream HTTP connection pools (one per provider client)
+HTTP_REQUESTS_IN_FLIGHT = _metric(
+    Gauge, "cvrgpt_http_requests_in_flight", "Upstream requests currently in flight", ("pool",)
+)
+HTTP_POOL_IDLE = _metric(
+    Gauge, "cvrgpt_http_pool_idle", "Idle keep-alive connections in the pool", ("pool",)
+)
+HTTP_POOL_WAIT = _metric(
+    Histogram,
+    "cvrgpt_http_pool_wait_seconds",
+    "Time spent waiting for a free pool connection",
+    ("pool",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+# Response cache (L1 = in-process, L2 = Redis)
+CACHE_EVENTS = _metric(
+    Counter,
+    "cvrgpt_cache_events_total",
+    "Cache hits, misses, evictions, expiries and invalidations per tier",
+    ("tier", "event"),
+)
+CACHE_L1_BYTES = _metric(Gauge, "cvrgpt_cache_l1_bytes", "Payload bytes held in the L1 cache")
+
+# CVR change-feed ingester
+INGEST_RECORDS = _metric(
+    Counter, "cvrgpt_ingest_records_total", "Changed company records applied to the local index"
+)
+INGEST_RUNS = _metric(Counter, "cvrgpt_ingest_runs_total", "Ingester polling runs", ("outcome",))
+INGEST_LAG = _metric(
+    Gauge, "cvrgpt_ingest_lag_seconds", "Age of the newest applied change (now - high-water mark)"
+)
+INGEST_CHECKPOINT = _metric(
+    Gauge, "cvrgpt_ingest_checkpoint_timestamp", "High-water mark as a Unix timestamp"
+)
+
+# Chat intent routing (chat.nlu)
+CHAT_NLU_ROUTES = _metric(
+    Counter,
+    "cvrgpt_chat_nlu_routes_total",
+    "Chat messages by how their intent was resolved (local, cache, llm, unresolved)",
+    ("source",),
+)
+
+# LLM calls (llm.LLMClient)
+LLM_LATENCY = _metric(
+    Histogram,
+    "cvrgpt_llm_request_seconds",
+    "LLM request latency per model, including a hedged second request",
+    ("model", "outcome"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0),
+)
+LLM_HEDGED = _metric(
+    Counter,
+    "cvrgpt_llm_hedged_total",
+    "Hedged second LLM requests, by which request answered first",
+    ("model", "winner"),
+)
+
+# Circuit breakers (resilience.CircuitBreaker); 1 while open
+CIRCUIT_OPEN = _metric(
+    Gauge, "cvrgpt_circuit_open", "Whether a circuit breaker is open", ("circuit",)
+)
+
+
 @router.get("/metrics")
 async def metrics():
     return _counters
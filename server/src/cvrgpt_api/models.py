@@ -4,7 +4,7 @@ These mirror the REST/MCP contracts to keep schema stable and self-documenting.
 """
 
 from decimal import Decimal
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 from pydantic import BaseModel, Field, conint, ConfigDict
 
 
@@ -30,6 +30,8 @@ class SearchResponse(BaseModel):
     limit: conint(ge=1, le=50)  # type: ignore
     offset: conint(ge=0)        # type: ignore
     next_offset: Optional[int]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
     citations: List[Citation] = Field(default_factory=list)
 
 
@@ -66,6 +68,23 @@ class CompanyResponse(BaseModel):
     citations: List[Citation] = Field(default_factory=list)
 
 
+# /v1/companies:batch
+class BatchCompaniesRequest(BaseModel):
+    cvrs: List[str] = Field(min_length=1)
+
+
+class BatchCompanyItem(BaseModel):
+    cvr: str
+    found: bool
+    company: Optional[Company] = None
+    citations: List[Citation] = Field(default_factory=list)
+    error: Optional[Literal["NOT_FOUND"]] = None
+
+
+class BatchCompaniesResponse(BaseModel):
+    items: List[BatchCompanyItem]  # same order as the requested cvrs
+
+
 # /v1/filings/{cvr}
 class Filing(BaseModel):
     id: str
@@ -128,3 +147,53 @@ class CompareResponse(BaseModel):
     key_changes: List[AccountsDelta] = Field(default_factory=list)
     narrative: str
     sources: List[Citation] = Field(default_factory=list)
+
+
+# /v1/compare/{cvr}/peers
+class PeerRatio(BaseModel):
+    value: Optional[float] = None
+    percentile: Optional[float] = None  # 0-100, mid-rank among peers
+    peers: int = 0  # peers with a value for this ratio
+    p25: Optional[float] = None
+    median: Optional[float] = None
+    p75: Optional[float] = None
+
+
+class PeerCompany(BaseModel):
+    cvr: str
+    revenue: Optional[float] = None
+    revenue_growth: Optional[float] = None
+    ebit_margin: Optional[float] = None
+    solvency: Optional[float] = None
+    liquidity: Optional[float] = None
+
+
+class PeerBenchmarkResponse(BaseModel):
+    cvr: str
+    year: int
+    industry: Dict[str, Any]  # {"code": "62", "digits": 2}
+    size_band: Optional[Dict[str, Any]] = None  # None when ranked against the whole industry
+    peer_count: int
+    metrics: Dict[str, PeerRatio]  # revenue_growth, ebit_margin, solvency, liquidity
+    peers: List[PeerCompany] = Field(default_factory=list)
+
+
+# /v1/industries/{nace}/stats
+class MetricAggregate(BaseModel):
+    count: int
+    sum: float
+    mean: float
+    p10: Optional[float] = None  # quantiles are KLL sketch estimates
+    p25: Optional[float] = None
+    median: Optional[float] = None
+    p75: Optional[float] = None
+    p90: Optional[float] = None
+
+
+class IndustryStatsResponse(BaseModel):
+    nace: str  # NACE prefix digits, e.g. "62" or "620100"
+    year: int
+    companies: int  # companies with accounts for the year
+    bankruptcies: int  # bankruptcy events dated in the year
+    metrics: Dict[str, MetricAggregate] = Field(default_factory=dict)
+    updated_at: Optional[str] = None
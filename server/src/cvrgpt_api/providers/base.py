@@ -1,7 +1,10 @@
+import asyncio
 from abc import ABC, abstractmethod
 
 
 class Provider(ABC):
+    # Providers that support keyset paging also accept search_after=<sort key> and return the
+    # sort key of their last item as "search_after"; the API only passes one back to them.
     @abstractmethod
     async def search_companies(self, q: str, limit: int = 10, offset: int = 0) -> dict: ...
     @abstractmethod
@@ -11,22 +14,52 @@ class Provider(ABC):
     @abstractmethod
     async def get_latest_accounts(self, cvr: str) -> dict: ...
     
+    async def get_companies(self, cvrs: list[str]) -> dict[str, dict]:
+        """
+        Look up several companies, keyed by CVR. CVRs that do not exist are left out.
+        Providers with a bulk upstream query override this; the default fans out get_company.
+        """
+
+        async def one(cvr: str):
+            try:
+                return cvr, await self.get_company(cvr)
+            except FileNotFoundError:
+                return cvr, None
+
+        results = await asyncio.gather(*(one(cvr) for cvr in cvrs))
+        return {cvr: data for cvr, data in results if data is not None}
+
     def ping(self) -> bool:
         """Health check method. Override in concrete providers."""
         return True
 
+    def status(self) -> str:
+        """"ok", "down", or "unknown" when the provider cannot tell yet (e.g. not used so far)."""
+        return "ok" if self.ping() else "down"
+
+    async def startup(self) -> None:
+        """Open long-lived resources (connection pools, tokens). Called on app startup."""
+        return None
+
+    async def aclose(self) -> None:
+        """Release long-lived resources. Called on app shutdown."""
+        return None
+
 
 class CompositeProvider(Provider):
     def __init__(self, core: Provider, filings_provider: Provider | None = None):
         self.core = core
         self.filings_provider = filings_provider or core
 
-    async def search_companies(self, q: str, limit: int = 10, offset: int = 0) -> dict:
-        return await self.core.search_companies(q, limit, offset)
+    async def search_companies(self, q: str, limit: int = 10, offset: int = 0, **kw) -> dict:
+        return await self.core.search_companies(q, limit, offset, **kw)
 
     async def get_company(self, cvr: str) -> dict:
         return await self.core.get_company(cvr)
 
+    async def get_companies(self, cvrs: list[str]) -> dict[str, dict]:
+        return await self.core.get_companies(cvrs)
+
     async def list_filings(self, cvr: str, limit: int = 10) -> dict:
         return await self.filings_provider.list_filings(cvr, limit)
 
@@ -36,3 +69,17 @@ class CompositeProvider(Provider):
     def ping(self) -> bool:
         """Health check - both core and filings providers must be healthy."""
         return self.core.ping() and self.filings_provider.ping()
+
+    def status(self) -> str:
+        statuses = {self.core.status(), self.filings_provider.status()}
+        return next(s for s in ("down", "unknown", "ok") if s in statuses)
+
+    async def startup(self) -> None:
+        await self.core.startup()
+        if self.filings_provider is not self.core:
+            await self.filings_provider.startup()
+
+    async def aclose(self) -> None:
+        await self.core.aclose()
+        if self.filings_provider is not self.core:
+            await self.filings_provider.aclose()
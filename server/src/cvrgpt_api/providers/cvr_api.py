@@ -39,6 +39,9 @@ class CVRApiProvider(Provider):
             limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
         )
 
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
     def _check_rate_limit(self, endpoint: str) -> bool:
         """Check if we're within rate limits for an endpoint."""
         key = f"rate_limit_{endpoint}"
@@ -183,48 +186,7 @@ class CVRApiProvider(Provider):
             if not hits:
                 raise FileNotFoundError(f"Company {cvr} not found")
             src = (hits[0] or {}).get("_source") or {}
-            v = src.get("Vrvirksomhed") or src
-            md = v.get("virksomhedMetadata") or {}
-            # Normalize fields
-            name: Optional[str] = (md.get("nyesteNavn") or {}).get("navn")
-            if not name:
-                navne = v.get("navne")
-                if isinstance(navne, list) and navne:
-                    name = (navne[0] or {}).get("navn")
-            status = (v.get("virksomhedsstatus") or {}).get("status") or md.get("sammensatStatus")
-            hb = md.get("nyesteHovedbranche") or (v.get("hovedbranche") or {})
-            industry = {
-                "code": hb.get("branchekode") if isinstance(hb, dict) else None,
-                "text": hb.get("branchetekst") if isinstance(hb, dict) else None,
-            }
-            addr = md.get("nyesteBeliggenhedsadresse") or {}
-
-            def build_street(a: Dict[str, Any]) -> str:
-                vej = a.get("vejnavn") or ""
-                nr = str(a.get("husnummerFra") or "").strip()
-                bogstav = (a.get("bogstavFra") or "").strip()
-                comp = " ".join(x for x in [nr + (bogstav or "")] if x)
-                return (vej + (" " + comp if comp else "")).strip()
-
-            addresses = []
-            if addr:
-                addresses.append(
-                    {
-                        "type": "business",
-                        "street": build_street(addr),
-                        "city": addr.get("postdistrikt") or addr.get("bynavn"),
-                        "zip": str(addr.get("postnummer") or ""),
-                        "country": addr.get("landekode"),
-                    }
-                )
-            company: dict = {
-                "cvr": str(v.get("cvrNummer") or cvr),
-                "name": name or "",
-                "status": status,
-                "industry": industry,
-                "addresses": addresses,
-                "officers": [],
-            }
+            company = self._map_company(src.get("Vrvirksomhed") or src, cvr)
             accessed_at = datetime.utcnow().isoformat() + "Z"
             citation = Citation(
                 url=url, label="CVR Virksomhedsregister", accessed_at=accessed_at, type="api"
@@ -290,6 +252,111 @@ class CVRApiProvider(Provider):
                 ).model_dump()
             )
 
+    async def get_companies(self, cvrs: List[str]) -> Dict[str, dict]:
+        """Look up many companies with one terms query. CVRs without a hit are left out."""
+        out: Dict[str, dict] = {}
+        todo = []
+        for cvr in cvrs:
+            if ("company", cvr) in self._cache:
+                out[cvr] = self._cache[("company", cvr)]
+            else:
+                todo.append(cvr)
+        if not todo:
+            return out
+
+        if not self._check_rate_limit("company"):
+            raise RuntimeError(
+                ErrorPayload(
+                    code=ErrorCode.RATE_LIMIT, message="Rate limit exceeded", retry_after=60
+                ).model_dump()
+            )
+        url = f"{self.base_url.rstrip('/')}/virksomhed/_search"
+        headers: Dict[str, str] = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        body = {
+            "size": len(todo),
+            "query": {"terms": {"Vrvirksomhed.cvrNummer": [str(c) for c in todo]}},
+            "_source": True,
+        }
+        try:
+            r = await self._client.post(url, headers=headers, json=body)
+            r.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"CVR batch lookup failed: {e.response.status_code} {e.response.text}")
+            raise RuntimeError(
+                ErrorPayload(
+                    code=ErrorCode.RATE_LIMIT
+                    if e.response.status_code == 429
+                    else ErrorCode.UPSTREAM_ERROR,
+                    message="CVR API batch lookup failed",
+                ).model_dump()
+            ) from e
+        except httpx.HTTPError as e:
+            logger.error(f"CVR batch lookup error: {e}")
+            raise RuntimeError(
+                ErrorPayload(
+                    code=ErrorCode.PROVIDER_DOWN, message="CVR service unavailable"
+                ).model_dump()
+            ) from e
+        accessed_at = datetime.utcnow().isoformat() + "Z"
+        citation = Citation(
+            url=url, label="CVR Virksomhedsregister", accessed_at=accessed_at, type="api"
+        )
+        for hit in ((r.json() or {}).get("hits") or {}).get("hits") or []:
+            src = (hit or {}).get("_source") or {}
+            v = src.get("Vrvirksomhed") or src
+            cvr = str(v.get("cvrNummer") or "")
+            if cvr:
+                data = {"company": self._map_company(v, cvr), "citations": [citation.model_dump()]}
+                self._cache[("company", cvr)] = data
+                out[cvr] = data
+        return out
+
+    @staticmethod
+    def _map_company(v: Dict[str, Any], cvr: str) -> dict:
+        md = v.get("virksomhedMetadata") or {}
+        # Normalize fields
+        name: Optional[str] = (md.get("nyesteNavn") or {}).get("navn")
+        if not name:
+            navne = v.get("navne")
+            if isinstance(navne, list) and navne:
+                name = (navne[0] or {}).get("navn")
+        status = (v.get("virksomhedsstatus") or {}).get("status") or md.get("sammensatStatus")
+        hb = md.get("nyesteHovedbranche") or (v.get("hovedbranche") or {})
+        industry = {
+            "code": hb.get("branchekode") if isinstance(hb, dict) else None,
+            "text": hb.get("branchetekst") if isinstance(hb, dict) else None,
+        }
+        addr = md.get("nyesteBeliggenhedsadresse") or {}
+
+        def build_street(a: Dict[str, Any]) -> str:
+            vej = a.get("vejnavn") or ""
+            nr = str(a.get("husnummerFra") or "").strip()
+            bogstav = (a.get("bogstavFra") or "").strip()
+            comp = " ".join(x for x in [nr + (bogstav or "")] if x)
+            return (vej + (" " + comp if comp else "")).strip()
+
+        addresses = []
+        if addr:
+            addresses.append(
+                {
+                    "type": "business",
+                    "street": build_street(addr),
+                    "city": addr.get("postdistrikt") or addr.get("bynavn"),
+                    "zip": str(addr.get("postnummer") or ""),
+                    "country": addr.get("landekode"),
+                }
+            )
+        return {
+            "cvr": str(v.get("cvrNummer") or cvr),
+            "name": name or "",
+            "status": status,
+            "industry": industry,
+            "addresses": addresses,
+            "officers": [],
+        }
+
     async def list_filings(self, cvr: str, limit: int = 10) -> dict:
         key = ("filings", cvr, limit)
         if key in self._cache:
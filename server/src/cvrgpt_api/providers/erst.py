@@ -1,10 +1,34 @@
+import asyncio
+import json
+import logging
 import time
-from typing import Any, Dict, Optional
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from .base import Provider
+from ..config import settings
+from ..http import PooledClient
+from ..redis_client import UNLOCK_SCRIPT, redis_client
+from ..resilience import guarded
 import os
-import httpx
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+_TOKEN_LOCK_TTL_S = 10
+
+
+def _token_margins(ttl: float) -> Tuple[float, float]:
+    """
+    (refresh ahead, expiry skew) in seconds for a token issued for ttl seconds. Both are
+    capped at a fraction of the lifetime, so a short-lived token is still used for a while
+    before it is refreshed instead of being refreshed on every request.
+    """
+    return min(settings.erst_token_refresh_ahead_s, ttl / 2), min(60.0, ttl / 4)
+
+
+# Relevance first; the CVR makes the order total so search_after never skips or repeats hits
+SEARCH_SORT = [{"_score": "desc"}, {"Vrvirksomhed.cvrNummer": "asc"}]
+
 
 class ERSTProvider(Provider):
     """
@@ -34,17 +58,99 @@ class ERSTProvider(Provider):
         self._key_path = key_path
         self._basic_user = basic_user
         self._basic_password = basic_password
-        self._token = None
-        self._token_exp = 0
+        self._token: Optional[str] = None
+        self._token_exp: float = 0
+        self._token_ttl: float = 0  # lifetime of the current token when it was issued
+        self._token_error: Optional[str] = None
+        self._token_task: Optional["asyncio.Task[None]"] = None
+        self._refresher: Optional["asyncio.Task[None]"] = None
+        cert = (cert_path, key_path) if cert_path and key_path else None
+        self._http = PooledClient(
+            "erst",
+            timeout=settings.erst_timeout_s,
+            max_connections=settings.erst_max_connections,
+            max_keepalive=settings.erst_max_keepalive,
+            keepalive_expiry=settings.erst_keepalive_expiry_s,
+            http2=settings.erst_http2,
+            cert=cert,
+        )
 
-    # --- auth/token management (stub; swap for your real implementation) ---
-    def _ensure_token(self):
-        now = int(time.time())
-        if self._token and now < self._token_exp - 60:
+    async def startup(self) -> None:
+        """Open the pooled client and fetch a token so the first request does not wait."""
+        _ = self._http.client
+        if not self._auth_url:
             return
+        try:
+            await asyncio.shield(self._start_token_refresh())
+        except Exception:
+            pass  # recorded in _token_error and reported by ping()
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._token_refresher())
+
+    async def aclose(self) -> None:
+        for task in (self._refresher, self._token_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self._refresher = None
+        await self._http.aclose()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self._http.stats()
+
+    def _auth(self, headers: Dict[str, str]) -> Optional[tuple]:
+        """Add bearer token to headers, or return basic-auth credentials."""
+        if self._auth_url:
+            headers["Authorization"] = f"Bearer {self._token}"
+            return None
+        if self._basic_user and self._basic_password:
+            return (self._basic_user, self._basic_password)
+        return None
+
+    # --- auth/token management ---
+    async def _ensure_token(self) -> None:
         if not self._auth_url:
             # Basic auth mode – no token to fetch
             return
+        now = time.time()
+        refresh_ahead, skew = _token_margins(self._token_ttl)
+        if self._token and now < self._token_exp - skew:
+            if now >= self._token_exp - refresh_ahead:
+                # Still valid: refresh in the background instead of making this request wait
+                self._start_token_refresh()
+            return
+        await asyncio.shield(self._start_token_refresh())
+
+    def _start_token_refresh(self) -> "asyncio.Task[None]":
+        """Single-flight: every caller shares the one refresh that is in flight."""
+        if self._token_task is None or self._token_task.done():
+            self._token_task = asyncio.ensure_future(self._acquire_token())
+            self._token_task.add_done_callback(self._on_token_refreshed)
+        return self._token_task
+
+    def _on_token_refreshed(self, task: "asyncio.Task[None]") -> None:
+        if task.cancelled():
+            return
+        exc = task.exception()
+        self._token_error = str(exc) if exc else None
+        if exc:
+            logger.warning(f"ERST token refresh failed: {exc}")
+
+    async def _acquire_token(self) -> None:
+        if await self._load_shared_token():
+            return
+        lock = await self._lock_shared_token()
+        try:
+            if lock is None and await self._wait_for_shared_token():
+                return
+            token, exp = await self._fetch_token()
+            self._token, self._token_exp = token, exp
+            self._token_ttl = exp - time.time()
+            await self._store_shared_token()
+        finally:
+            if lock:
+                await self._unlock_shared_token(lock)
+
+    async def _fetch_token(self) -> Tuple[str, float]:
         # OAuth2 Client Credentials (generic)
         # Expect auth_url to accept client_id, client_secret, audience/scope
         client_auth_in_body = os.getenv("ERST_CLIENT_AUTH_IN_BODY", "1") == "1"
@@ -62,47 +168,138 @@ class ERSTProvider(Provider):
             data["client_id"] = self._client_id
             data["client_secret"] = self._client_secret
 
-        with httpx.Client(timeout=20.0) as client:
-            r = client.post(self._auth_url, data=data, auth=auth, headers=headers)
+        now = time.time()
+        r = await self._http.post(
+            self._auth_url, data=data, auth=auth, headers=headers, timeout=20.0
+        )
         r.raise_for_status()
         payload = r.json()
-        self._token = payload.get("access_token")
         ttl = int(payload.get("expires_in") or 3600)
-        self._token_exp = now + min(ttl, 3600)
+        return payload.get("access_token"), now + min(ttl, 3600)
 
-    def ping(self) -> bool:
-        """
-        Lightweight call to confirm credentials are accepted and the API is reachable.
-        Implement with a cheap endpoint (e.g., /heartbeat or a tiny lookup).
-        """
+    # Token cache shared by all workers, so N uvicorn workers do not each hit the auth server.
+    # Only used when CVRGPT_REDIS_URL is configured, like the response cache.
+    def _shared_key(self) -> Optional[str]:
+        if not os.getenv("CVRGPT_REDIS_URL"):
+            return None
+        return f"erst:token:{self._client_id}"
+
+    async def _load_shared_token(self) -> bool:
+        key = self._shared_key()
+        if not key:
+            return False
         try:
-            if self._auth_url:
-                self._ensure_token()
-                return bool(self._token and self._api_base)
-            # Basic auth mode: require base, user, password
-            return bool(self._api_base and self._basic_user and self._basic_password)
+            raw = await redis_client.get(key)
         except Exception:
             return False
+        if not raw:
+            return False
+        cached = json.loads(raw)
+        ttl = cached.get("ttl") or cached["exp"] - time.time()
+        # Ignore a shared token that is itself due for refresh
+        if cached["exp"] - time.time() <= _token_margins(ttl)[0]:
+            return False
+        self._token, self._token_exp, self._token_ttl = cached["token"], cached["exp"], ttl
+        return True
+
+    async def _store_shared_token(self) -> None:
+        key = self._shared_key()
+        ttl = int(self._token_exp - time.time() - _token_margins(self._token_ttl)[1])
+        if not key or ttl <= 0:
+            return
+        shared = {"token": self._token, "exp": self._token_exp, "ttl": self._token_ttl}
+        try:
+            await redis_client.set(key, json.dumps(shared), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Could not share ERST token: {e}")
+
+    async def _lock_shared_token(self) -> Optional[str]:
+        key = self._shared_key()
+        if not key:
+            return "local"
+        owner = uuid.uuid4().hex
+        try:
+            if await redis_client.set(f"{key}:lock", owner, nx=True, ex=_TOKEN_LOCK_TTL_S):
+                return owner
+            return None
+        except Exception:
+            return "local"
+
+    async def _unlock_shared_token(self, owner: str) -> None:
+        key = self._shared_key()
+        if not key or owner == "local":
+            return
+        try:
+            await redis_client.eval(UNLOCK_SCRIPT, 1, f"{key}:lock", owner)
+        except Exception:
+            pass
+
+    async def _wait_for_shared_token(self) -> bool:
+        """Another worker holds the refresh lock; wait for it to publish the token."""
+        deadline = time.time() + _TOKEN_LOCK_TTL_S
+        while time.time() < deadline:
+            await asyncio.sleep(0.1)
+            if await self._load_shared_token():
+                return True
+        return False
+
+    async def _token_refresher(self) -> None:
+        """Refresh the token shortly before it expires so requests never wait for it."""
+        while True:
+            delay = self._token_exp - _token_margins(self._token_ttl)[0] - time.time()
+            await asyncio.sleep(max(delay, 1.0) if self._token_error is None else 30.0)
+            try:
+                await asyncio.shield(self._start_token_refresh())
+            except Exception:
+                pass  # recorded by _on_token_refreshed; retried on the next loop
+
+    def ping(self) -> bool:
+        """
+        Cheap, non-blocking check that credentials are configured and the last
+        token refresh (if any) succeeded. No network I/O happens here.
+        """
+        if self._auth_url:
+            configured = bool(self._client_id and self._client_secret and self._api_base)
+            return configured and self._token_error is None
+        # Basic auth mode: require base, user, password
+        return bool(self._api_base and self._basic_user and self._basic_password)
+
+    def status(self) -> str:
+        """
+        "ok", "down", or "unknown" while credentials are configured but no token has been
+        fetched yet, so they have not actually been checked.
+        """
+        if not self.ping():
+            return "down"
+        if self._auth_url and self._token is None:
+            return "unknown"
+        return "ok"
 
     # --- shape your public methods to match existing service contracts ---
-    async def search_companies(self, q: str, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
-        """Search companies using CVR Permanent index (Elasticsearch _search)."""
-        self._ensure_token()
+    @guarded("erst:search")
+    async def search_companies(
+        self,
+        q: str,
+        limit: int = 10,
+        offset: int = 0,
+        search_after: Optional[List[Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search companies using CVR Permanent index (Elasticsearch _search).
+
+        Hits are sorted by score with the CVR as tiebreaker, and the sort values of the last
+        hit are returned as search_after. Passing them back pages with search_after instead of
+        from, which stays cheap past the 10k result window.
+        """
+        await self._ensure_token()
         index_url = f"{self._api_base.rstrip('/')}/virksomhed/_search"
         headers: Dict[str, str] = {"Content-Type": "application/json"}
-        auth = None
-        if self._auth_url:
-            headers["Authorization"] = f"Bearer {self._token}"
-        elif self._basic_user and self._basic_password:
-            auth = (self._basic_user, self._basic_password)
-        cert = (self._cert_path, self._key_path) if self._cert_path and self._key_path else None
+        auth = self._auth(headers)
 
         is_cvr = q.isdigit() and len(q) == 8
         if is_cvr:
-            query = {
-                "query": {"bool": {"must": [{"term": {"Vrvirksomhed.cvrNummer": q}}]}},
-                "from": max(int(offset), 0),
-                "size": min(max(int(limit), 1), 25),
+            query: Dict[str, Any] = {
+                "query": {"bool": {"must": [{"term": {"Vrvirksomhed.cvrNummer": q}}]}}
             }
         else:
             query = {
@@ -120,14 +317,15 @@ class ERSTProvider(Provider):
                         ]
                     }
                 },
-                "from": max(int(offset), 0),
-                "size": min(max(int(limit), 1), 25),
             }
+        query["size"] = min(max(int(limit), 1), 50)
+        query["sort"] = SEARCH_SORT
+        if search_after:
+            query["search_after"] = search_after
+        else:
+            query["from"] = max(int(offset), 0)
 
-        async with httpx.AsyncClient(timeout=30.0, cert=cert) as client:
-            r = await client.post(
-                index_url, headers=headers, auth=auth if auth else None, json=query
-            )
+        r = await self._http.post(index_url, headers=headers, auth=auth, json=query)
         r.raise_for_status()
         payload = r.json()
         hits = (payload.get("hits") or {}).get("hits") or []
@@ -157,40 +355,104 @@ class ERSTProvider(Provider):
 
         items = [_map_item(h) for h in hits]
         total = ((payload.get("hits") or {}).get("total") or {}).get("value", len(items))
-        return {
+        data: Dict[str, Any] = {
             "items": items,
             "total": total,
             "citations": [{"source": "erst", "url": index_url}],
         }
+        if hits and hits[-1].get("sort"):
+            data["search_after"] = hits[-1]["sort"]
+        return data
 
+    @guarded("erst:company")
     async def get_company(self, cvr: str) -> Dict[str, Any]:
-        self._ensure_token()
+        await self._ensure_token()
         index_url = f"{self._api_base.rstrip('/')}/virksomhed/_search"
         headers: Dict[str, str] = {"Content-Type": "application/json"}
-        auth = None
-        if self._auth_url:
-            headers["Authorization"] = f"Bearer {self._token}"
-        elif self._basic_user and self._basic_password:
-            auth = (self._basic_user, self._basic_password)
-        cert = (self._cert_path, self._key_path) if self._cert_path and self._key_path else None
+        auth = self._auth(headers)
 
         query = {
             "query": {"bool": {"must": [{"term": {"Vrvirksomhed.cvrNummer": str(cvr)}}]}},
             "size": 1,
         }
 
-        async with httpx.AsyncClient(timeout=30.0, cert=cert) as client:
-            r = await client.post(
-                index_url, headers=headers, auth=auth if auth else None, json=query
-            )
+        r = await self._http.post(index_url, headers=headers, auth=auth, json=query)
         r.raise_for_status()
         hits = (r.json().get("hits") or {}).get("hits") or []
         if not hits:
             raise FileNotFoundError(f"Company {cvr} not found")
         src = (hits[0].get("_source") or {}).get("Vrvirksomhed") or {}
-        md = src.get("virksomhedMetadata") or {}
+        company = self._map_company(src, cvr)
+        return {"company": company, "citations": [{"source": "erst", "url": index_url}]}
+
+    @guarded("erst:company")
+    async def get_companies(self, cvrs: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up many companies with one terms query. CVRs without a hit are left out."""
+        if not cvrs:
+            return {}
+        await self._ensure_token()
+        index_url = f"{self._api_base.rstrip('/')}/virksomhed/_search"
+        headers: Dict[str, str] = {"Content-Type": "application/json"}
+        auth = self._auth(headers)
 
-        company = {
+        query = {
+            "query": {"terms": {"Vrvirksomhed.cvrNummer": [str(c) for c in cvrs]}},
+            "size": len(cvrs),
+        }
+
+        r = await self._http.post(index_url, headers=headers, auth=auth, json=query)
+        r.raise_for_status()
+        out: Dict[str, Dict[str, Any]] = {}
+        for hit in (r.json().get("hits") or {}).get("hits") or []:
+            src = (hit.get("_source") or {}).get("Vrvirksomhed") or {}
+            cvr = str(src.get("cvrNummer") or "")
+            if cvr:
+                out[cvr] = {
+                    "company": self._map_company(src, cvr),
+                    "citations": [{"source": "erst", "url": index_url}],
+                }
+        return out
+
+    async def scan_companies(
+        self,
+        query: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Dict[str, Any]]] = None,
+        page_size: int = 1000,
+        search_after: Optional[List[Any]] = None,
+    ) -> AsyncIterator[Tuple[Dict[str, Any], List[Any]]]:
+        """
+        Page through virksomhed/_search with search_after, yielding (Vrvirksomhed, sort values).
+        The sort values of the last yielded document resume the scan. The sort must end in a
+        unique field; cvrNummer is appended if missing.
+        """
+        index_url = f"{self._api_base.rstrip('/')}/virksomhed/_search"
+        sort = list(sort or [])
+        if not any("Vrvirksomhed.cvrNummer" in s for s in sort):
+            sort.append({"Vrvirksomhed.cvrNummer": "asc"})
+        while True:
+            await self._ensure_token()
+            headers: Dict[str, str] = {"Content-Type": "application/json"}
+            auth = self._auth(headers)
+            body: Dict[str, Any] = {
+                "query": query or {"match_all": {}},
+                "sort": sort,
+                "size": page_size,
+            }
+            if search_after:
+                body["search_after"] = search_after
+            r = await self._http.post(index_url, headers=headers, auth=auth, json=body)
+            r.raise_for_status()
+            hits = (r.json().get("hits") or {}).get("hits") or []
+            for hit in hits:
+                search_after = hit.get("sort")
+                yield (hit.get("_source") or {}).get("Vrvirksomhed") or {}, search_after or []
+            if len(hits) < page_size or not search_after:
+                return
+
+    @staticmethod
+    def _map_company(src: Dict[str, Any], cvr: str) -> Dict[str, Any]:
+        md = src.get("virksomhedMetadata") or {}
+        return {
             "cvr": src.get("cvrNummer") or cvr,
             "name": (md.get("nyesteNavn") or {}).get("navn") or f"Company {cvr}",
             "status": ((src.get("virksomhedsstatus") or {}) or {}).get("status"),
@@ -203,21 +465,14 @@ class ERSTProvider(Provider):
             "addresses": [md.get("nyesteBeliggenhedsadresse")],
         }
 
-        return {"company": company, "citations": [{"source": "erst", "url": index_url}]}
-
+    @guarded("erst:filings")
     async def list_filings(self, cvr: str, limit: int = 10) -> Dict[str, Any]:
-        self._ensure_token()
+        await self._ensure_token()
         url = f"{self._api_base.rstrip('/')}/companies/{cvr}/filings"
         headers: Dict[str, str] = {}
-        auth = None
-        if self._auth_url:
-            headers["Authorization"] = f"Bearer {self._token}"
-        elif self._basic_user and self._basic_password:
-            auth = (self._basic_user, self._basic_password)
+        auth = self._auth(headers)
         params = {"limit": limit}
-        cert = (self._cert_path, self._key_path) if self._cert_path and self._key_path else None
-        async with httpx.AsyncClient(timeout=30.0, cert=cert) as client:
-            r = await client.get(url, headers=headers, params=params, auth=auth)
+        r = await self._http.get(url, headers=headers, params=params, auth=auth)
         r.raise_for_status()
         data = r.json()
         filings = []
@@ -231,18 +486,13 @@ class ERSTProvider(Provider):
             )
         return {"filings": filings[:limit], "citations": [{"source": "erst", "url": url}]}
 
+    @guarded("erst:accounts")
     async def get_latest_accounts(self, cvr: str) -> Dict[str, Any]:
-        self._ensure_token()
+        await self._ensure_token()
         url = f"{self._api_base.rstrip('/')}/companies/{cvr}/accounts/latest"
         headers: Dict[str, str] = {}
-        auth = None
-        if self._auth_url:
-            headers["Authorization"] = f"Bearer {self._token}"
-        elif self._basic_user and self._basic_password:
-            auth = (self._basic_user, self._basic_password)
-        cert = (self._cert_path, self._key_path) if self._cert_path and self._key_path else None
-        async with httpx.AsyncClient(timeout=30.0, cert=cert) as client:
-            r = await client.get(url, headers=headers, auth=auth)
+        auth = self._auth(headers)
+        r = await self._http.get(url, headers=headers, auth=auth)
         r.raise_for_status()
         data = r.json()
 
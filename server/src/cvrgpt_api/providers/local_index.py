@@ -0,0 +1,69 @@
+import asyncio
+from typing import Optional
+
+from ..company_index import CompanyIndex
+from ..cursors import InvalidCursorError
+from .base import Provider
+
+
+class LocalIndexProvider(Provider):
+    """
+    Answers search_companies from the local company index and delegates everything else.
+    Until the index has been filled, searches also go to the delegate.
+    """
+
+    def __init__(self, index: CompanyIndex, delegate: Provider):
+        self.index = index
+        self.delegate = delegate
+
+    async def search_companies(
+        self, q: str, limit: int = 10, offset: int = 0, search_after: Optional[list] = None
+    ) -> dict:
+        data = await asyncio.to_thread(self._search, q, limit, offset, search_after)
+        if data is None:
+            kw = {"search_after": search_after} if search_after is not None else {}
+            return await self.delegate.search_companies(q, limit, offset, **kw)
+        return data
+
+    def _search(
+        self, q: str, limit: int, offset: int, search_after: Optional[list]
+    ) -> Optional[dict]:
+        """Blocking SQLite part of search_companies; None while the index is still empty."""
+        if self.index.is_empty():
+            return None
+        try:
+            data = self.index.search(q, limit, offset, after=search_after)
+        except ValueError as e:
+            raise InvalidCursorError(str(e)) from e
+        data["citations"] = [
+            {
+                "source": "cvr_index",
+                "label": "Local CVR index",
+                "accessed_at": self.index.meta_get("synced_at"),
+            }
+        ]
+        return data
+
+    async def get_company(self, cvr: str) -> dict:
+        return await self.delegate.get_company(cvr)
+
+    async def get_companies(self, cvrs: list[str]) -> dict[str, dict]:
+        return await self.delegate.get_companies(cvrs)
+
+    async def list_filings(self, cvr: str, limit: int = 10) -> dict:
+        return await self.delegate.list_filings(cvr, limit)
+
+    async def get_latest_accounts(self, cvr: str) -> dict:
+        return await self.delegate.get_latest_accounts(cvr)
+
+    def ping(self) -> bool:
+        return self.delegate.ping()
+
+    def status(self) -> str:
+        return self.delegate.status()
+
+    async def startup(self) -> None:
+        await self.delegate.startup()
+
+    async def aclose(self) -> None:
+        await self.delegate.aclose()
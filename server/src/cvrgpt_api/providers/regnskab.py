@@ -16,6 +16,9 @@ class RegnskabProvider(Provider):
     def __init__(self):
         self._client = httpx.AsyncClient(timeout=httpx.Timeout(10.0))
 
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
     async def search_companies(self, q: str, limit: int = 10, offset: int = 0) -> dict:
         # Not responsible for search; return empty
         return {"items": [], "citations": []}
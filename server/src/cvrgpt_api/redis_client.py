@@ -1,4 +1,16 @@
 import redis.asyncio as redis  # type: ignore
 from .config import settings
 
-redis_client = redis.from_url(settings.redis_url, encoding="utf-8", decode_responses=True)
+# One connection pool per process, shared by the response cache, the rate limiter and the
+# ERST token cache. Replies are raw bytes so binary cache payloads round-trip unchanged.
+redis_pool: redis.ConnectionPool = redis.ConnectionPool.from_url(settings.redis_url)
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+# KEYS[1] is a lock, ARGV[1] its owner token. Deletes the lock only if we still own it: it may
+# have expired and been taken by another worker in the meantime.
+UNLOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
@@ -0,0 +1,228 @@
+"""
+Async circuit breakers, bulkheads and token buckets for upstream calls.
+
+A breaker opens after fail_max consecutive failures and then fails fast with CircuitOpenError
+for reset_timeout_s. After that one trial call is let through ("half_open"): success closes
+the breaker, failure opens it again. Exceptions listed in `exclude` or matched by `ignore`
+(e.g. a 404 or a bad request) say nothing about the upstream's health and leave the breaker
+as it is.
+
+Breakers are registered by name (get_breaker), so /health and metrics can list them.
+guarded() puts a provider method behind a breaker, a bulkhead (at most N calls of that
+method in flight) and a deadline for the whole call, queueing for a slot included. Running
+out of time in the queue is reported as DeadlineExceededError too, but does not count
+against the breaker.
+"""
+
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple, Type
+
+import httpx
+
+from .config import settings
+from .metrics import CIRCUIT_OPEN
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, name: str, retry_in_s: float):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_in_s:.0f}s")
+        self.name = name
+        self.retry_in_s = retry_in_s
+
+
+class RateLimitedError(Exception):
+    """No token became available within the caller's deadline."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """A guarded call (including waiting for a bulkhead slot) ran past its deadline."""
+
+    def __init__(self, name: str, deadline_s: float):
+        super().__init__(f"'{name}' did not answer within {deadline_s:g}s")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        fail_max: int = 5,
+        reset_timeout_s: float = 30.0,
+        exclude: Tuple[Type[BaseException], ...] = (),
+        ignore: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout_s = reset_timeout_s
+        self.exclude = exclude
+        # Like exclude, for errors that need more than their type to classify (e.g. a 404)
+        self.ignore = ignore
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+
+    def _set(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_OPEN.labels(self.name).set(1 if state == OPEN else 0)
+
+    def _before_call(self) -> None:
+        if self.state == OPEN:
+            retry_in = self.opened_at + self.reset_timeout_s - time.monotonic()
+            if retry_in > 0:
+                raise CircuitOpenError(self.name, retry_in)
+            self._set(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._trial:
+                raise CircuitOpenError(self.name, 0.0)
+            self._trial = True
+
+    def record_success(self) -> None:
+        self._trial = False
+        self.failures = 0
+        if self.state != CLOSED:
+            self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        self._trial = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.fail_max:
+            self.opened_at = time.monotonic()
+            self._set(OPEN)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Run the block through the breaker; raises CircuitOpenError without running it if open."""
+        self._before_call()
+        try:
+            yield
+        except self.exclude:
+            self._trial = False
+            raise
+        except Exception as e:
+            if self.ignore is not None and self.ignore(e):
+                self._trial = False
+            else:
+                self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the upstream, but free the half-open trial slot
+            self._trial = False
+            raise
+        self.record_success()
+
+    def snapshot(self) -> dict:
+        retry_in = max(0.0, self.opened_at + self.reset_timeout_s - time.monotonic())
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in_s": round(retry_in, 1) if self.state == OPEN else 0.0,
+        }
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """The breaker registered under name, created with kwargs on first use."""
+    if name not in breakers:
+        breakers[name] = CircuitBreaker(name, **kwargs)
+    return breakers[name]
+
+
+def is_client_error(e: BaseException) -> bool:
+    """
+    Errors that are the answer, not a sign of upstream trouble: a 4xx response other than 429,
+    or the provider's own not-found (FileNotFoundError). Anything else, including a body that
+    does not parse, counts against the breaker.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        return 400 <= e.response.status_code < 500 and e.response.status_code != 429
+    return isinstance(e, FileNotFoundError)
+
+
+bulkheads: Dict[str, asyncio.Semaphore] = {}
+
+
+def guarded(name: str):
+    """
+    Run an async provider method behind the breaker and bulkhead registered as name, within
+    PROVIDER_DEADLINE_S. Raises CircuitOpenError without calling upstream while the breaker is
+    open, and DeadlineExceededError when the deadline passes.
+    """
+
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrap(*args, **kwargs):
+            breaker = get_breaker(
+                name,
+                fail_max=settings.provider_breaker_fail_max,
+                reset_timeout_s=settings.provider_breaker_reset_s,
+                ignore=is_client_error,
+            )
+            slots = bulkheads.get(name)
+            if slots is None:
+                slots = bulkheads[name] = asyncio.Semaphore(settings.provider_bulkhead)
+            deadline_s = settings.provider_deadline_s
+            deadline_at = asyncio.get_running_loop().time() + deadline_s
+            # Waiting for a slot says nothing about the upstream's health, so it happens
+            # outside the breaker: only the call itself can trip it
+            try:
+                async with asyncio.timeout_at(deadline_at):
+                    await slots.acquire()
+            except TimeoutError as e:
+                raise DeadlineExceededError(name, deadline_s) from e
+            try:
+                async with breaker.guard():
+                    deadline = asyncio.timeout_at(deadline_at)
+                    try:
+                        async with deadline:
+                            return await fn(*args, **kwargs)
+                    except TimeoutError as e:
+                        if not deadline.expired():
+                            raise
+                        raise DeadlineExceededError(name, deadline_s) from e
+            finally:
+                slots.release()
+
+        return wrap
+
+    return deco
+
+
+class TokenBucket:
+    """rate_per_s tokens per second, at most capacity banked for bursts."""
+
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, max_wait_s: Optional[float] = None) -> None:
+        """Take a token, waiting for one if needed; RateLimitedError past max_wait_s."""
+        deadline = None if max_wait_s is None else time.monotonic() + max_wait_s
+        while not self.try_acquire():
+            wait = (1 - self.tokens) / self.rate_per_s
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitedError(f"No token within {max_wait_s}s")
+            await asyncio.sleep(wait)
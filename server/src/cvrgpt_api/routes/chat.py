@@ -1,14 +1,14 @@
-import os
-import json
-import httpx
 import time
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Optional
 from datetime import datetime, timedelta, UTC
 from ..tools.registry import TOOLS
 from cvrgpt_core.accounts.extract import get_annual_result
 from ..security import require_api_key
+from ..chat import nlu
+from ..chat.streaming import ChatEvent, stream_response
+from ..errors import ErrorCode, ErrorPayload
 from ..logging import setup_logging
 
 
@@ -47,116 +47,63 @@ class ChatRequest(BaseModel):
     messages: List[ChatTurn]
 
 
+async def _action_blocks(action: str, args: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Response blocks for an action, each yielded as soon as it is ready; none if unsupported."""
+    if action == "events_search":
+        months = int(args.get("last_n_months") or 3)
+        date_to = datetime.now(UTC)
+        date_from = date_to - timedelta(days=30 * months)
+        nace = args.get("nace_prefixes") or ["62"]
+        yield {
+            "type": "chips",
+            "items": [
+                {"label": f"type: {args.get('event_type') or 'bankruptcy'}"},
+                {"label": f"nace: {','.join(nace)}"},
+                {"label": f"window: last {months} months"},
+            ],
+        }
+        yield await TOOLS["events_search"]["fn"](
+            {
+                "event_type": args.get("event_type") or "bankruptcy",
+                "nace_prefixes": nace,
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+                "limit": int(args.get("limit") or 50),
+            }
+        )
+    elif action == "annual_result":
+        company = str(args.get("company") or "").strip().strip('"')
+        year = int(args.get("year") or 0)
+        if not company or not year:
+            return
+        hit = get_annual_result(company, year)
+        if not hit:
+            yield {"type": "text", "text": f"No annual result found for {company} in {year} (yet)."}
+            return
+        yield {"type": "text", "text": f"Annual result ({year}) for {company}:"}
+        yield {
+            "type": "table",
+            "columns": ["Metric", "Value", "Currency"],
+            "rows": [[hit["label"], f"{hit['value']:,}", hit["currency"]]],
+        }
+        yield {
+            "type": "text",
+            "subtle": True,
+            "text": f"Source: {hit['source_id']} ({hit['source_url']})",
+        }
+
+
 async def _llm_route(user_msg: str) -> Optional[Dict[str, Any]]:
     """
-    Try to resolve the user message using an LLM that returns a structured action.
+    Resolve the user message to a structured action (chat.nlu: local rules, then the LLM).
     Returns a dict with keys {"blocks": [...]} on success, or None to fall back.
-    Expected actions:
-      - {"action": "events_search", "args": {"event_type": "bankruptcy", "nace_prefixes": ["62"], "last_n_months": 3 }}
-      - {"action": "annual_result", "args": {"company": "Name", "year": 2022 }}
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    model = os.getenv("CHAT_NLU_MODEL", "gpt-4o-mini")
-    if not api_key:
-        return None
-
-    system = (
-        "You map user queries about Danish companies into JSON actions. "
-        "Only return JSON. Supported actions: \n"
-        "- events_search: args: {event_type: string (e.g., bankruptcy), nace_prefixes: string[], last_n_months: int}\n"
-        "- annual_result: args: {company: string, year: int}\n"
-        'If no suitable action, return {"action": "none"}.'
-    )
-    user = f"Query: {user_msg}\nReturn JSON only."
-
-    body = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        "response_format": {"type": "json_object"},
-    }
-
     try:
-        t0 = time.time()
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            r = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=body,
-            )
-        dt = (time.time() - t0) * 1000
-        if r.status_code != 200:
-            log.warning(f"v1/chat LLM failed status={r.status_code} time_ms={dt:.0f}")
+        routed = await nlu.route(user_msg)
+        if routed is None:
             return None
-        data = r.json()
-        content = ((data.get("choices") or [{}])[0].get("message") or {}).get("content") or "{}"
-        obj = json.loads(content)
-        action = (obj.get("action") or "none").lower()
-        args = obj.get("args") or {}
-
-        if action == "events_search":
-            months = int(args.get("last_n_months") or 3)
-            date_to = datetime.now(UTC)
-            date_from = date_to - timedelta(days=30 * months)
-            nace = args.get("nace_prefixes") or ["62"]
-            result = TOOLS["events_search"]["fn"](
-                {
-                    "event_type": args.get("event_type") or "bankruptcy",
-                    "nace_prefixes": nace,
-                    "date_from": date_from.isoformat(),
-                    "date_to": date_to.isoformat(),
-                    "limit": int(args.get("limit") or 50),
-                }
-            )
-            return {
-                "blocks": [
-                    {
-                        "type": "chips",
-                        "items": [
-                            {"label": f"type: {args.get('event_type') or 'bankruptcy'}"},
-                            {"label": f"nace: {','.join(nace)}"},
-                            {"label": f"window: last {months} months"},
-                        ],
-                    },
-                    result,
-                ]
-            }
-        if action == "annual_result":
-            company = str(args.get("company") or "").strip().strip('"')
-            year = int(args.get("year") or 0)
-            if not company or not year:
-                return None
-            hit = get_annual_result(company, year)
-            if not hit:
-                return {
-                    "blocks": [
-                        {
-                            "type": "text",
-                            "text": f"No annual result found for {company} in {year} (yet).",
-                        }
-                    ]
-                }
-            return {
-                "blocks": [
-                    {"type": "text", "text": f"Annual result ({year}) for {company}:"},
-                    {
-                        "type": "table",
-                        "columns": ["Metric", "Value", "Currency"],
-                        "rows": [[hit["label"], f"{hit['value']:,}", hit["currency"]]],
-                    },
-                    {
-                        "type": "text",
-                        "subtle": True,
-                        "text": f"Source: {hit['source_id']} ({hit['source_url']})",
-                    },
-                ]
-            }
-        return None
+        blocks = [block async for block in _action_blocks(*routed)]
+        return {"blocks": blocks} if blocks else None
     except Exception as e:
         log.warning(f"v1/chat LLM exception: {e}")
         return None
@@ -181,3 +128,36 @@ async def chat(req: ChatRequest):
         "thread_id": req.thread_id,
         "blocks": llm["blocks"],
     }
+
+
+async def _stream_turn(req: ChatRequest) -> AsyncIterator[ChatEvent]:
+    user_msg = req.messages[-1].content.strip() if req.messages else ""
+    t0 = time.time()
+    yield "start", {"thread_id": req.thread_id}
+    yield "progress", {"step": "nlu", "message": "Interpreting the question"}
+    routed = await nlu.route(user_msg)
+    sent = 0
+    if routed is not None:
+        yield "progress", {"step": routed[0], "message": "Fetching data"}
+        async for block in _action_blocks(*routed):
+            sent += 1
+            yield "block", block
+    dt = (time.time() - t0) * 1000
+    if not sent:
+        log.warning(f"v1/chat/stream LLM unavailable time_ms={dt:.0f}")
+        yield "error", ErrorPayload(
+            code=ErrorCode.PROVIDER_DOWN,
+            message="LLM NLU unavailable. Ensure OPENAI_API_KEY is configured and the model "
+            "is reachable.",
+        ).model_dump()
+        return
+    log.info(f"v1/chat/stream handled time_ms={dt:.0f}")
+    yield "done", {"thread_id": req.thread_id}
+
+
+@router.post(
+    "/stream", dependencies=[Depends(require_api_key), Depends(get_rate_limiter(30, 60))]
+)
+async def chat_stream(req: ChatRequest, request: Request):
+    """POST /v1/chat as server-sent events (or NDJSON): progress first, then each block."""
+    return stream_response(request, _stream_turn(req))
@@ -3,6 +3,8 @@ from datetime import datetime, timedelta, UTC
 from typing import Optional, List
 from cvrgpt_core.models import EventFilter
 from cvrgpt_core.providers.erst_events import ErstEventsProvider
+from cvrgpt_core.providers.event_index import event_key
+from ..cursors import decode_cursor, encode_cursor, query_scope
 
 router = APIRouter(prefix="/v1/events", tags=["events"])
 _provider = ErstEventsProvider()
@@ -11,14 +13,15 @@ def _parse_date(s: Optional[str]) -> Optional[datetime]:
     return datetime.fromisoformat(s) if s else None
 
 @router.get("")
-def list_events(
+async def list_events(
     event_type: Optional[str] = Query(None),
     nace: Optional[List[str]] = Query(None, description="NACE prefixes"),
     from_date: Optional[str] = Query(None),
     to_date: Optional[str] = Query(None),
     last_days: Optional[int] = Query(None, ge=1, le=365),
     limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     df = _parse_date(from_date)
     dt = _parse_date(to_date)
@@ -28,15 +31,28 @@ def list_events(
         dt = datetime.now(UTC)
         df = dt - timedelta(days=last_days)
 
+    scope = query_scope("events", event_type, nace, from_date, to_date, last_days)
+    after = None
+    if cursor:
+        try:
+            ts, cvr, source_id = decode_cursor(cursor, scope)["after"]
+            after = (float(ts), str(cvr), str(source_id))
+        except (KeyError, TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}") from e
+
     filters = EventFilter(
         event_type=event_type,
         nace_prefixes=nace,
         date_from=df,
         date_to=dt,
-        limit=limit,
-        offset=offset
+        limit=limit + 1,  # one extra to know whether there is a next page
+        offset=0 if after else offset,  # a cursor already marks the position
+        after=after
     )
-    items = _provider.list_events(filters)
+    items = await _provider.list_events(filters)
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(scope, after=list(event_key(items[-1]))) if has_more else None
     return {
         "items": [dict(
             cvr=i.cvr, name=i.name, event_type=i.event_type,
@@ -45,5 +61,7 @@ def list_events(
         ) for i in items],
         "count": len(items),
         "limit": limit,
-        "offset": offset
+        "offset": offset,
+        "next_cursor": next_cursor,
+        "has_more": has_more
     }
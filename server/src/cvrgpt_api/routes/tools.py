@@ -10,10 +10,10 @@ class ToolRequest(BaseModel):
     args: Dict[str, Any] = {}
 
 @router.post("/run")
-def run_tool(req: ToolRequest):
+async def run_tool(req: ToolRequest):
     tool = TOOLS.get(req.name)
     if not tool:
         raise HTTPException(404, "Unknown tool")
     # naive schema validation
     fn = tool["fn"]
-    return {"ok": True, "result": fn(req.args)}
+    return {"ok": True, "result": await fn(req.args)}
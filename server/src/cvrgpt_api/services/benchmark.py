@@ -0,0 +1,264 @@
+"""
+Peer benchmarking against the financials store.
+
+For a fiscal year the store is turned into one matrix per industry (NACE prefix): a row per
+company with its size band and four ratios (revenue growth, EBIT margin, solvency,
+liquidity), plus every ratio column pre-sorted per size band. A benchmark request is then a
+handful of np.searchsorted calls on those sorted columns, independent of how the peers are
+distributed, so benchmarking a company against 10k peers takes a millisecond or two.
+
+Matrices are built lazily per (year, NACE digits) and dropped when the store file changes.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..financials_store import PYARROW_AVAILABLE, FinancialsStore, get_financials_store
+
+if PYARROW_AVAILABLE:
+    import numpy as np
+
+RATIOS = ("revenue_growth", "ebit_margin", "solvency", "liquidity")
+
+# Revenue (DKK) band edges: <10M, 10-50M, 50-250M, 250M-1B, >=1B
+SIZE_BANDS = (10e6, 50e6, 250e6, 1e9)
+
+DEFAULT_NACE_DIGITS = 2
+DEFAULT_MIN_PEERS = 5
+ALL_BANDS = -1
+
+
+def _ratios(cur: Dict[str, Any], prev: Dict[str, Any]) -> "np.ndarray":
+    """(n, 4) ratio matrix for the companies in cur; NaN where a ratio is undefined."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        revenue = cur["revenue"].astype(np.float64)
+        # Previous-year revenue aligned on cvr (both arrays are sorted by cvr)
+        prev_revenue = np.full(len(revenue), np.nan)
+        if len(prev["cvr"]):
+            pos = np.searchsorted(prev["cvr"], cur["cvr"])
+            pos = np.minimum(pos, len(prev["cvr"]) - 1)
+            hit = prev["cvr"][pos] == cur["cvr"]
+            prev_revenue[hit] = prev["revenue"].astype(np.float64)[pos[hit]]
+        out = np.column_stack(
+            [
+                np.where(prev_revenue > 0, revenue / prev_revenue - 1.0, np.nan),
+                np.where(revenue > 0, cur["ebit"] / revenue, np.nan),
+                np.where(cur["assets"] > 0, cur["equity"] / cur["assets"], np.nan),
+                np.where(
+                    cur["current_liabilities"] > 0,
+                    cur["current_assets"] / cur["current_liabilities"],
+                    np.nan,
+                ),
+            ]
+        )
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def _band_bounds(band: int) -> Dict[str, Optional[float]]:
+    edges = (None, *SIZE_BANDS, None)
+    return {"min_revenue": edges[band], "max_revenue": edges[band + 1]}
+
+
+@dataclass
+class PeerMatrix:
+    """One industry in one fiscal year."""
+
+    cvrs: "np.ndarray"  # int64, sorted
+    bands: "np.ndarray"  # int8, -1 where revenue is missing
+    values: "np.ndarray"  # float64 (n, len(RATIOS))
+    revenue: "np.ndarray"
+    # band (or ALL_BANDS) -> one sorted, NaN-free array per ratio
+    sorted: Dict[int, List["np.ndarray"]]
+
+    @classmethod
+    def build(cls, cvrs, bands, values, revenue) -> "PeerMatrix":
+        groups = {ALL_BANDS: np.ones(len(cvrs), dtype=bool)}
+        for band in np.unique(bands[bands >= 0]):
+            groups[int(band)] = bands == band
+        sorted_cols = {}
+        for band, mask in groups.items():
+            cols = []
+            for j in range(values.shape[1]):
+                col = values[mask, j]
+                cols.append(np.sort(col[~np.isnan(col)]))
+            sorted_cols[band] = cols
+        return cls(cvrs, bands, values, revenue, sorted_cols)
+
+    def row(self, cvr: int) -> Optional[int]:
+        i = int(np.searchsorted(self.cvrs, cvr))
+        return i if i < len(self.cvrs) and self.cvrs[i] == cvr else None
+
+
+def _percentile(sorted_col: "np.ndarray", value: float) -> Optional[float]:
+    """Mid-rank percentile of value among sorted_col (ties count half)."""
+    n = len(sorted_col)
+    if n == 0 or np.isnan(value):
+        return None
+    lo = np.searchsorted(sorted_col, value, side="left")
+    hi = np.searchsorted(sorted_col, value, side="right")
+    return float((lo + hi) / 2 / n * 100)
+
+
+def _quantiles(sorted_col: "np.ndarray") -> Dict[str, Optional[float]]:
+    if len(sorted_col) == 0:
+        return {"p25": None, "median": None, "p75": None}
+    p25, median, p75 = np.quantile(sorted_col, (0.25, 0.5, 0.75))
+    return {"p25": float(p25), "median": float(median), "p75": float(p75)}
+
+
+def _float(v) -> Optional[float]:
+    return None if v is None or np.isnan(v) else float(v)
+
+
+class BenchmarkEngine:
+    def __init__(self, store: FinancialsStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[int, int]] = None
+        self._matrices: Dict[Tuple[int, int], Dict[str, PeerMatrix]] = {}
+
+    def matrices(self, year: int, nace_digits: int = DEFAULT_NACE_DIGITS) -> Dict[str, PeerMatrix]:
+        """Peer matrices for a fiscal year keyed by NACE prefix, built on first use."""
+        version = self.store.version
+        key = (year, nace_digits)
+        with self._lock:
+            if version != self._version:
+                self._matrices.clear()
+                self._version = version
+            if key not in self._matrices:
+                self._matrices[key] = self._build(year, nace_digits)
+            return self._matrices[key]
+
+    def _build(self, year: int, nace_digits: int) -> Dict[str, PeerMatrix]:
+        cur = self.store.year_columns(
+            year,
+            [
+                "nace",
+                "revenue",
+                "ebit",
+                "equity",
+                "assets",
+                "current_assets",
+                "current_liabilities",
+            ],
+        )
+        prev = self.store.year_columns(year - 1, ["revenue"])
+        values = _ratios(cur, prev)
+        revenue = cur["revenue"].astype(np.float64)
+        bands = np.where(
+            np.isnan(revenue), -1, np.searchsorted(SIZE_BANDS, revenue, side="right")
+        ).astype(np.int8)
+
+        # Missing codes (None) become "", then a fixed-width cast truncates codes to their prefix
+        codes = np.where(cur["nace"].astype(bool), cur["nace"], "").astype(str)
+        has_code = np.char.str_len(codes) >= nace_digits
+        prefixes = codes.astype(f"U{nace_digits}")
+        out: Dict[str, PeerMatrix] = {}
+        if not has_code.any():
+            return out
+        codes, inverse = np.unique(prefixes[has_code], return_inverse=True)
+        idx = np.flatnonzero(has_code)
+        for g, code in enumerate(codes):
+            rows = idx[inverse == g]
+            out[str(code)] = PeerMatrix.build(
+                cur["cvr"][rows], bands[rows], values[rows], revenue[rows]
+            )
+        return out
+
+    def benchmark(
+        self,
+        cvr: str,
+        year: Optional[int] = None,
+        nace_digits: int = DEFAULT_NACE_DIGITS,
+        min_peers: int = DEFAULT_MIN_PEERS,
+        peer_limit: int = 10,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Percentile ranks of the company's ratios among industry peers in its size band (the
+        whole industry if the band has fewer than min_peers companies). None when the company
+        has no stored accounts or industry code for the year.
+        """
+        own = self.store.company_years(
+            cvr, years=[year] if year else None, last=None if year else 1, metrics=("revenue",)
+        )
+        if not own["year"]:
+            return None
+        year = own["year"][-1]
+        nace = (own.get("nace") or [None])[-1]
+        if not nace or len(nace) < nace_digits:
+            return None
+        matrix = self.matrices(year, nace_digits).get(nace[:nace_digits])
+        if matrix is None:
+            return None
+        i = matrix.row(int(cvr))
+        if i is None:
+            return None
+
+        band = int(matrix.bands[i])
+        in_group = matrix.bands == band
+        # Fall back to the whole industry when the size band is too thin to rank against
+        if band < 0 or in_group.sum() - 1 < min_peers:
+            band = ALL_BANDS
+            in_group = np.ones(len(matrix.cvrs), dtype=bool)
+        group = band
+        metrics = {}
+        for j, name in enumerate(RATIOS):
+            # The company itself is part of the sorted columns; peer counts exclude it
+            col = matrix.sorted[group][j]
+            value = matrix.values[i, j]
+            metrics[name] = {
+                "value": _float(value),
+                "percentile": _percentile(col, value),
+                "peers": int(len(col) - (0 if np.isnan(value) else 1)),
+                **_quantiles(col),
+            }
+
+        return {
+            "cvr": cvr,
+            "year": year,
+            "industry": {"code": nace[:nace_digits], "digits": nace_digits},
+            "size_band": (
+                {"band": group, **_band_bounds(group)} if group != ALL_BANDS else None
+            ),
+            "peer_count": int(in_group.sum()) - 1,
+            "metrics": metrics,
+            "peers": self._closest(matrix, i, in_group, peer_limit),
+        }
+
+    def _closest(self, matrix: PeerMatrix, i: int, in_group, limit: int) -> List[Dict[str, Any]]:
+        """The peers nearest in revenue (log scale) with their ratios."""
+        if limit <= 0:
+            return []
+        mask = in_group.copy()
+        mask[i] = False
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return []
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = np.abs(np.log(matrix.revenue[rows]) - np.log(matrix.revenue[i]))
+        distance = np.where(np.isfinite(distance), distance, np.inf)
+        nearest = rows[np.argsort(distance, kind="stable")[:limit]]
+        return [
+            {
+                "cvr": str(int(matrix.cvrs[r])),
+                "revenue": _float(matrix.revenue[r]),
+                **{name: _float(matrix.values[r, j]) for j, name in enumerate(RATIOS)},
+            }
+            for r in nearest
+        ]
+
+
+_engine: Optional[BenchmarkEngine] = None
+
+
+def get_benchmark_engine() -> Optional[BenchmarkEngine]:
+    """Engine over the configured financials store, or None if there is no store."""
+    global _engine
+    store = get_financials_store()
+    if store is None:
+        return None
+    if _engine is None or _engine.store is not store:
+        _engine = BenchmarkEngine(store)
+    return _engine
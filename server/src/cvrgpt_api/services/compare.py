@@ -97,6 +97,40 @@ def compare_accounts_snapshots(
     }
 
 
+def compare_latest_accounts(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the /v1/compare payload from a provider get_latest_accounts() result."""
+    accounts_data = data.get("accounts") if data else None
+    current_snapshot = None
+    previous_snapshot = None
+
+    if accounts_data and isinstance(accounts_data, dict):
+        current_data = accounts_data.get("current")
+        previous_data = accounts_data.get("previous")
+
+        if current_data:
+            current_snapshot = AccountsSnapshot(**current_data)
+        if previous_data:
+            previous_snapshot = AccountsSnapshot(**previous_data)
+
+    comparison_result = compare_accounts_snapshots(current_snapshot, previous_snapshot)
+
+    # Add original citations
+    all_sources = [
+        s.model_dump() if hasattr(s, "model_dump") else s
+        for s in comparison_result.get("sources", [])
+    ]
+    if data and data.get("citations"):
+        all_sources.extend(data.get("citations", []))
+
+    return {
+        "current_period": comparison_result.get("current_period"),
+        "previous_period": comparison_result.get("previous_period"),
+        "key_changes": [change.model_dump() for change in comparison_result.get("key_changes", [])],
+        "narrative": comparison_result.get("narrative", "No comparison available."),
+        "sources": all_sources,
+    }
+
+
 def format_currency(value: Optional[Union[float, Decimal]]) -> str:
     """Format currency values in millions/thousands."""
     if value is None:
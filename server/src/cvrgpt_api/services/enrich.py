@@ -0,0 +1,224 @@
+"""
+Bulk enrichment of CVR lists.
+
+Input is a stream of CVRs (CSV with the CVR in the first or "cvr" column, NDJSON objects with
+a "cvr" field, or one CVR per line). Each CVR is enriched with its company profile, latest
+accounts and accounts comparison, and results are yielded as NDJSON-ready dicts as soon as
+they complete.
+
+At most `concurrency` CVRs are in flight and the next input line is only read once a slot
+frees up and the previous result has been consumed, so memory stays flat and a slow reader
+slows the pipeline down instead of buffering results. Company profiles of the CVRs in
+flight are fetched together with one provider.get_companies query (see CompanyBatcher).
+
+Input lines that cannot be parsed keep their position and come back as
+{"seq": n, "error": "BAD_INPUT"} records instead of ending the stream.
+
+Every `checkpoint_every` completed inputs a {"checkpoint": n} record is emitted: all inputs
+before position n are done, and passing start=n resumes from there (results at or after n
+may be repeated).
+"""
+
+import asyncio
+import heapq
+import json
+from typing import IO, Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from ..providers.base import Provider
+from .compare import compare_latest_accounts
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_CHECKPOINT_EVERY = 500
+ITEM_TIMEOUT_S = 30.0
+# How long the first company lookup of a batch waits for others to join it
+BATCH_WINDOW_S = 0.005
+
+
+async def iter_chunks(f: IO[bytes], size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """Read a binary file in fixed-size chunks, off the event loop."""
+    while chunk := await asyncio.to_thread(f.read, size):
+        yield chunk
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without reading it all into memory."""
+    buf = b""
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").strip()
+    if buf:
+        yield buf.decode("utf-8-sig").strip()
+
+
+async def parse_cvrs(lines: AsyncIterable[str]) -> AsyncIterator[str | Dict[str, Any]]:
+    """
+    Extract CVRs from CSV, NDJSON or plain lines. Blank lines and CSV headers are skipped;
+    a malformed NDJSON line yields an error record in place of its CVR.
+    """
+    column: Optional[int] = None
+    async for line in lines:
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                cvr = str(json.loads(line).get("cvr") or "")
+            except ValueError as e:
+                yield {"error": "BAD_INPUT", "detail": str(e)}
+                continue
+        else:
+            fields = [f.strip().strip('"') for f in line.replace(";", ",").split(",")]
+            lowered = [f.lower() for f in fields]
+            if column is None and "cvr" in lowered:
+                column = lowered.index("cvr")
+                continue
+            cvr = fields[column or 0] if len(fields) > (column or 0) else ""
+        if cvr:
+            yield cvr
+
+
+class CompanyBatcher:
+    """
+    Coalesces concurrent company lookups into one provider.get_companies call per
+    BATCH_WINDOW_S, so the CVRs in flight cost one upstream query instead of one each.
+    """
+
+    def __init__(self, provider: Provider, window_s: float = BATCH_WINDOW_S):
+        self.provider = provider
+        self.window_s = window_s
+        self._waiting: Dict[str, List["asyncio.Future[Dict[str, Any]]"]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lookups: Set["asyncio.Task[None]"] = set()
+
+    async def get_company(self, cvr: str) -> Dict[str, Any]:
+        """Same result as provider.get_company(cvr); FileNotFoundError if there is no such CVR."""
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[Dict[str, Any]]" = loop.create_future()
+        self._waiting.setdefault(cvr, []).append(fut)
+        if self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        self._timer = None
+        waiting, self._waiting = self._waiting, {}
+        task = asyncio.ensure_future(self._lookup(waiting))
+        self._lookups.add(task)
+        task.add_done_callback(self._lookups.discard)
+
+    async def _lookup(self, waiting: Dict[str, List["asyncio.Future[Dict[str, Any]]"]]) -> None:
+        try:
+            found = await self.provider.get_companies(list(waiting))
+        except Exception as e:
+            for futs in waiting.values():
+                for fut in futs:
+                    if not fut.done():
+                        fut.set_exception(e)
+            return
+        for cvr, futs in waiting.items():
+            for fut in futs:
+                if fut.done():  # the caller timed out or went away
+                    continue
+                if cvr in found:
+                    fut.set_result(found[cvr])
+                else:
+                    fut.set_exception(FileNotFoundError(cvr))
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for task in self._lookups:
+            task.cancel()
+
+
+async def enrich_one(
+    provider: Provider, cvr: str, companies: Optional[CompanyBatcher] = None
+) -> Dict[str, Any]:
+    """Company profile, latest accounts and comparison for one CVR. Errors are reported inline."""
+    get_company = companies.get_company if companies is not None else provider.get_company
+    company: Dict[str, Any] | BaseException
+    accounts: Dict[str, Any] | BaseException
+    company, accounts = await asyncio.gather(
+        get_company(cvr), provider.get_latest_accounts(cvr), return_exceptions=True
+    )
+    if isinstance(company, FileNotFoundError):
+        return {"cvr": cvr, "error": "NOT_FOUND"}
+    if isinstance(company, BaseException):
+        return {"cvr": cvr, "error": "UPSTREAM_ERROR", "detail": str(company)}
+    out: Dict[str, Any] = {"cvr": cvr, "company": company.get("company")}
+    if isinstance(accounts, BaseException):
+        out["accounts_error"] = str(accounts)
+    else:
+        out["accounts"] = accounts.get("accounts") if accounts else None
+        out["comparison"] = compare_latest_accounts(accounts)
+    return out
+
+
+async def enrich_stream(
+    cvrs: AsyncIterable[str | Dict[str, Any]],
+    provider: Provider,
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    start: int = 0,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    item_timeout: float = ITEM_TIMEOUT_S,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield one result per input CVR (tagged with its input position "seq") plus checkpoints.
+    Inputs that are already error records (see parse_cvrs) are passed through in order.
+    """
+    companies = CompanyBatcher(provider)
+
+    async def run(seq: int, cvr: str) -> Tuple[int, Dict[str, Any]]:
+        try:
+            result = await asyncio.wait_for(enrich_one(provider, cvr, companies), item_timeout)
+        except TimeoutError:
+            result = {"cvr": cvr, "error": "TIMEOUT"}
+        return seq, {"seq": seq, **result}
+
+    pending: set["asyncio.Task[Tuple[int, Dict[str, Any]]]"] = set()
+    completed: list[int] = []  # min-heap of finished positions above the watermark
+    watermark = start  # every position below this has been yielded
+    last_checkpoint = start
+
+    def advance(seq: int) -> None:
+        nonlocal watermark
+        heapq.heappush(completed, seq)
+        while completed and completed[0] == watermark:
+            heapq.heappop(completed)
+            watermark += 1
+
+    async def drain(until_below: int) -> AsyncIterator[Dict[str, Any]]:
+        nonlocal pending, last_checkpoint
+        while len(pending) > until_below:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                seq, result = task.result()
+                advance(seq)
+                yield result
+            if watermark - last_checkpoint >= checkpoint_every:
+                last_checkpoint = watermark
+                yield {"checkpoint": watermark}
+
+    seq = -1
+    try:
+        async for cvr in cvrs:
+            seq += 1
+            if seq < start:
+                continue
+            if isinstance(cvr, dict):
+                advance(seq)
+                yield {"seq": seq, **cvr}
+                continue
+            async for item in drain(concurrency - 1):
+                yield item
+            pending.add(asyncio.ensure_future(run(seq, cvr)))
+        async for item in drain(0):
+            yield item
+    finally:
+        for task in pending:
+            task.cancel()
+        companies.close()
+    yield {"checkpoint": watermark, "done": True}
@@ -5,7 +5,7 @@ from cvrgpt_core.models import EventFilter
 
 _events = ErstEventsProvider()
 
-def tool_events_search(args: Dict[str, Any]) -> Dict[str, Any]:
+async def tool_events_search(args: Dict[str, Any]) -> Dict[str, Any]:
     filters = EventFilter(
         event_type=args.get("event_type"),
         nace_prefixes=args.get("nace_prefixes"),
@@ -14,7 +14,7 @@ def tool_events_search(args: Dict[str, Any]) -> Dict[str, Any]:
         limit=int(args.get("limit", 50)),
         offset=int(args.get("offset", 0)),
     )
-    items = _events.list_events(filters)
+    items = await _events.list_events(filters)
     return {"type": "table", "columns": ["CVR","Name","Type","Subtype","NACE","Date"],
             "rows": [[i.cvr, i.name, i.event_type, i.event_subtype, i.nace, i.event_date.date().isoformat()] for i in items]}
 
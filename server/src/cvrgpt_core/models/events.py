@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 
 
@@ -23,3 +23,5 @@ class EventFilter:
     date_to: Optional[datetime] = None
     limit: int = 50
     offset: int = 0
+    # Keyset cursor: continue after the event with this event_key() (see event_index)
+    after: Optional[Tuple[float, str, str]] = None
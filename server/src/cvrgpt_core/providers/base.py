@@ -18,6 +18,6 @@ class Provider(ABC):
 
 class EventsProvider(ABC):
     @abstractmethod
-    def list_events(self, filters: EventFilter) -> List[Event]:
+    async def list_events(self, filters: EventFilter) -> List[Event]:
         """Return events across companies according to filters."""
         raise NotImplementedError
@@ -1,71 +1,90 @@
+import asyncio
 import json
 import os
-import requests
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 from ..models import Event, EventFilter
 from .base import EventsProvider
+from .event_index import EventIndex
+from .event_log import EventLog, Position, event_from_dict
 
 USE_REAL = os.getenv("ERST_EVENTS_REAL", "0") == "1"
 ERST_BASE = os.getenv("ERST_API_BASE", "https://erst.example")
 ERST_KEY = os.getenv("ERST_API_KEY", "")
+ERST_EVENTS_LOG_DIR = os.getenv("ERST_EVENTS_LOG_DIR", "data/erst_events")
+ERST_EVENTS_WORKERS = int(os.getenv("ERST_EVENTS_WORKERS", "4"))
+
+# Lookups (and the file reads when the log or fixture changes) run here, never on the event
+# loop; the pool is shared by every provider instance, so it also bounds how many run at once
+_EXECUTOR = ThreadPoolExecutor(max_workers=ERST_EVENTS_WORKERS, thread_name_prefix="erst-events")
 
 _FIXTURE = Path(__file__).with_suffix("").parent / "fixtures" / "erst_events.json"
 
 
 class ErstEventsProvider(EventsProvider):
-    def list_events(self, filters: EventFilter) -> List[Event]:
+    """
+    Events from the local event log that scripts/sync_events.py (or the API's sync task)
+    fills from ERST when ERST_EVENTS_REAL=1, otherwise from the bundled fixture. Queries
+    only touch the in-memory index; nothing calls upstream on the request path.
+    """
+
+    def __init__(self, fixture_path: Path = _FIXTURE, log_dir: Optional[str] = None):
+        self.fixture_path = fixture_path
+        self._lock = threading.Lock()
+        self._index: Optional[EventIndex] = None
+        self._version: Optional[Tuple[int, int, int]] = None  # (inode, mtime_ns, size)
+        self.log = EventLog(log_dir or ERST_EVENTS_LOG_DIR)
+        self._log_position: Optional[Position] = None
+
+    async def list_events(self, filters: EventFilter) -> List[Event]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_EXECUTOR, self.query, filters)
+
+    def query(self, filters: EventFilter) -> List[Event]:
+        """Blocking lookup, for callers that are already off the event loop."""
         if not USE_REAL:
             return self._list_fixture(filters)
-        # PSEUDO — replace with real ERST endpoint/params when available:
-        params = {
-            "type": filters.event_type,
-            "nace": ",".join(filters.nace_prefixes or []),
-            "from": filters.date_from.isoformat() if filters.date_from else None,
-            "to": filters.date_to.isoformat() if filters.date_to else None,
-            "limit": filters.limit,
-            "offset": filters.offset,
-        }
-        headers = {"Authorization": f"Bearer {ERST_KEY}"} if ERST_KEY else {}
-        r = requests.get(
-            f"{ERST_BASE}/events",
-            params={k: v for k, v in params.items() if v is not None},
-            headers=headers,
-            timeout=30,
-        )
-        r.raise_for_status()
-        payload = r.json()
-        # Map payload → Event list (adapt fields to actual ERST schema)
-        # TODO: implement mapping when real ERST schema is available
-        return []
+        return self._log_index().query(filters)
+
+    def _log_index(self) -> EventIndex:
+        """The log's events, indexed; new commits are read from the last position only."""
+        st = _stat_version(self.log.checkpoint_path)
+        if st != self._version:
+            with self._lock:
+                if st != self._version:
+                    events, self._log_position = self.log.read(self._log_position)
+                    if self._index is None:
+                        self._index = EventIndex(events)
+                    else:
+                        self._index.add(events)
+                    self._version = st
+        return self._index if self._index is not None else EventIndex()
 
     def _list_fixture(self, filters: EventFilter) -> List[Event]:
         """Fallback to fixture data"""
-        data = json.loads(_FIXTURE.read_text(encoding="utf-8"))
-        out: List[Event] = []
-        for raw in data:
-            ev_date = datetime.fromisoformat(raw["event_date"])
-            if filters.date_from and ev_date < filters.date_from:
-                continue
-            if filters.date_to and ev_date > filters.date_to:
-                continue
-            if filters.event_type and raw["event_type"] != filters.event_type:
-                continue
-            if filters.nace_prefixes:
-                ok = any((raw.get("nace") or "").startswith(pref) for pref in filters.nace_prefixes)
-                if not ok:
-                    continue
-            out.append(
-                Event(
-                    cvr=raw["cvr"],
-                    name=raw["name"],
-                    event_type=raw["event_type"],
-                    event_subtype=raw.get("event_subtype"),
-                    nace=raw.get("nace"),
-                    event_date=ev_date,
-                    source_id=raw.get("source_id"),
-                    source_url=raw.get("source_url"),
-                )
-            )
-        return out[filters.offset : filters.offset + filters.limit]
+        return self.index().query(filters)
+
+    def index(self) -> EventIndex:
+        """The fixture events, parsed and indexed once; rebuilt when the file changes."""
+        version = _stat_version(self.fixture_path)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._index = EventIndex(_load_events(self.fixture_path))
+                    self._version = version
+        assert self._index is not None
+        return self._index
+
+
+def _stat_version(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _load_events(path: Path) -> List[Event]:
+    return [event_from_dict(raw) for raw in json.loads(path.read_text(encoding="utf-8"))]
@@ -0,0 +1,160 @@
+"""
+In-memory index over events.
+
+Events are kept sorted by date in one partition per event_type (plus one across all
+types). Each partition also has a trie over the digits of the NACE code whose nodes hold
+the date-sorted events below them, so a date window is two bisects on the right node and
+results come out newest first without scanning or parsing anything else:
+O(log n + k) for a query returning k events. Keyset pages (filters.after) start with one
+more bisect at the cursor, so every page costs the same however deep it is.
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from datetime import UTC, datetime
+from itertools import dropwhile, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..models import Event, EventFilter
+
+
+def _ts(dt: datetime) -> float:
+    """POSIX timestamp; naive datetimes are taken as UTC."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.timestamp()
+
+
+def nace_digits(code: Optional[str]) -> str:
+    """Digits of a NACE code ("62.01" -> "6201")."""
+    return "".join(ch for ch in (code or "") if ch.isdigit())
+
+
+class _Run:
+    """Events in ascending date order with a parallel list of timestamps for bisect."""
+
+    __slots__ = ("dates", "events")
+
+    def __init__(self) -> None:
+        self.dates: List[float] = []
+        self.events: List[Event] = []
+
+    def window(self, lo: Optional[float], hi: Optional[float]) -> Iterator[Event]:
+        """Events with lo <= date <= hi, newest first."""
+        start = bisect_left(self.dates, lo) if lo is not None else 0
+        end = bisect_right(self.dates, hi) if hi is not None else len(self.dates)
+        return (self.events[i] for i in range(end - 1, start - 1, -1))
+
+
+class _Node(_Run):
+    __slots__ = ("children",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.children: Dict[str, "_Node"] = {}
+
+
+class _Partition:
+    def __init__(self) -> None:
+        self.all = _Run()
+        self.trie = _Node()
+
+    def add(self, ts: float, event: Event) -> None:
+        """Append; callers add events in ascending date order."""
+        self.all.dates.append(ts)
+        self.all.events.append(event)
+        node = self.trie
+        for ch in nace_digits(event.nace):
+            node = node.children.setdefault(ch, _Node())
+            node.dates.append(ts)
+            node.events.append(event)
+
+    def node(self, prefix: str) -> Optional[_Node]:
+        node = self.trie
+        for ch in prefix:
+            child = node.children.get(ch)
+            if child is None:
+                return None
+            node = child
+        return node
+
+
+def event_key(event: Event) -> Tuple[float, str, str]:
+    """(timestamp, cvr, source_id): the index order, unique per event, so usable as a cursor."""
+    return (_ts(event.event_date), event.cvr, event.source_id or "")
+
+
+class EventIndex:
+    def __init__(self, events: Iterable[Event] = ()):
+        self._build(sorted(events, key=event_key))
+
+    def _build(self, ordered: List[Event]) -> None:
+        all_events = _Partition()
+        by_type: Dict[str, _Partition] = {}
+        for event in ordered:
+            ts = _ts(event.event_date)
+            all_events.add(ts, event)
+            by_type.setdefault(event.event_type, _Partition()).add(ts, event)
+        self._all, self._by_type = all_events, by_type
+
+    def add(self, events: Iterable[Event]) -> None:
+        """
+        Add events from a feed update. Events newer than everything indexed (the usual case)
+        are appended in place; anything older makes the index rebuild.
+        """
+        new = sorted(events, key=event_key)
+        if not new:
+            return
+        current = self._all.all.events
+        if current and event_key(new[0]) < event_key(current[-1]):
+            self._build(sorted([*current, *new], key=event_key))
+            return
+        for event in new:
+            ts = _ts(event.event_date)
+            self._all.add(ts, event)
+            self._by_type.setdefault(event.event_type, _Partition()).add(ts, event)
+
+    def __len__(self) -> int:
+        return len(self._all.all.events)
+
+    def __iter__(self) -> Iterator[Event]:
+        """All events, oldest first."""
+        return iter(self._all.all.events)
+
+    def query(self, filters: EventFilter) -> List[Event]:
+        """Events matching filters, newest first, sliced by offset/limit."""
+        return list(islice(self.iter(filters), filters.offset, filters.offset + filters.limit))
+
+    def iter(self, filters: EventFilter) -> Iterator[Event]:
+        if filters.event_type:
+            partition = self._by_type.get(filters.event_type)
+            if partition is None:
+                return iter(())
+        else:
+            partition = self._all
+        lo = _ts(filters.date_from) if filters.date_from else None
+        hi = _ts(filters.date_to) if filters.date_to else None
+        after = filters.after or None
+        if after is not None and (hi is None or after[0] < hi):
+            hi = after[0]
+        if not filters.nace_prefixes:
+            return _after(partition.all.window(lo, hi), after)
+
+        # Nested prefixes ("62", "6201") would return the same events twice: keep the shortest
+        prefixes = sorted({nace_digits(p) for p in filters.nace_prefixes if nace_digits(p)})
+        roots = [
+            p for i, p in enumerate(prefixes) if not any(p.startswith(q) for q in prefixes[:i])
+        ]
+        runs = [node.window(lo, hi) for node in map(partition.node, roots) if node is not None]
+        if len(runs) == 1:
+            return _after(runs[0], after)
+        return _after(heapq.merge(*runs, key=event_key, reverse=True), after)
+
+
+def _after(
+    events: Iterator[Event], after: Optional[Tuple[float, str, str]]
+) -> Iterator[Event]:
+    """Drop the events at or before the cursor; the window already ends at its timestamp."""
+    if after is None:
+        return events
+    return dropwhile(lambda e: event_key(e) >= after, events)
@@ -0,0 +1,139 @@
+"""
+Local append-only event log.
+
+Events are appended as NDJSON to numbered segment files (segment-00000001.ndjson, ...); a
+new segment starts when the active one passes segment_max_bytes. After every append the
+log position (segment, byte offset) and the upstream sync cursor are written atomically to
+checkpoint.json. The checkpoint is the commit point: readers never read past it, and
+recover() (run before every sync) truncates anything after it, e.g. from a crash between
+append and checkpoint, so the sync re-fetches exactly those events from the stored cursor.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..models import Event
+
+SEGMENT_MAX_BYTES = 64 << 20
+CHECKPOINT = "checkpoint.json"
+
+Position = Tuple[int, int]  # (segment number, byte offset)
+
+
+def event_to_dict(event: Event) -> Dict[str, Any]:
+    return {
+        "cvr": event.cvr,
+        "name": event.name,
+        "event_type": event.event_type,
+        "event_subtype": event.event_subtype,
+        "nace": event.nace,
+        "event_date": event.event_date.isoformat(),
+        "source_id": event.source_id,
+        "source_url": event.source_url,
+    }
+
+
+def event_from_dict(raw: Dict[str, Any]) -> Event:
+    return Event(
+        cvr=raw["cvr"],
+        name=raw["name"],
+        event_type=raw["event_type"],
+        event_subtype=raw.get("event_subtype"),
+        nace=raw.get("nace"),
+        event_date=datetime.fromisoformat(raw["event_date"]),
+        source_id=raw.get("source_id"),
+        source_url=raw.get("source_url"),
+    )
+
+
+class EventLog:
+    def __init__(self, directory: str | Path, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+
+    # --- checkpoint ---
+    @property
+    def checkpoint_path(self) -> Path:
+        return self.directory / CHECKPOINT
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """{"segment", "offset", "cursor", "count", ...}; segment 0 means an empty log."""
+        try:
+            return json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {"segment": 0, "offset": 0, "cursor": None, "count": 0}
+
+    def _write_checkpoint(self, data: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    def _segment_path(self, n: int) -> Path:
+        return self.directory / f"segment-{n:08d}.ndjson"
+
+    def _segment_numbers(self) -> List[int]:
+        return sorted(int(p.stem.split("-")[1]) for p in self.directory.glob("segment-*.ndjson"))
+
+    # --- writes (single writer) ---
+    def recover(self) -> None:
+        """Drop anything appended after the last checkpoint."""
+        with self._lock:
+            cp = self.checkpoint()
+            for n in self._segment_numbers():
+                if n > cp["segment"]:
+                    self._segment_path(n).unlink()
+            if cp["segment"]:
+                path = self._segment_path(cp["segment"])
+                if path.exists() and path.stat().st_size > cp["offset"]:
+                    with path.open("r+b") as f:
+                        f.truncate(cp["offset"])
+
+    def append(self, events: Iterable[Event], cursor: Any = None, **extra: Any) -> Position:
+        """Append events, then commit them together with the sync cursor."""
+        with self._lock:
+            cp = self.checkpoint()
+            data = b"".join(
+                json.dumps(event_to_dict(e), ensure_ascii=False).encode("utf-8") + b"\n"
+                for e in events
+            )
+            segment, offset = cp["segment"], cp["offset"]
+            count = cp["count"]
+            if data:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                if segment == 0 or offset >= self.segment_max_bytes:
+                    segment, offset = segment + 1, 0
+                with self._segment_path(segment).open("ab") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                offset += len(data)
+                count += data.count(b"\n")
+            position = {"segment": segment, "offset": offset, "count": count}
+            self._write_checkpoint({**cp, **extra, **position, "cursor": cursor})
+            return segment, offset
+
+    # --- reads ---
+    def read(self, since: Optional[Position] = None) -> Tuple[List[Event], Position]:
+        """Committed events after position since (default: the start), and the new position."""
+        cp = self.checkpoint()
+        end: Position = (cp["segment"], cp["offset"])
+        segment, offset = since or (0, 0)
+        events: List[Event] = []
+        if (segment, offset) >= end:
+            return events, (segment, offset)
+        for n in self._segment_numbers():
+            if n < segment or n > end[0]:
+                continue
+            start = offset if n == segment else 0
+            stop = end[1] if n == end[0] else None
+            with self._segment_path(n).open("rb") as f:
+                f.seek(start)
+                chunk = f.read(None if stop is None else stop - start)
+            events.extend(event_from_dict(json.loads(line)) for line in chunk.splitlines() if line)
+        return events, end
@@ -0,0 +1,125 @@
+"""
+Incremental sync of ERST registration events into the local event log.
+
+Pages through the events endpoint with the cursor stored in the log checkpoint, appending
+each page and committing its cursor in one step, so an interrupted sync resumes at the
+first uncommitted page. The ids of the last committed page are kept in the checkpoint too,
+because the final cursor is re-requested on the next run to pick up new events.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from ..models import Event
+from .event_log import EventLog
+
+logger = logging.getLogger(__name__)
+
+
+def event_id(event: Event) -> str:
+    return event.source_id or f"{event.cvr}:{event.event_type}:{event.event_date.isoformat()}"
+
+
+def map_event(raw: Dict[str, Any]) -> Optional[Event]:
+    """
+    Map one upstream event record; records without a CVR or date, or with a date that does not
+    parse, are skipped (logged) so one bad record cannot stall the sync.
+    """
+    cvr = raw.get("cvr") or raw.get("cvrNummer")
+    date = raw.get("event_date") or raw.get("date") or raw.get("registreringsdato")
+    if not cvr or not date:
+        return None
+    try:
+        event_date = datetime.fromisoformat(str(date).replace("Z", "+00:00"))
+    except ValueError:
+        logger.warning(f"Skipping ERST event {raw.get('id')} for {cvr}: bad date {date!r}")
+        return None
+    return Event(
+        cvr=str(cvr),
+        name=raw.get("name") or raw.get("navn") or "",
+        event_type=raw.get("event_type") or raw.get("type") or "unknown",
+        event_subtype=raw.get("event_subtype") or raw.get("subtype"),
+        nace=raw.get("nace") or raw.get("branchekode"),
+        event_date=event_date,
+        source_id=str(raw["id"]) if raw.get("id") is not None else raw.get("source_id"),
+        source_url=raw.get("source_url") or raw.get("url"),
+    )
+
+
+class EventSync:
+    def __init__(
+        self,
+        log: EventLog,
+        base_url: str,
+        api_key: str = "",
+        page_size: int = 500,
+        client: Optional[Any] = None,
+        timeout_s: float = 30.0,
+    ):
+        self.log = log
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.page_size = page_size
+        # Anything with async get() and aclose(): httpx.AsyncClient or the API's PooledClient
+        self._client = client or httpx.AsyncClient(timeout=timeout_s)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _page(self, cursor: Any) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"limit": self.page_size}
+        if cursor:
+            params["cursor"] = cursor
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        r = await self._client.get(f"{self.base_url}/events", params=params, headers=headers)
+        r.raise_for_status()
+        return r.json()
+
+    async def run_once(self) -> int:
+        """Append every event after the checkpoint cursor. Returns the number appended."""
+        # Anything written after the last commit (e.g. by a killed sync) is dropped and refetched
+        await asyncio.to_thread(self.log.recover)
+        cp = self.log.checkpoint()
+        cursor = cp.get("cursor")
+        recent = set(cp.get("recent_ids") or [])
+        appended = 0
+        while True:
+            payload = await self._page(cursor)
+            events: List[Event] = [
+                e for e in map(map_event, payload.get("items") or []) if e is not None
+            ]
+            fresh = [e for e in events if event_id(e) not in recent]
+            next_cursor = payload.get("next_cursor")
+            if fresh or (next_cursor and next_cursor != cursor):
+                await asyncio.to_thread(
+                    self.log.append,
+                    fresh,
+                    next_cursor or cursor,
+                    recent_ids=[event_id(e) for e in events],
+                    synced_at=datetime.now().astimezone().isoformat(),
+                )
+                appended += len(fresh)
+            recent = {event_id(e) for e in events}
+            if not next_cursor or next_cursor == cursor or not payload.get("has_more", True):
+                return appended
+            cursor = next_cursor
+
+    async def run_forever(self, interval_s: float = 60.0) -> None:
+        """Sync every interval_s; errors are logged and retried on the next tick."""
+        try:
+            while True:
+                try:
+                    appended = await self.run_once()
+                    if appended:
+                        logger.info(f"Synced {appended} ERST events")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"ERST event sync failed, retrying in {interval_s}s: {e}")
+                await asyncio.sleep(interval_s)
+        finally:
+            await self.aclose()
@@ -1,3 +1,4 @@
+import json
 import os
 
 # Set test environment variables BEFORE importing the app
@@ -125,3 +126,35 @@ def test_thread_context_persistence():
 def teardown_function():
     """Clean up thread state after each test"""
     _STORE.clear()
+
+
+def _sse(text):
+    """[(event, data)] from a server-sent events body"""
+    events = []
+    for chunk in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in chunk.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_chat_stream_sends_progress_then_blocks():
+    body = {"messages": [{"role": "user", "content": "12345678 profile"}]}
+    r = client.post("/chat/stream", headers=HEADERS, json=body)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _sse(r.text)
+    names = [e for e, _ in events]
+    assert names[0] == "start" and names[-1] == "done"
+    assert names.index("progress") < names.index("block")
+    blocks = [d for e, d in events if e == "block"]
+    assert blocks == client.post("/chat", headers=HEADERS, json=body).json()["blocks"]
+
+
+def test_chat_stream_ndjson():
+    body = {"messages": [{"role": "user", "content": "hello"}]}
+    r = client.post(
+        "/chat/stream", headers={**HEADERS, "Accept": "application/x-ndjson"}, json=body
+    )
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [line["event"] for line in lines][-1] == "done"
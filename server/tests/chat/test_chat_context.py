@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from cvrgpt_api.chat import orchestrator
+from cvrgpt_api.chat.context import TurnContext
+from cvrgpt_api.chat.schemas import ChatRequest, ChatTurn
+
+
+class SlowProvider:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self.running = self.peak = 0
+
+    async def _call(self, name, *args):
+        self.calls.append((name, *args))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+
+    async def get_company(self, cvr):
+        await self._call("get_company", cvr)
+        return {"company": {"name": "Demo", "status": "NORMAL"}}
+
+    async def list_filings(self, cvr, limit=10):
+        await self._call("list_filings", cvr)
+        return {"filings": [{"date": "2024-01-01", "type": "AR", "id": "x"}]}
+
+    async def get_latest_accounts(self, cvr):
+        await self._call("get_latest_accounts", cvr)
+        return {"accounts": {}}
+
+    async def search_companies(self, q, limit=10, offset=0):
+        await self._call("search_companies", q)
+        raise RuntimeError("upstream down")
+
+
+def test_memo_shares_inflight_calls_and_caps_concurrency():
+    provider = SlowProvider()
+
+    async def run():
+        turn = TurnContext(provider, concurrency=2)
+        same = await asyncio.gather(*(turn.call("get_company", "1") for _ in range(3)))
+        await asyncio.gather(*(turn.call("get_company", str(i)) for i in range(2, 6)))
+        return turn, same
+
+    turn, same = asyncio.run(run())
+    assert same[0] is same[1] is same[2]
+    assert provider.calls.count(("get_company", "1")) == 1
+    assert provider.peak == 2
+    assert turn.upstream_calls == 5
+
+
+def test_thread_memo_carries_over_and_failures_are_not_memoized():
+    provider, memo = SlowProvider(delay=0), {}
+    asyncio.run(TurnContext(provider, memo).call("get_company", "1"))
+    asyncio.run(TurnContext(provider, memo).call("get_company", "1"))
+    assert provider.calls == [("get_company", "1")]
+
+    turn = TurnContext(provider, memo)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(turn.call("search_companies", "x"))
+    assert provider.calls.count(("search_companies", "x")) == 2
+
+
+def test_multi_intent_turn_runs_lookups_concurrently(monkeypatch):
+    provider = SlowProvider(delay=0.2)
+    monkeypatch.setattr(orchestrator, "get_provider", lambda: provider)
+    req = ChatRequest(messages=[ChatTurn(role="user", content="12345678 filings and revenue")])
+    t0 = time.perf_counter()
+    resp = asyncio.run(orchestrator.handle_chat(req))
+    elapsed = time.perf_counter() - t0
+    assert [b.caption for b in resp.blocks] == [
+        "Latest filings for 12345678",
+        "Financials for 12345678",
+    ]
+    assert provider.peak == 2
+    assert elapsed < 0.35  # the longest call, not the sum
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cvrgpt_api.chat import nlu
+from cvrgpt_api.llm import llm_client
+
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    """Local stand-in for the chat completions API; records the queries it was sent."""
+    queries = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            queries.append(body["messages"][-1]["content"])
+            action = {"action": "events_search", "args": {"event_type": "bankruptcy"}}
+            payload = json.dumps({"choices": [{"message": {"content": json.dumps(action)}}]})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    nlu.clear_cache()
+    yield queries
+    nlu.clear_cache()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        (
+            "Give me recent bankruptcies in the IT sector (last 3 months).",
+            (
+                "events_search",
+                {"event_type": "bankruptcy", "nace_prefixes": ["62"], "last_n_months": 3},
+            ),
+        ),
+        (
+            "konkurser i byggeri de sidste 6 måneder",
+            (
+                "events_search",
+                {
+                    "event_type": "bankruptcy",
+                    "nace_prefixes": ["41", "42", "43"],
+                    "last_n_months": 6,
+                },
+            ),
+        ),
+        (
+            "What was the annual result of Demo IT ApS in 2022?",
+            ("annual_result", {"company": "Demo IT ApS", "year": 2022}),
+        ),
+        (
+            "Årets resultat 2021 for 12345678",
+            ("annual_result", {"company": "12345678", "year": 2021}),
+        ),
+        # Ambiguous: no sector, no year, or nothing recognizable
+        ("recent bankruptcies", None),
+        ("annual result of Demo IT ApS", None),
+        ("hello", None),
+    ],
+)
+def test_classify_local(text, expected):
+    assert nlu.classify_local(text) == expected
+
+
+def test_only_ambiguous_queries_reach_the_llm_once(llm_stub):
+    async def run():
+        try:
+            local = await nlu.route("Recent bankruptcies in the IT sector", mode="hybrid")
+            first = await nlu.route("Any recent bankruptcies?", mode="hybrid")
+            again = await nlu.route("any   recent bankruptcies", mode="hybrid")
+            return local, first, again
+        finally:
+            await llm_client.aclose()
+
+    local, first, again = asyncio.run(run())
+    assert local[1]["nace_prefixes"] == ["62"]
+    assert first == again == ("events_search", {"event_type": "bankruptcy"})
+    assert len(llm_stub) == 1 and "Any recent bankruptcies?" in llm_stub[0]
+
+
+def test_local_mode_never_calls_the_llm(llm_stub):
+    assert asyncio.run(nlu.route("Any recent bankruptcies?", mode="local")) is None
+    assert llm_stub == []
@@ -0,0 +1,66 @@
+import pytest
+
+from cvrgpt_api.chat import state
+from cvrgpt_api.chat.state import MemoryThreadStore, RedisThreadStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(state.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.mark.asyncio
+async def test_memory_store_is_lru_bounded(clock):
+    store = MemoryThreadStore(max_threads=2, ttl_s=60)
+    for tid in ("a", "b"):
+        await store.save(tid, {"ctx": b"x"})
+    await store.load("a")  # a is now more recent than b
+    await store.save("c", {"ctx": b"x"})
+    assert len(store) == 2
+    assert await store.load("b") is None
+    assert await store.load("a") is not None
+
+
+@pytest.mark.asyncio
+async def test_memory_store_expiry_slides_on_use(clock):
+    store = MemoryThreadStore(max_threads=10, ttl_s=60)
+    await store.save("a", {"ctx": b"x"})
+    clock[0] += 50
+    assert await store.get_field("a", "ctx") == b"x"
+    clock[0] += 50  # 100 s after creation, 50 s after last use
+    assert await store.load("a") is not None
+    clock[0] += 61
+    assert await store.load("a") is None
+
+
+@pytest.mark.asyncio
+async def test_thread_roundtrip_and_last_table(monkeypatch):
+    monkeypatch.setattr(state, "_STORE", MemoryThreadStore(max_threads=10, ttl_s=60))
+    thread = await state.load_thread(None)
+    thread.ctx["cvr"] = "12345678"
+    thread.memo["k"] = [1.0, {"company": {"name": "Demo"}}]
+    await state.save_thread(thread)
+    table = {"columns": ["Year"], "rows": [[str(y)] for y in range(2000, 2400)], "caption": "c"}
+    await state.set_last_table(thread.thread_id, table)
+
+    again = await state.load_thread(thread.thread_id)
+    assert again.ctx == {"cvr": "12345678"} and again.memo == thread.memo
+    assert await state.get_last_table(thread.thread_id) == table
+    # Unknown or expired ids start a new thread
+    assert (await state.load_thread("gone")).thread_id != "gone"
+
+
+@pytest.mark.asyncio
+async def test_redis_store_is_shared_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = RedisThreadStore(fakeredis.aioredis.FakeRedis(server=server), ttl_s=120)
+    worker_b = RedisThreadStore(fakeredis.aioredis.FakeRedis(server=server), ttl_s=120)
+
+    await worker_a.save("t1", {"ctx": b"ctx", "last_table": b"table"})
+    assert await worker_b.get_field("t1", "last_table") == b"table"
+    assert await worker_b.load("t1") == {"ctx": b"ctx"}
+    assert await worker_b.load("missing") is None
+    assert 0 < await worker_b._r.ttl("cvrgpt:chat:thread:t1") <= 120
@@ -44,3 +44,13 @@ def test_compare_accounts():
     assert res.status_code == 200
     data = res.json()
     assert "narrative" in data
+
+
+def test_cached_endpoints_answer_if_none_match_with_304():
+    for path in ("/v1/company/12345678", "/v1/accounts/latest/12345678", "/v1/filings/12345678"):
+        first = client.get(path, headers=HEADERS)
+        etag = first.headers["ETag"]
+        again = client.get(path, headers={**HEADERS, "If-None-Match": f'W/"{etag}"'})
+        assert again.status_code == 304
+        assert again.headers["ETag"] == etag
+        assert again.headers["x-cache"] == "hit"
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test-secret")
+
+pytest.importorskip("pyarrow")
+
+from fastapi.testclient import TestClient
+
+from cvrgpt_api import financials_store
+from cvrgpt_api.api import app
+from cvrgpt_api.financials_store import FinancialsStore
+from cvrgpt_api.services.benchmark import BenchmarkEngine
+
+
+def _rows():
+    rows = []
+    # Ten IT companies (NACE 62) with 20-29M revenue, one retailer (47)
+    for i in range(10):
+        cvr = 10000000 + i
+        revenue = 20e6 + i * 1e6
+        rows.append({"cvr": cvr, "year": 2022, "nace": "620100", "revenue": 20e6})
+        rows.append(
+            {
+                "cvr": cvr,
+                "year": 2023,
+                "nace": "620100",
+                "revenue": revenue,
+                "ebit": revenue * i / 100,  # margin i%
+                "equity": 10.0 * i,
+                "assets": 100.0,
+                "current_assets": 50.0,
+                "current_liabilities": 25.0,
+            }
+        )
+    rows.append({"cvr": 30000000, "year": 2023, "nace": "471100", "revenue": 5e9, "ebit": 1e9})
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FinancialsStore(str(tmp_path / "fin.arrow"))
+    store.write(_rows())
+    return store
+
+
+def test_percentiles_within_industry(store):
+    result = BenchmarkEngine(store).benchmark("10000009", min_peers=3, peer_limit=2)
+    assert result["year"] == 2023
+    assert result["industry"] == {"code": "62", "digits": 2}
+    assert result["size_band"]["band"] == 1  # 10-50M
+    assert result["peer_count"] == 9
+
+    margin = result["metrics"]["ebit_margin"]
+    assert margin["value"] == pytest.approx(0.09)
+    assert margin["percentile"] == 95.0  # highest of ten, mid-rank
+    assert margin["peers"] == 9
+    assert result["metrics"]["revenue_growth"]["value"] == pytest.approx(0.45)
+    assert result["metrics"]["solvency"]["median"] == pytest.approx(0.45)
+    assert result["metrics"]["liquidity"]["percentile"] == 50.0  # all equal
+    # Closest in revenue first
+    assert [p["cvr"] for p in result["peers"]] == ["10000008", "10000007"]
+
+
+def test_thin_band_widens_to_industry(store):
+    result = BenchmarkEngine(store).benchmark("10000000", min_peers=20)
+    assert result["size_band"] is None
+    assert result["peer_count"] == 9
+
+
+def test_unknown_or_unclassified_company(store):
+    engine = BenchmarkEngine(store)
+    assert engine.benchmark("99999999") is None
+    assert engine.benchmark("10000000", year=2019) is None
+
+
+def test_matrices_rebuilt_when_store_changes(store):
+    engine = BenchmarkEngine(store)
+    assert set(engine.matrices(2023)) == {"47", "62"}
+    store.merge([{"cvr": 40000000, "year": 2023, "nace": "100000", "revenue": 1.0}])
+    assert set(engine.matrices(2023)) == {"10", "47", "62"}
+
+
+def test_peers_endpoint(store, monkeypatch):
+    monkeypatch.setattr(financials_store, "_store", store)
+    client = TestClient(app, headers={"X-API-Key": os.environ["API_KEY"]})
+    r = client.get("/v1/compare/10000005/peers", params={"min_peers": 3, "limit": 3})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["peer_count"] == 9
+    assert len(body["peers"]) == 3
+    assert set(body["metrics"]) == {"revenue_growth", "ebit_margin", "solvency", "liquidity"}
+    assert client.get("/v1/compare/99999999/peers").status_code == 404
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import AsyncMock, patch, Mock
 from fastapi import Request
 from cvrgpt_api.cache import cache_get, cache_set, with_etag, _key, cache
 
@@ -7,7 +7,7 @@ from cvrgpt_api.cache import cache_get, cache_set, with_etag, _key, cache
 @pytest.mark.asyncio
 async def test_cache_get_returns_none_when_empty():
     """Test that cache_get returns None when key doesn't exist"""
-    with patch.object(cache, "get", return_value=None) as mock_get:
+    with patch.object(cache, "get", new_callable=AsyncMock, return_value=None) as mock_get:
         result = await cache_get("test_key")
         assert result is None
         mock_get.assert_called_once_with("test_key")
@@ -17,7 +17,7 @@ async def test_cache_get_returns_none_when_empty():
 async def test_cache_get_returns_parsed_data():
     """Test that cache_get returns parsed JSON data"""
     test_data = {"name": "Test Company", "cvr": "12345678"}
-    with patch.object(cache, "get", return_value=test_data) as mock_get:
+    with patch.object(cache, "get", new_callable=AsyncMock, return_value=test_data) as mock_get:
         result = await cache_get("test_key")
         assert result == test_data
         mock_get.assert_called_once_with("test_key")
@@ -27,7 +27,7 @@ async def test_cache_get_returns_parsed_data():
 async def test_cache_set_stores_data():
     """Test that cache_set stores data with TTL"""
     test_data = {"name": "Test Company", "cvr": "12345678"}
-    with patch.object(cache, "set") as mock_set:
+    with patch.object(cache, "set", new_callable=AsyncMock) as mock_set:
         await cache_set("test_key", test_data, 3600)
         mock_set.assert_called_once_with("test_key", test_data, 3600)
 
@@ -70,3 +70,179 @@ def test_with_etag_returns_data_with_headers():
     assert "ETag" in response.headers
     assert response.headers["Cache-Control"] == "public, max-age=3600"
     assert response.media_type == "application/json"
+
+
+@pytest.mark.asyncio
+async def test_cached_coalesces_concurrent_misses():
+    """Concurrent misses on one key share a single upstream call"""
+    import asyncio
+    from cvrgpt_api.cache import cached
+
+    calls = 0
+
+    @cached(ttl=60, key_fn=lambda: "test:coalesce")
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"n": calls}
+
+    results = await asyncio.gather(*(fetch() for _ in range(10)))
+    assert calls == 1
+    assert all(r == {"n": 1} for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cached_shares_upstream_error():
+    """A failed fill is raised to every waiter and is not cached"""
+    import asyncio
+    from cvrgpt_api.cache import cached
+
+    calls = 0
+
+    @cached(ttl=60, key_fn=lambda: "test:coalesce-error")
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(fetch() for _ in range(3)), return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert await cache.get("test:coalesce-error") is None
+
+
+@pytest.mark.asyncio
+async def test_get_many_is_one_redis_round_trip():
+    """get_many reads all keys with a single MGET"""
+    from cvrgpt_api.cache import Cache
+
+    c = Cache()
+    c._r = Mock()
+    c._r.mget = AsyncMock(return_value=[b'{"a": 1}', None])
+    assert await c.get_many(["k1", "k2"]) == [{"a": 1}, None]
+    c._r.mget.assert_awaited_once_with(["k1", "k2"])
+
+
+@pytest.mark.asyncio
+async def test_set_many_and_get_many_in_memory():
+    """Without Redis, multi-set/multi-get fall back to the in-process store"""
+    from cvrgpt_api.cache import Cache
+
+    c = Cache()
+    c._r = None
+    await c.set_many({"a": {"x": 1}, "b": [2]}, 60)
+    assert await c.get_many(["a", "missing", "b"]) == [{"x": 1}, None, [2]]
+
+
+@pytest.mark.asyncio
+async def test_l1_is_bounded_by_bytes_and_evicts_lru():
+    """The in-process tier evicts least recently used entries past its byte budget"""
+    from cvrgpt_api.cache import Cache, CacheEntry
+
+    entry_size = len(CacheEntry("x" * 20, 0.0, 0.0).encode())
+    budget = entry_size * 5 // 2  # room for two entries
+    c = Cache(l1_max_bytes=budget)
+    c._r = None
+    await c.set("a", "x" * 20, 60)
+    await c.set("b", "y" * 20, 60)
+    await c.get("a")  # touch a so b is the LRU entry
+    await c.set("c", "z" * 20, 60)
+    assert await c.get("b") is None
+    assert await c.get("a") == "x" * 20
+    assert c.stats["l1_eviction"] == 1
+    assert c._l1.currsize <= budget
+
+
+@pytest.mark.asyncio
+async def test_l1_hits_do_not_decode():
+    """Only values read from Redis are decoded; the L1 keeps the decoded entry"""
+    from cvrgpt_api.cache import Cache, CacheEntry
+
+    c = Cache()
+    c._r = None
+    await c.set("a", {"x": 1}, 60)
+    with patch.object(CacheEntry, "decode", side_effect=AssertionError("decoded")):
+        assert await c.get("a") == {"x": 1}
+        assert await c.get("a") == {"x": 1}
+
+
+@pytest.mark.asyncio
+async def test_l1_drops_entries_invalidated_by_other_workers():
+    """Pub/sub invalidations from another worker remove the local copy"""
+    from cvrgpt_api.cache import Cache
+
+    c = Cache()
+    c._r = None
+    await c.set("v1:company:12345678", {"name": "Old"}, 60)
+    c._on_invalidation(f"{c._origin}:v1:company:12345678".encode())  # own write: ignored
+    assert await c.get("v1:company:12345678") == {"name": "Old"}
+    c._on_invalidation(b"other-worker:v1:company:12345678")
+    assert await c.get("v1:company:12345678") is None
+    assert c.stats["l1_invalidation"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_serves_stale_while_revalidating():
+    """Past the soft TTL the stale value is returned at once and refreshed in the background"""
+    from cvrgpt_api.cache import cached, cache_status, _inflight
+
+    await cache.set("test:swr", "old", 0, stale_ttl=60)
+
+    @cached(ttl=60, key_fn=lambda: "test:swr", stale_ttl=60)
+    async def fetch():
+        return "new"
+
+    assert await fetch() == "old"
+    assert cache_status.get() == "stale"
+    await _inflight["test:swr"]
+    assert await fetch() == "new"
+    assert cache_status.get() == "hit"
+
+
+@pytest.mark.asyncio
+async def test_cached_serves_stale_if_upstream_fails():
+    """Past the hard TTL a failed refresh falls back to the kept value"""
+    from fastapi import HTTPException
+    from cvrgpt_api.cache import cached, cache_status
+
+    await cache.set("test:sie", {"name": "Kept"}, 0, stale_if_error_ttl=60)
+
+    @cached(ttl=60, key_fn=lambda: "test:sie", stale_if_error_ttl=60)
+    async def failing():
+        raise HTTPException(status_code=502, detail="ERST down")
+
+    assert await failing() == {"name": "Kept"}
+    assert cache_status.get() == "stale"
+
+    @cached(ttl=60, key_fn=lambda: "test:sie", stale_if_error_ttl=60)
+    async def not_found():
+        raise HTTPException(status_code=404, detail="gone")
+
+    with pytest.raises(HTTPException):
+        await not_found()
+
+
+@pytest.mark.parametrize("codec_name", ["json", "msgpack"])
+def test_codec_round_trips_decimals_losslessly(codec_name):
+    """Decimal and bytes values survive every codec unchanged"""
+    from decimal import Decimal
+    from cvrgpt_api.codec import Codec
+
+    codec = Codec(codec_name, "none", 1024)
+    value = {"revenue": Decimal("1234567.891"), "blob": b"\x00\x01", "years": [2022, 2023]}
+    assert Codec.loads(codec.dumps(value)) == value
+
+
+def test_codec_compresses_large_payloads_and_reads_legacy_json():
+    """Large blobs are compressed; headerless JSON written by older versions still decodes"""
+    from cvrgpt_api.codec import COMPRESS_NONE, Codec
+
+    codec = Codec("json", "zlib", compress_min_bytes=256)
+    big = {"filings": [{"cvr": "12345678", "type": "annual"}] * 100}
+    small_blob, big_blob = codec.dumps({"a": 1}), codec.dumps(big)
+    assert small_blob[2] == COMPRESS_NONE
+    assert big_blob[2] != COMPRESS_NONE and len(big_blob) < len(str(big))
+    assert Codec.loads(big_blob) == big
+    assert Codec.loads(b'{"name": "Legacy ApS"}') == {"name": "Legacy ApS"}
@@ -0,0 +1,44 @@
+import os
+
+os.environ.setdefault("API_KEY", "test-secret")
+os.environ["DATA_PROVIDER"] = "fixture"
+
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from cvrgpt_api.api import app, get_provider
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+
+def test_batch_returns_items_in_request_order_with_not_found_markers():
+    res = client.post(
+        "/v1/companies:batch",
+        json={"cvrs": ["99999999", "12345678", "99999999"]},
+        headers=HEADERS,
+    )
+    assert res.status_code == 200
+    items = res.json()["items"]
+    assert [i["cvr"] for i in items] == ["99999999", "12345678", "99999999"]
+    assert [i["found"] for i in items] == [False, True, False]
+    assert items[0]["error"] == "NOT_FOUND"
+    assert items[1]["company"]["cvr"] == "12345678"
+
+
+def test_batch_serves_cached_companies_without_upstream_calls():
+    client.post("/v1/companies:batch", json={"cvrs": ["12345678"]}, headers=HEADERS)
+    provider = get_provider()
+    with patch.object(provider, "get_companies", wraps=provider.get_companies) as bulk:
+        res = client.post("/v1/companies:batch", json={"cvrs": ["12345678"]}, headers=HEADERS)
+    assert res.json()["items"][0]["found"] is True
+    bulk.assert_not_called()
+
+
+def test_batch_rejects_oversized_requests():
+    from cvrgpt_api.config import settings
+
+    cvrs = [str(10000000 + i) for i in range(settings.batch_max_cvrs + 1)]
+    res = client.post("/v1/companies:batch", json={"cvrs": cvrs}, headers=HEADERS)
+    assert res.status_code == 400
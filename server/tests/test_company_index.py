@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+from cvrgpt_api.company_index import CompanyIndex, normalize_name, row_from_vrvirksomhed
+from cvrgpt_api.providers.fixtures import FixtureProvider
+from cvrgpt_api.providers.local_index import LocalIndexProvider
+
+ROWS = [
+    {"cvr": "24256790", "name": "Novo Nordisk A/S", "status": "NORMAL", "nace": "212000"},
+    {"cvr": "10403782", "name": "Novozymes A/S", "status": "NORMAL"},
+    {"cvr": "22756214", "name": "A.P. Møller - Mærsk A/S", "city": "København"},
+    {"cvr": "31234567", "name": "Århus Tømrerfirma ApS"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    ix = CompanyIndex(tmp_path / "companies.sqlite")
+    ix.upsert(ROWS)
+    yield ix
+    ix.close()
+
+
+def test_normalize_name_folds_danish_letters_and_legal_suffixes():
+    assert normalize_name("Århus Tømrerfirma ApS") == "aarhus toemrerfirma"
+    assert normalize_name("A.P. Møller - Mærsk A/S") == "a p moeller maersk"
+    assert normalize_name("Dansk Andel a.m.b.a.") == "dansk andel"
+
+
+@pytest.mark.parametrize(
+    "q, cvr",
+    [
+        ("novo nordisk", "24256790"),  # suffix-insensitive
+        ("Maersk", "22756214"),  # æ typed as ae
+        ("aarhus tømrer", "31234567"),  # å written as aa
+        ("novo nordsik", "24256790"),  # typo falls back to trigram similarity
+        ("2425", "24256790"),  # CVR prefix
+    ],
+)
+def test_search_matches(index, q, cvr):
+    assert index.search(q)["items"][0]["cvr"] == cvr
+
+
+def test_search_ranks_prefix_matches_and_pages(index):
+    page = index.search("novo", limit=1)
+    assert page["total"] == 2
+    assert page["items"][0]["name"] == "Novozymes A/S"  # shorter prefix match first
+    assert index.search("novo", limit=1, offset=1)["items"][0]["name"] == "Novo Nordisk A/S"
+
+
+@pytest.mark.parametrize("q", ["novo", "no", "2", "novo nordsik"])
+def test_search_after_pages_like_offset(index, q):
+    index.upsert([{"cvr": f"2{i:07d}", "name": f"Novo Holding {i} ApS"} for i in range(5)])
+    expected = [i["cvr"] for i in index.search(q, limit=50)["items"]]
+    seen, after = [], None
+    while True:
+        page = index.search(q, limit=2, after=after)
+        if not page["items"]:
+            break
+        seen += [i["cvr"] for i in page["items"]]
+        after = page["search_after"]
+    assert seen == expected
+    with pytest.raises(ValueError):
+        index.search(q, limit=2, after=["x"] * 7)
+
+
+def test_upsert_replaces_renamed_company(index):
+    index.upsert([{"cvr": "10403782", "name": "Novonesis A/S"}])
+    names = [i["name"] for i in index.search("novozymes")["items"]]
+    assert "Novozymes A/S" not in names
+    assert index.search("novonesis")["items"][0]["cvr"] == "10403782"
+
+
+def test_row_from_vrvirksomhed():
+    row = row_from_vrvirksomhed(
+        {
+            "cvrNummer": 24256790,
+            "virksomhedMetadata": {
+                "nyesteNavn": {"navn": "Novo Nordisk A/S"},
+                "nyesteHovedbranche": {"branchekode": "212000"},
+            },
+        }
+    )
+    assert row["cvr"] == "24256790" and row["nace"] == "212000"
+    assert row_from_vrvirksomhed({"cvrNummer": 1}) is None
+
+
+@pytest.mark.asyncio
+async def test_local_index_provider_falls_back_until_filled(tmp_path):
+    ix = CompanyIndex(tmp_path / "empty.sqlite")
+    provider = LocalIndexProvider(ix, FixtureProvider())
+    assert (await provider.search_companies("Eksempel"))["citations"] == [{"source": "fixtures"}]
+    ix.upsert(ROWS)
+    data = await provider.search_companies("novo nordisk")
+    assert data["items"][0]["cvr"] == "24256790"
+    assert data["citations"][0]["source"] == "cvr_index"
+
+
+def test_reads_from_other_threads_never_see_a_half_done_upsert(index):
+    batch = [{"cvr": str(40000000 + i), "name": f"Batch Selskab {i} ApS"} for i in range(200)]
+    totals = []
+
+    def read():
+        for _ in range(20):
+            totals.append(index.search("batch selskab", limit=1)["total"])
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for t in readers:
+        t.start()
+    index.upsert(batch)
+    for t in readers:
+        t.join()
+    assert set(totals) <= {0, 200}
+    assert index.search("batch selskab", limit=1)["total"] == 200
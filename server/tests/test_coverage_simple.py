@@ -14,19 +14,20 @@ def test_cache_key_generation():
     assert key == "test:a:b:c"
 
 
-def test_cache_memory_fallback():
+@pytest.mark.asyncio
+async def test_cache_memory_fallback():
     """Test in-memory cache when Redis is not available."""
     cache = Cache()
     # Ensure we're using memory cache
     cache._r = None
     
     # Test set and get
-    cache.set("test_key", {"data": "value"}, 60)
-    result = cache.get("test_key")
+    await cache.set("test_key", {"data": "value"}, 60)
+    result = await cache.get("test_key")
     assert result == {"data": "value"}
     
     # Test non-existent key
-    result = cache.get("nonexistent")
+    result = await cache.get("nonexistent")
     assert result is None
 
 
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test-secret")
+os.environ["DATA_PROVIDER"] = "fixture"
+
+from cvrgpt_api.services.enrich import enrich_stream, parse_cvrs
+
+
+class SlowProvider:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.batches = []
+
+    async def get_company(self, cvr):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.001 * (int(cvr) % 3))
+        self.in_flight -= 1
+        if cvr == "13":
+            raise FileNotFoundError(cvr)
+        return {"company": {"cvr": cvr}}
+
+    async def get_companies(self, cvrs):
+        self.batches.append(list(cvrs))
+
+        async def one(cvr):
+            try:
+                return cvr, await self.get_company(cvr)
+            except FileNotFoundError:
+                return cvr, None
+
+        found = await asyncio.gather(*(one(cvr) for cvr in cvrs))
+        return {cvr: data for cvr, data in found if data is not None}
+
+    async def get_latest_accounts(self, cvr):
+        return {"accounts": None}
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_enrich_stream_bounds_concurrency_and_checkpoints():
+    provider = SlowProvider()
+    cvrs = [str(i) for i in range(40)]
+    stream = enrich_stream(_aiter(cvrs), provider, concurrency=4, checkpoint_every=10)
+    out = [r async for r in stream]
+    results = [r for r in out if "seq" in r]
+    checkpoints = [r["checkpoint"] for r in out if "checkpoint" in r]
+    assert sorted(r["seq"] for r in results) == list(range(40))
+    assert provider.peak <= 4
+    # lookups of the CVRs in flight are batched
+    assert sum(map(len, provider.batches)) == 40 and len(provider.batches) < 40
+    assert checkpoints == sorted(checkpoints) and checkpoints[-1] == 40
+    assert next(r for r in results if r["cvr"] == "13")["error"] == "NOT_FOUND"
+    # each checkpoint only covers results already emitted before it
+    seen = set()
+    for r in out:
+        if "seq" in r:
+            seen.add(r["seq"])
+        else:
+            assert set(range(r["checkpoint"])) <= seen
+
+
+@pytest.mark.asyncio
+async def test_enrich_stream_resumes_from_start():
+    cvrs = [str(i) for i in range(10)]
+    out = [r async for r in enrich_stream(_aiter(cvrs), SlowProvider(), start=6)]
+    assert sorted(r["seq"] for r in out if "seq" in r) == [6, 7, 8, 9]
+
+
+@pytest.mark.asyncio
+async def test_parse_cvrs_accepts_csv_and_ndjson():
+    lines = ["name;cvr", "Demo ApS;12345678", "", '{"cvr": "87654321"}']
+    assert [c async for c in parse_cvrs(_aiter(lines))] == ["12345678", "87654321"]
+
+
+@pytest.mark.asyncio
+async def test_bad_input_lines_become_error_records():
+    lines = ['{"cvr": "1"}', '{"cvr": ', '{"cvr": "2"}']
+    out = [r async for r in enrich_stream(parse_cvrs(_aiter(lines)), SlowProvider())]
+    by_seq = {r["seq"]: r for r in out if "seq" in r}
+    assert by_seq[1]["error"] == "BAD_INPUT"
+    assert by_seq[0]["cvr"] == "1" and by_seq[2]["cvr"] == "2"
+    assert out[-1] == {"checkpoint": 3, "done": True}
+
+
+def test_enrich_endpoint_streams_ndjson():
+    from fastapi.testclient import TestClient
+
+    from cvrgpt_api.api import app
+
+    client = TestClient(app)
+    res = client.post(
+        "/v1/enrich",
+        content=b"cvr\n12345678\n99999999\n",
+        headers={"X-API-Key": os.environ["API_KEY"], "Content-Type": "text/csv"},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    by_cvr = {r["cvr"]: r for r in rows if "cvr" in r}
+    assert by_cvr["12345678"]["company"]["cvr"] == "12345678"
+    assert by_cvr["99999999"]["error"] == "NOT_FOUND"
+    assert rows[-1] == {"checkpoint": 2, "done": True}
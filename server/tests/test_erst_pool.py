@@ -0,0 +1,83 @@
+import json
+
+import httpx
+import pytest
+
+from cvrgpt_api.http import PooledClient
+from cvrgpt_api.providers.erst import ERSTProvider
+
+
+def _provider(handler) -> ERSTProvider:
+    provider = ERSTProvider(
+        client_id="",
+        client_secret="",
+        auth_url="",
+        token_audience="",
+        api_base="https://erst.test",
+        basic_user="u",
+        basic_password="p",
+    )
+    provider._http = PooledClient(
+        "erst-test",
+        timeout=5.0,
+        max_connections=4,
+        max_keepalive=2,
+        keepalive_expiry=30.0,
+        transport=httpx.MockTransport(handler),
+    )
+    return provider
+
+
+@pytest.mark.asyncio
+async def test_erst_reuses_one_pooled_client():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.path)
+        return httpx.Response(200, json={"hits": {"hits": [], "total": {"value": 0}}})
+
+    provider = _provider(handler)
+    await provider.search_companies("demo")
+    first = provider._http.client
+    await provider.search_companies("other")
+    assert provider._http.client is first
+    assert seen == ["/virksomhed/_search", "/virksomhed/_search"]
+    assert provider.pool_stats()["in_flight"] == 0
+
+    await provider.aclose()
+    assert first.is_closed
+
+
+@pytest.mark.asyncio
+async def test_erst_basic_auth_is_sent():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"].startswith("Basic ")
+        return httpx.Response(200, json={"items": []})
+
+    provider = _provider(handler)
+    result = await provider.list_filings("12345678")
+    assert result["filings"] == []
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_erst_get_companies_is_one_terms_query():
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        hits = [
+            {"_source": {"Vrvirksomhed": {"cvrNummer": 11111111}}},
+            {"_source": {"Vrvirksomhed": {"cvrNummer": 22222222}}},
+        ]
+        return httpx.Response(200, json={"hits": {"hits": hits}})
+
+    provider = _provider(handler)
+    found = await provider.get_companies(["11111111", "22222222", "33333333"])
+    assert len(bodies) == 1
+    assert bodies[0]["query"]["terms"]["Vrvirksomhed.cvrNummer"] == [
+        "11111111",
+        "22222222",
+        "33333333",
+    ]
+    assert sorted(found) == ["11111111", "22222222"]
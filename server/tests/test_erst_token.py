@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from cvrgpt_api.http import PooledClient
+from cvrgpt_api.providers.erst import ERSTProvider
+
+
+def _provider(handler) -> ERSTProvider:
+    provider = ERSTProvider(
+        client_id="id",
+        client_secret="secret",
+        auth_url="https://auth.test/token",
+        token_audience="aud",
+        api_base="https://erst.test",
+    )
+    provider._http = PooledClient(
+        "erst-test",
+        timeout=5.0,
+        max_connections=20,
+        max_keepalive=5,
+        keepalive_expiry=30.0,
+        transport=httpx.MockTransport(handler),
+    )
+    return provider
+
+
+def _handler(calls: dict, expires_in: int = 3600):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "auth.test":
+            calls["token"] += 1
+            await asyncio.sleep(0.05)
+            token = {"access_token": f"t{calls['token']}", "expires_in": expires_in}
+            return httpx.Response(200, json=token)
+        assert request.headers["Authorization"] == f"Bearer t{calls['token']}"
+        return httpx.Response(200, json={"hits": {"hits": []}})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_token_refresh(monkeypatch):
+    monkeypatch.delenv("CVRGPT_REDIS_URL", raising=False)
+    calls = {"token": 0}
+    provider = _provider(_handler(calls))
+
+    await asyncio.gather(*(provider.search_companies("demo") for _ in range(10)))
+
+    assert calls["token"] == 1
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_token_near_expiry_is_refreshed_in_background(monkeypatch):
+    monkeypatch.delenv("CVRGPT_REDIS_URL", raising=False)
+    calls = {"token": 1}
+    provider = _provider(_handler(calls))
+    provider._token, provider._token_exp = "t1", time.time() + 120  # valid, inside refresh window
+    provider._token_ttl = 3600
+
+    await provider.search_companies("demo")  # served with the current token, no waiting
+    assert provider._token == "t1"
+    await provider._token_task
+    assert provider._token == "t2"
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_short_lived_token_is_not_refreshed_on_every_request(monkeypatch):
+    # expires_in at or below ERST_TOKEN_REFRESH_AHEAD_S must not put every request in the
+    # refresh window
+    monkeypatch.delenv("CVRGPT_REDIS_URL", raising=False)
+    calls = {"token": 0}
+    provider = _provider(_handler(calls, expires_in=120))
+
+    for _ in range(5):
+        await provider.search_companies("demo")
+
+    assert calls["token"] == 1
+    assert provider._token_task is None or provider._token_task.done()
+    await provider.aclose()
+
+
+def test_ping_reports_failed_refresh():
+    provider = _provider(_handler({"token": 0}))
+    assert provider.ping() is True
+    assert provider.status() == "unknown"  # configured, but no token fetched yet
+    provider._token = "t1"
+    assert provider.status() == "ok"
+    provider._token_error = "401 Unauthorized"
+    assert provider.ping() is False
+    assert provider.status() == "down"
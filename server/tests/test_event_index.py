@@ -0,0 +1,105 @@
+import asyncio
+import json
+from datetime import UTC, datetime
+
+from cvrgpt_core.models import Event, EventFilter
+from cvrgpt_core.providers.erst_events import ErstEventsProvider
+from cvrgpt_core.providers.event_index import EventIndex, event_key
+
+
+def _event(cvr, day, nace="62.01", event_type="bankruptcy"):
+    return Event(
+        cvr=cvr,
+        name=f"Company {cvr}",
+        event_type=event_type,
+        event_subtype=None,
+        nace=nace,
+        event_date=datetime(2025, 1, day, tzinfo=UTC),
+        source_id=None,
+        source_url=None,
+    )
+
+
+EVENTS = [
+    _event("1", 5),
+    _event("2", 10, nace="62.02"),
+    _event("3", 15, nace="47.11"),
+    _event("4", 20, nace="62.01", event_type="liquidation"),
+    _event("5", 25, nace=None),
+]
+
+
+def _cvrs(index, **kw):
+    return [e.cvr for e in index.query(EventFilter(**kw))]
+
+
+def test_date_window_newest_first():
+    index = EventIndex(EVENTS)
+    assert _cvrs(index) == ["5", "4", "3", "2", "1"]
+    assert _cvrs(
+        index,
+        date_from=datetime(2025, 1, 10, tzinfo=UTC),
+        date_to=datetime(2025, 1, 20, tzinfo=UTC),
+    ) == ["4", "3", "2"]
+    # Naive bounds are taken as UTC
+    assert _cvrs(index, date_from=datetime(2025, 1, 21)) == ["5"]
+    assert _cvrs(index, limit=2, offset=1) == ["4", "3"]
+
+
+def test_type_partition_and_nace_prefixes():
+    index = EventIndex(EVENTS)
+    assert _cvrs(index, event_type="bankruptcy") == ["5", "3", "2", "1"]
+    assert _cvrs(index, event_type="merger") == []
+    assert _cvrs(index, event_type="bankruptcy", nace_prefixes=["62"]) == ["2", "1"]
+    assert _cvrs(index, nace_prefixes=["62.01"]) == ["4", "1"]
+    # Several prefixes merge in date order; nested ones do not duplicate
+    assert _cvrs(index, nace_prefixes=["47", "6201", "62"]) == ["4", "3", "2", "1"]
+    assert _cvrs(index, nace_prefixes=["99"]) == []
+
+
+def test_add_appends_or_rebuilds():
+    index = EventIndex(EVENTS[:3])
+    index.add([_event("9", 28)])
+    assert _cvrs(index, limit=1) == ["9"]
+    index.add([_event("0", 1)])
+    assert _cvrs(index)[-1] == "0"
+    assert len(index) == 5
+
+
+def test_provider_reloads_fixture_on_change(tmp_path):
+    path = tmp_path / "events.json"
+    raw = {
+        "cvr": "1",
+        "name": "A",
+        "event_type": "bankruptcy",
+        "nace": "62.01",
+        "event_date": "2025-07-15T00:00:00+00:00",
+    }
+    path.write_text(json.dumps([raw]))
+    provider = ErstEventsProvider(fixture_path=path)
+    assert len(provider.query(EventFilter())) == 1
+    index = provider.index()
+    assert provider.index() is index  # parsed once
+
+    path.write_text(json.dumps([raw, {**raw, "cvr": "2"}]))
+    assert [e.cvr for e in provider.query(EventFilter())] == ["2", "1"]
+
+
+def test_keyset_pages_match_offset_pages():
+    index = EventIndex(EVENTS + [_event("0", 10), _event("9", 10, nace="62.09")])
+    for kw in ({}, {"nace_prefixes": ["62", "47"]}, {"event_type": "bankruptcy"}):
+        expected = _cvrs(index, **kw)
+        seen, after = [], None
+        while True:
+            page = index.query(EventFilter(limit=2, after=after, **kw))
+            if not page:
+                break
+            seen += [e.cvr for e in page]
+            after = event_key(page[-1])
+        assert seen == expected
+
+
+def test_list_events_is_async_and_matches_query():
+    provider = ErstEventsProvider()
+    filters = EventFilter(event_type="bankruptcy")
+    assert asyncio.run(provider.list_events(filters)) == provider.query(filters)
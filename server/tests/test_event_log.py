@@ -0,0 +1,116 @@
+import asyncio
+from datetime import UTC, datetime
+
+import httpx
+
+from cvrgpt_core.models import Event, EventFilter
+from cvrgpt_core.providers import erst_events
+from cvrgpt_core.providers.erst_events import ErstEventsProvider
+from cvrgpt_core.providers.event_log import EventLog
+from cvrgpt_core.providers.event_sync import EventSync
+
+
+def _event(cvr, day):
+    return Event(
+        cvr=cvr,
+        name=f"Company {cvr}",
+        event_type="bankruptcy",
+        event_subtype=None,
+        nace="62.01",
+        event_date=datetime(2025, 3, day, tzinfo=UTC),
+        source_id=f"evt-{cvr}",
+        source_url=None,
+    )
+
+
+def test_append_read_and_segment_rollover(tmp_path):
+    log = EventLog(tmp_path, segment_max_bytes=200)
+    assert log.read() == ([], (0, 0))
+    pos1 = log.append([_event("1", 1), _event("2", 2)], cursor="c1")
+    pos2 = log.append([_event("3", 3)], cursor="c2")
+    assert pos2[0] == pos1[0] + 1  # first segment was full
+    events, end = log.read()
+    assert [e.cvr for e in events] == ["1", "2", "3"]
+    assert end == pos2
+    assert log.read(pos1)[0][0].cvr == "3"
+    assert log.checkpoint()["cursor"] == "c2"
+    assert log.checkpoint()["count"] == 3
+
+
+def test_uncommitted_tail_is_invisible_and_truncated(tmp_path):
+    log = EventLog(tmp_path)
+    segment, offset = log.append([_event("1", 1)], cursor="c1")
+    # A crash after writing but before the checkpoint
+    with (tmp_path / f"segment-{segment:08d}.ndjson").open("ab") as f:
+        f.write(b'{"cvr": "2", "name": "half"')
+    assert [e.cvr for e in log.read()[0]] == ["1"]
+    log.recover()
+    assert (tmp_path / f"segment-{segment:08d}.ndjson").stat().st_size == offset
+
+
+def _feed(pages):
+    """MockTransport serving pages keyed by cursor."""
+    calls = []
+
+    def handler(request):
+        cursor = request.url.params.get("cursor")
+        calls.append(cursor)
+        return httpx.Response(200, json=pages[cursor])
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+def _raw(cvr, day):
+    return {
+        "id": f"evt-{cvr}",
+        "cvr": cvr,
+        "name": "X",
+        "type": "bankruptcy",
+        "nace": "62.01",
+        "date": f"2025-03-{day:02d}T00:00:00Z",
+    }
+
+
+def test_sync_pages_with_cursor_and_resumes(tmp_path):
+    log = EventLog(tmp_path)
+    pages = {
+        None: {"items": [_raw("1", 1), _raw("2", 2)], "next_cursor": "p2", "has_more": True},
+        "p2": {"items": [_raw("3", 3)], "next_cursor": "p3", "has_more": False},
+        "p3": {"items": [], "next_cursor": None, "has_more": False},
+    }
+    client, calls = _feed(pages)
+    sync = EventSync(log, "https://erst.test", client=client)
+    assert asyncio.run(sync.run_once()) == 3
+    assert calls == [None, "p2"]
+    assert log.checkpoint()["cursor"] == "p3"
+
+    # The next run starts at the stored cursor and appends only new events
+    pages["p3"] = {"items": [_raw("4", 4)], "next_cursor": "p4", "has_more": False}
+    assert asyncio.run(sync.run_once()) == 1
+    assert calls[-1] == "p3"
+    assert [e.cvr for e in log.read()[0]] == ["1", "2", "3", "4"]
+
+
+def test_sync_skips_records_with_a_bad_date(tmp_path):
+    log = EventLog(tmp_path)
+    bad = {**_raw("2", 2), "date": "02-03-2025"}
+    pages = {None: {"items": [_raw("1", 1), bad, _raw("3", 3)], "next_cursor": None}}
+    client, _ = _feed(pages)
+    sync = EventSync(log, "https://erst.test", client=client)
+    assert asyncio.run(sync.run_once()) == 2
+    assert [e.cvr for e in log.read()[0]] == ["1", "3"]
+
+
+def test_provider_reads_local_log_without_upstream(tmp_path, monkeypatch):
+    monkeypatch.setattr(erst_events, "USE_REAL", True)
+    log = EventLog(tmp_path)
+    log.append([_event("1", 1), _event("2", 2)], cursor="c1")
+    provider = ErstEventsProvider(log_dir=str(tmp_path))
+    assert [e.cvr for e in provider.query(EventFilter(event_type="bankruptcy"))] == ["2", "1"]
+
+    log.append([_event("3", 3)], cursor="c2")
+    assert [e.cvr for e in provider.query(EventFilter(nace_prefixes=["62"]))] == [
+        "3",
+        "2",
+        "1",
+    ]
@@ -13,3 +13,18 @@ def test_list_events_last_90_days():
 def test_events_bad_params():
     r = client.get("/v1/events?last_days=90&from_date=2025-01-01")
     assert r.status_code == 400
+
+def test_events_cursor_pages():
+    first = client.get("/v1/events?limit=1").json()
+    assert first["has_more"] and first["next_cursor"]
+    second = client.get(f"/v1/events?limit=1&cursor={first['next_cursor']}").json()
+    assert second["items"][0]["source_id"] != first["items"][0]["source_id"]
+    assert second["has_more"] is False and second["next_cursor"] is None
+    everything = client.get("/v1/events?limit=2").json()["items"]
+    assert first["items"] + second["items"] == everything
+
+def test_events_cursor_is_bound_to_query():
+    cursor = client.get("/v1/events?limit=1").json()["next_cursor"]
+    other_query = f"/v1/events?limit=1&cursor={cursor}&event_type=bankruptcy"
+    assert client.get(other_query).status_code == 400
+    assert client.get("/v1/events?cursor=not-a-cursor").status_code == 400
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from cvrgpt_api import financials_store
+from cvrgpt_api.chat import tools
+from cvrgpt_api.financials_store import FinancialsStore, rows_from_accounts
+
+
+def _row(cvr, year, revenue, **kw):
+    return {"cvr": cvr, "year": year, "revenue": revenue, **kw}
+
+
+def test_write_and_read_company_years(tmp_path):
+    store = FinancialsStore(str(tmp_path / "fin.arrow"))
+    assert len(store) == 0
+    store.write(
+        [
+            _row(20000002, 2023, 30.0),
+            _row(10000001, 2022, 10.0, equity=5.0),
+            _row(10000001, 2021, 8.0),
+            _row(10000001, 2022, 11.0, equity=6.0),  # later row wins
+        ]
+    )
+    assert len(store) == 3
+
+    cols = store.company_years("10000001")
+    assert cols["year"] == [2021, 2022]
+    assert cols["revenue"] == [8.0, 11.0]
+    assert cols["equity"] == [None, 6.0]
+    assert store.company_years("10000001", last=1)["year"] == [2022]
+    assert store.company_years("10000001", years=[2021])["revenue"] == [8.0]
+    assert store.company_years("99999999")["year"] == []
+
+
+def test_merge_and_metric(tmp_path):
+    store = FinancialsStore(str(tmp_path / "fin.arrow"))
+    store.write([_row(10000001, 2022, 10.0), _row(20000002, 2022, 20.0)])
+    store.merge([_row(10000001, 2022, 12.0), _row(10000001, 2023, 15.0)])
+
+    assert store.company_years("10000001")["revenue"] == [12.0, 15.0]
+    cvrs, values = store.metric("revenue", year=2022)
+    assert cvrs.tolist() == [10000001, 20000002]
+    assert values.tolist() == [12.0, 20.0]
+    cvrs, values = store.metric("revenue", cvrs=["20000002"])
+    assert values.tolist() == [20.0]
+
+
+def test_rows_from_accounts_nested_shape():
+    accounts = {
+        "current": {
+            "period": {"year": 2023, "start": "2023-01-01", "end": "2023-12-31"},
+            "pl": {"revenue": 100, "ebit": 10},
+            "bs": {"equity": 50},
+        },
+        "previous": {"period": {"year": 2022}, "revenue": "90"},
+    }
+    rows = {r["year"]: r for r in rows_from_accounts("12345678", accounts)}
+    assert rows[2023]["revenue"] == 100.0
+    assert rows[2023]["equity"] == 50.0
+    assert rows[2023]["start_date"] == "2023-01-01"
+    assert rows[2022]["revenue"] == 90.0
+
+
+def test_get_financials_reads_all_years_from_store(tmp_path, monkeypatch):
+    store = FinancialsStore(str(tmp_path / "fin.arrow"))
+    store.write(
+        [_row(10000001, y, 100.0 * y, ebit=1.0, employees=None) for y in (2019, 2020, 2021)]
+    )
+    monkeypatch.setattr(financials_store, "_store", store)
+    monkeypatch.setattr(tools, "get_provider", lambda: pytest.fail("provider should not be called"))
+
+    result = asyncio.run(tools.tool_get_financials("10000001", years=[2020, 2021], metrics=None))
+    assert result["years"] == [2020, 2021]
+    # Formatted like the provider's Decimal amounts
+    assert result["revenue"] == {"2020": "202000", "2021": "202100"}
+    assert result["ebit"] == {"2020": "1", "2021": "1"}
+    assert result["ebitda"] == result["ebit"]
+    assert result["employees"]["2021"] == "—"
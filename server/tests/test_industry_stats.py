@@ -0,0 +1,178 @@
+import os
+from datetime import UTC, datetime
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test-secret")
+
+pytest.importorskip("pyarrow")
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from cvrgpt_api import industry_stats
+from cvrgpt_api.api import app
+from cvrgpt_api.financials_store import FinancialsStore
+from cvrgpt_api.industry_stats import IndustryStats
+from cvrgpt_api.sketch import KLLSketch
+from cvrgpt_core.models import Event
+
+
+def test_kll_quantiles_and_merge():
+    rng = np.random.default_rng(1)
+    values = rng.uniform(0, 1000, 100_000)
+    a = KLLSketch()
+    for v in values[:20_000]:
+        a.update(v)
+    a.merge(KLLSketch.from_values(values[20_000:]))
+    assert a.n == 100_000
+    assert sum(len(level) for level in a.levels) < 1000
+    p25, median, p90 = a.quantiles([0.25, 0.5, 0.9])
+    assert p25 == pytest.approx(250, abs=25)
+    assert median == pytest.approx(500, abs=25)
+    assert p90 == pytest.approx(900, abs=25)
+    # Small inputs are kept exactly
+    assert KLLSketch.from_values([3.0, 1.0, 2.0]).quantiles([0.5]) == [2.0]
+    assert KLLSketch.from_dict(a.to_dict()).quantiles([0.5]) == [median]
+
+
+def _row(cvr, nace, revenue, ebit, year=2023):
+    return {"cvr": cvr, "year": year, "nace": nace, "revenue": revenue, "ebit": ebit}
+
+
+class FakeEvents:
+    def __init__(self, events):
+        self.events = events
+
+    def query(self, filters):
+        out = [
+            e
+            for e in self.events
+            if e.event_type == filters.event_type
+            and (filters.date_from is None or e.event_date >= filters.date_from)
+        ]
+        return out[filters.offset : filters.offset + filters.limit]
+
+
+def _event(cvr, nace, day, source_id):
+    return Event(
+        cvr=cvr,
+        name="X",
+        event_type="bankruptcy",
+        event_subtype="declaration",
+        nace=nace,
+        event_date=datetime(2023, 5, day, tzinfo=UTC),
+        source_id=source_id,
+        source_url=None,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FinancialsStore(str(tmp_path / "fin.arrow"))
+    store.write(
+        [
+            _row(10000001, "620100", 100.0, 10.0),
+            _row(10000002, "620100", 200.0, 40.0),
+            _row(10000003, "620200", 300.0, 90.0),
+            _row(20000001, "471100", 1000.0, 10.0),
+        ]
+    )
+    return store
+
+
+def test_refresh_builds_prefix_groups(store, tmp_path):
+    stats = IndustryStats(str(tmp_path / "industry.bin"))
+    result = stats.refresh(store)
+    assert result["accounts"] == 4
+
+    nace62 = stats.get("62")
+    assert nace62["year"] == 2023
+    assert nace62["companies"] == 3
+    assert nace62["metrics"]["revenue"]["sum"] == 600.0
+    assert nace62["metrics"]["ebit_margin"]["median"] == pytest.approx(0.2)
+    assert stats.get("6201")["companies"] == 2
+    assert stats.get("62.02", 2023)["companies"] == 1
+    assert stats.get("99") is None
+
+
+def test_refresh_is_incremental(store, tmp_path):
+    stats = IndustryStats(str(tmp_path / "industry.bin"))
+    stats.refresh(store)
+    assert stats.refresh(store) == {"accounts": 0, "rebuilt_groups": 0, "bankruptcies": 0}
+
+    # A new company is merged into its groups without rebuilding them
+    store.merge([_row(10000004, "620100", 400.0, 0.0)])
+    result = stats.refresh(store)
+    assert result == {"accounts": 1, "rebuilt_groups": 0, "bankruptcies": 0}
+    assert stats.get("62")["companies"] == 4
+
+    # A restated company rebuilds the groups it was in and now is in
+    store.merge([_row(10000001, "471100", 500.0, 50.0)])
+    result = stats.refresh(store)
+    assert result["accounts"] == 1
+    assert result["rebuilt_groups"] == 6
+    assert stats.get("62")["companies"] == 3
+    assert stats.get("6201")["metrics"]["revenue"]["sum"] == 600.0
+    assert stats.get("47")["companies"] == 2
+
+    # State survives a restart
+    reloaded = IndustryStats(str(tmp_path / "industry.bin"))
+    assert reloaded.get("62") == stats.get("62")
+    assert reloaded.refresh(store)["accounts"] == 0
+
+
+def test_bankruptcies_counted_once(store, tmp_path):
+    events = FakeEvents([_event("1", "62.01", 1, "a"), _event("2", "62.02", 3, "b")])
+    stats = IndustryStats(str(tmp_path / "industry.bin"))
+    assert stats.refresh(store, events)["bankruptcies"] == 2
+    assert stats.get("62")["bankruptcies"] == 2
+    assert stats.get("6201")["bankruptcies"] == 1
+
+    events.events.append(_event("3", "62.01", 3, "c"))
+    assert stats.refresh(None, events)["bankruptcies"] == 1
+    assert stats.get("62")["bankruptcies"] == 3
+
+
+def test_backdated_bankruptcy_is_counted(store, tmp_path):
+    events = FakeEvents([_event("1", "62.01", 3, "a")])
+    stats = IndustryStats(str(tmp_path / "industry.bin"))
+    assert stats.refresh(store, events)["bankruptcies"] == 1
+
+    # Published after the last refresh, but dated before the newest event counted so far
+    events.events.append(_event("2", "62.01", 1, "b"))
+    assert stats.refresh(None, events)["bankruptcies"] == 1
+    assert stats.get("62")["bankruptcies"] == 2
+    assert stats.refresh(None, events)["bankruptcies"] == 0
+
+
+def test_failed_event_page_applies_nothing(store, tmp_path, monkeypatch):
+    class FailingEvents(FakeEvents):
+        def query(self, filters):
+            if filters.offset:
+                raise ConnectionError("events unavailable")
+            return super().query(filters)
+
+    monkeypatch.setattr(industry_stats, "EVENTS_PAGE", 1)
+    events = FailingEvents([_event("1", "62.01", 1, "a"), _event("2", "62.01", 2, "b")])
+    stats = IndustryStats(str(tmp_path / "industry.bin"))
+    stats.refresh(store)
+    with pytest.raises(ConnectionError):
+        stats.refresh(None, events)
+    assert stats.get("62")["bankruptcies"] == 0
+
+    assert stats.refresh(None, FakeEvents(events.events))["bankruptcies"] == 2
+    assert stats.get("62")["bankruptcies"] == 2
+
+
+def test_industry_stats_endpoint(store, tmp_path, monkeypatch):
+    stats = IndustryStats(str(tmp_path / "industry.bin"))
+    stats.refresh(store)
+    monkeypatch.setattr(industry_stats, "_stats", stats)
+    client = TestClient(app, headers={"X-API-Key": os.environ["API_KEY"]})
+    r = client.get("/v1/industries/62/stats")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["companies"] == 3
+    assert body["metrics"]["revenue"]["median"] == 200.0
+    assert client.get("/v1/industries/62/stats", params={"year": 2020}).status_code == 404
@@ -0,0 +1,101 @@
+import json
+
+import httpx
+import pytest
+
+from cvrgpt_api.cache import Cache
+from cvrgpt_api.company_index import CompanyIndex
+from cvrgpt_api.http import PooledClient
+from cvrgpt_api.ingest import CompanyIngester
+from cvrgpt_api.providers.erst import ERSTProvider
+
+
+def _doc(cvr: int, name: str, updated: str) -> dict:
+    return {
+        "_source": {
+            "Vrvirksomhed": {
+                "cvrNummer": cvr,
+                "sidstOpdateret": updated,
+                "virksomhedMetadata": {"nyesteNavn": {"navn": name}},
+            }
+        },
+        "sort": [updated, cvr],
+    }
+
+
+class FakeFeed:
+    """virksomhed/_search honouring the range filter and search_after on (updated, cvr)."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.bodies = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.bodies.append(body)
+        window = (body["query"].get("range") or {}).get("Vrvirksomhed.sidstOpdateret") or {}
+        gte = window.get("gte")
+        after = body.get("search_after")
+        hits = [
+            d
+            for d in self.docs
+            if (gte is None or d["sort"][0] >= gte) and (after is None or d["sort"] > after)
+        ]
+        return httpx.Response(200, json={"hits": {"hits": hits[: body["size"]]}})
+
+
+def _provider(feed) -> ERSTProvider:
+    provider = ERSTProvider(
+        "", "", "", "", api_base="https://erst.test", basic_user="u", basic_password="p"
+    )
+    provider._http = PooledClient(
+        "erst-test",
+        timeout=5.0,
+        max_connections=2,
+        max_keepalive=1,
+        keepalive_expiry=5.0,
+        transport=httpx.MockTransport(feed),
+    )
+    return provider
+
+
+@pytest.mark.asyncio
+async def test_ingester_applies_changes_invalidates_and_checkpoints(tmp_path):
+    index = CompanyIndex(tmp_path / "companies.sqlite")
+    cache = Cache()
+    cache._r = None
+    await cache.set("v1:company:11111111", {"stale": True}, 600)
+    await cache.set("search:alpha:10:0", {"items": []}, 600)
+
+    feed = FakeFeed(
+        [
+            _doc(11111111, "Alpha ApS", "2025-01-01T10:00:00+00:00"),
+            _doc(22222222, "Beta A/S", "2025-01-01T11:00:00+00:00"),
+            _doc(33333333, "Gamma I/S", "2025-01-01T12:00:00+00:00"),
+        ]
+    )
+    ingester = CompanyIngester(_provider(feed), index, cache=cache, page_size=2)
+    assert await ingester.run_once() == 3
+    assert index.search("beta")["items"][0]["cvr"] == "22222222"
+    assert index.meta_get("high_water") == "2025-01-01T12:00:00+00:00"
+    assert await cache.get("v1:company:11111111") is None
+    # Search results expire with their TTL instead of being dropped wholesale
+    assert await cache.get("search:alpha:10:0") == {"items": []}
+
+    # A renamed company shows up after the checkpoint; only it is fetched and applied
+    feed.docs.append(_doc(11111111, "Alpha Holding ApS", "2025-01-02T09:00:00+00:00"))
+    feed.bodies.clear()
+    assert await ingester.run_once() == 1
+    assert feed.bodies[0]["search_after"] == ["2025-01-01T12:00:00+00:00", 33333333]
+    assert index.get("11111111")["name"] == "Alpha Holding ApS"
+
+
+@pytest.mark.asyncio
+async def test_cache_prefix_invalidation_from_other_workers():
+    cache = Cache()
+    cache._r = None
+    await cache.set("search:a:10:0", [1], 60)
+    await cache.set("v1:company:1", [2], 60)
+    cache._on_invalidation(b"other-worker:search:*")
+    assert await cache.get("search:a:10:0") is None
+    assert await cache.get("v1:company:1") == [2]
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cvrgpt_api.llm import LLMClient, LLMError, LLMRequestError, LLMUnavailableError
+from cvrgpt_api.resilience import RateLimitedError, TokenBucket
+
+
+@pytest.fixture
+def mock_llm():
+    """Local chat completions server; `replies` is a list of (delay_s, status) per request."""
+    state = {"replies": [], "requests": 0}
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            with lock:
+                n = state["requests"]
+                state["requests"] += 1
+            replies = state["replies"]
+            delay, status = replies[min(n, len(replies) - 1)] if replies else (0, 200)
+            if stopped.wait(delay):
+                return
+            payload = json.dumps({"choices": [{"message": {"content": f"reply {n}"}}]})
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload.encode())
+            except OSError:
+                pass  # the client gave up on this request (e.g. the losing hedge)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/v1"
+    yield state
+    stopped.set()
+    server.shutdown()
+    server.server_close()
+
+
+def _run(client, coro):
+    async def run():
+        try:
+            return await coro
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_slow_request_is_hedged(mock_llm):
+    mock_llm["replies"] = [(2.0, 200), (0, 200)]
+    client = LLMClient(mock_llm["url"], "key", hedge_quantile=0.5)
+    # Recent latencies put the hedge point at 50 ms
+    client._state("hedge-model").latencies.extend([0.05] * 20)
+
+    t0 = time.perf_counter()
+    data = _run(client, client.chat("hedge-model", [{"role": "user", "content": "hi"}]))
+    assert data["choices"][0]["message"]["content"] == "reply 1"
+    assert time.perf_counter() - t0 < 1.0
+    assert mock_llm["requests"] == 2
+
+
+def test_breaker_opens_after_failures_and_fails_fast(mock_llm):
+    mock_llm["replies"] = [(0, 500)]
+    client = LLMClient(mock_llm["url"], "key", breaker_fail_max=2, hedge_quantile=0)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def calls():
+        outcomes = []
+        for _ in range(3):
+            try:
+                await client.chat("flaky-model", messages)
+            except LLMError as e:
+                outcomes.append(type(e))
+        return outcomes
+
+    assert _run(client, calls()) == [LLMError, LLMError, LLMUnavailableError]
+    assert mock_llm["requests"] == 2
+    assert client.stats()["flaky-model"]["state"] == "open"
+
+
+def test_rejected_request_does_not_trip_breaker(mock_llm):
+    mock_llm["replies"] = [(0, 400)]
+    client = LLMClient(mock_llm["url"], "key", breaker_fail_max=1, hedge_quantile=0)
+    with pytest.raises(LLMRequestError):
+        _run(client, client.chat("strict-model", [{"role": "user", "content": "hi"}]))
+    assert client.stats()["strict-model"]["state"] == "closed"
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate_per_s=1.0, capacity=1)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    with pytest.raises(RateLimitedError):
+        asyncio.run(bucket.acquire(max_wait_s=0.1))
@@ -0,0 +1,169 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+os.environ.setdefault("API_KEY", "test-secret")
+
+from fastapi.testclient import TestClient
+
+import cvrgpt_api.api
+from cvrgpt_api.config import settings
+from cvrgpt_api.resilience import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    breakers,
+    bulkheads,
+    get_breaker,
+    guarded,
+)
+
+HDR = {"X-API-Key": os.environ["API_KEY"]}
+
+
+@pytest.fixture(autouse=True)
+def reset_circuits():
+    yield
+    for name in [n for n in breakers if n.startswith(("test:", "fixture:"))]:
+        breakers.pop(name)
+        bulkheads.pop(name, None)
+
+
+class Upstream:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.running = self.peak = 0
+
+    async def _call(self):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return {"ok": True}
+        finally:
+            self.running -= 1
+
+    @guarded("test:company")
+    async def get_company(self):
+        return await self._call()
+
+    @guarded("test:filings")
+    async def list_filings(self):
+        return await self._call()
+
+
+async def _outcomes(fn, n):
+    out = []
+    for _ in range(n):
+        try:
+            await fn()
+            out.append("ok")
+        except Exception as e:
+            out.append(type(e).__name__)
+    return out
+
+
+def test_breaker_opens_and_fails_fast(monkeypatch):
+    monkeypatch.setattr(settings, "provider_breaker_fail_max", 2)
+    upstream = Upstream(error=httpx.ConnectError("down"))
+    outcomes = asyncio.run(_outcomes(upstream.get_company, 4))
+    assert outcomes == ["ConnectError", "ConnectError", "CircuitOpenError", "CircuitOpenError"]
+    assert upstream.calls == 2
+    # Each method has its own circuit
+    upstream.error = None
+    assert asyncio.run(upstream.list_filings()) == {"ok": True}
+
+
+def test_client_errors_do_not_trip_breaker(monkeypatch):
+    monkeypatch.setattr(settings, "provider_breaker_fail_max", 1)
+    upstream = Upstream(error=FileNotFoundError("no such company"))
+    assert asyncio.run(_outcomes(upstream.get_company, 3)) == ["FileNotFoundError"] * 3
+    assert breakers["test:company"].state == "closed"
+
+
+def _status_error(code):
+    request = httpx.Request("GET", "https://erst.test/")
+    return httpx.HTTPStatusError("", request=request, response=httpx.Response(code))
+
+
+@pytest.mark.parametrize(
+    "error, ignored",
+    [
+        (_status_error(404), True),
+        (_status_error(400), True),
+        (_status_error(429), False),
+        (_status_error(503), False),
+        (ValueError("Expecting value: line 1 column 1"), False),
+        (KeyError("hits"), False),
+    ],
+)
+def test_only_answers_are_kept_out_of_the_breaker(monkeypatch, error, ignored):
+    monkeypatch.setattr(settings, "provider_breaker_fail_max", 1)
+    upstream = Upstream(error=error)
+    asyncio.run(_outcomes(upstream.get_company, 1))
+    assert breakers["test:company"].state == ("closed" if ignored else "open")
+
+
+def test_deadline_and_bulkhead(monkeypatch):
+    monkeypatch.setattr(settings, "provider_bulkhead", 2)
+    monkeypatch.setattr(settings, "provider_deadline_s", 0.2)
+    upstream = Upstream(delay=0.05)
+
+    async def burst():
+        return await asyncio.gather(*(upstream.get_company() for _ in range(5)))
+
+    assert len(asyncio.run(burst())) == 5
+    assert upstream.peak == 2
+
+    upstream.delay = 1.0
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(upstream.get_company())
+
+
+def test_queue_timeout_does_not_trip_breaker(monkeypatch):
+    monkeypatch.setattr(settings, "provider_deadline_s", 0.1)
+    monkeypatch.setattr(settings, "provider_breaker_fail_max", 1)
+    upstream = Upstream()
+
+    async def queued():
+        bulkheads["test:company"] = asyncio.Semaphore(0)  # every slot is taken
+        return await asyncio.gather(
+            *(upstream.get_company() for _ in range(3)), return_exceptions=True
+        )
+
+    outcomes = [type(r).__name__ for r in asyncio.run(queued())]
+    assert outcomes == ["DeadlineExceededError"] * 3
+    assert upstream.calls == 0
+    assert breakers["test:company"].snapshot()["failures"] == 0
+
+
+def test_open_circuit_returns_503_and_shows_in_health(monkeypatch):
+    class DownProvider:
+        async def get_company(self, cvr):
+            raise CircuitOpenError("fixture:company", 12)
+
+        async def get_latest_accounts(self, cvr):
+            raise CircuitOpenError("fixture:accounts", 12)
+
+    monkeypatch.setenv("DATA_PROVIDER", "fixture")
+    monkeypatch.setattr(cvrgpt_api.api, "_provider_instance", DownProvider())
+    client = TestClient(cvrgpt_api.api.app)
+
+    r = client.get("/v1/company/99999991", headers=HDR)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "12"
+    assert r.json()["code"] == "PROVIDER_DOWN"
+    for path in ("/v1/compare/99999991", "/v1/compare/99999991/export"):
+        assert client.get(path, headers=HDR).status_code == 503
+
+    breaker = get_breaker("fixture:company", fail_max=1)
+    breaker.record_failure()
+    health = client.get("/health/provider").json()
+    assert health["circuits"]["company"]["state"] == "open"
+    assert health["ok"] is False
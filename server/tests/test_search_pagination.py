@@ -20,3 +20,14 @@ def test_limit_cap(monkeypatch):
     monkeypatch.setenv("API_KEY", "secret")
     r = client.get("/v1/search?q=ab&limit=999", headers=HDR)
     assert r.status_code == 422
+
+
+def test_cursor_pagination(monkeypatch):
+    monkeypatch.setenv("API_KEY", "secret")
+    a = client.get("/v1/search?q=ab&limit=1", headers=HDR).json()
+    assert a["has_more"] == (a["next_offset"] is not None)
+    if a["has_more"]:
+        b = client.get(f"/v1/search?q=ab&limit=1&cursor={a['next_cursor']}", headers=HDR).json()
+        assert b["items"] and b["items"] != a["items"]
+    bad = client.get("/v1/search?q=ab&cursor=garbage", headers=HDR)
+    assert bad.status_code == 400
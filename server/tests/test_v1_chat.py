@@ -58,3 +58,13 @@ def test_v1_chat_annual_result_requires_llm():
         assert r.status_code == 503
         j = r.json()
         assert "LLM NLU unavailable" in (j.get("detail") or "")
+
+
+def test_v1_chat_stream_reports_missing_llm_in_band(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    body = {"thread_id": "t1", "messages": [{"role": "user", "content": "hello"}]}
+    r = client.post("/v1/chat/stream", headers=HDR, json=body)
+    assert r.status_code == 200
+    events = [chunk.split("\n")[0] for chunk in r.text.strip().split("\n\n")]
+    assert events[:2] == ["event: start", "event: progress"]
+    assert events[-1] == "event: error"